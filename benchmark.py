@@ -0,0 +1,313 @@
+"""
+Load-test the MCP tools against the local fake Workspace service.
+
+Starts fake_workspace.py (unless --workspace-url is given), then drives the
+tools of stdio_server.py or http_server.py at each concurrency level and
+reports throughput, latency percentiles, upstream requests per call and
+server memory. Tools can be served three ways:
+
+    inprocess  the stdio server's FastMCP app, called in this process
+    stdio      stdio_server.py as a subprocess, as an MCP client would run it
+    http       http_server.py as a subprocess, with a generated config.json
+
+Example:
+
+    python benchmark.py --mode http --scenarios ls,metadata,group_ids --concurrency 1,16,64 --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from fastmcp import Client
+from fastmcp.client.transports import PythonStdioTransport
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+Call = Tuple[str, Dict[str, Any]]
+
+
+class Shape:
+    """Tree shape shared with fake_workspace.py, used to pick paths that exist."""
+
+    def __init__(self, fanout: int, depth: int, files: int, groups: int):
+        self.fanout = fanout
+        self.depth = depth
+        self.files = files
+        self.groups = groups
+
+    def folder(self, rng: random.Random, levels: Optional[int] = None) -> str:
+        levels = self.depth if levels is None else levels
+        return "/".join(f"d{rng.randrange(self.fanout)}" for _ in range(levels))
+
+    def file(self, rng: random.Random) -> str:
+        folder = self.folder(rng)
+        name = f"f{rng.randrange(self.files)}.txt"
+        return f"{folder}/{name}" if folder else name
+
+
+# Each scenario turns a random generator and the tree shape into one tool call; paths are relative to the user's home
+SCENARIOS: Dict[str, Callable[[random.Random, Shape], Call]] = {
+    "ls": lambda rng, shape: ("workspace_ls_tool", {"paths": [shape.folder(rng, rng.randint(0, shape.depth))]}),
+    "hot_ls": lambda rng, shape: ("workspace_ls_tool", {"paths": ["d0"]}),
+    "metadata": lambda rng, shape: ("workspace_get_file_metadata_tool", {"path": shape.file(rng)}),
+    "metadata_batch": lambda rng, shape: ("workspace_get_metadata_batch_tool", {"paths": [shape.file(rng) for _ in range(50)]}),
+    "search": lambda rng, shape: ("workspace_search_tool", {"search_term": f"f{rng.randrange(shape.files)}", "paths": [shape.folder(rng, 1)], "limit": 20}),
+    "group_ids": lambda rng, shape: ("get_genome_group_ids", {"genome_group_name": f"g{rng.randrange(shape.groups)}", "offset": rng.randrange(10) * 100, "limit": 100}),
+    "read": lambda rng, shape: ("workspace_download_file_tool", {"path": shape.file(rng)}),
+}
+
+
+def percentile(ordered: List[float], quantile: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(quantile * len(ordered))) - 1))]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with status {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing is listening on port {port} after {timeout}s")
+
+
+def _rss_mib(pid: int) -> Optional[Dict[str, float]]:
+    """Current and peak resident memory of a process in MiB (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    return {key: round(int(fields[name].split()[0]) / 1024, 1) for key, name in (("rss", "VmRSS"), ("peak", "VmHWM")) if name in fields}
+
+
+def _child_pid(script: str) -> Optional[int]:
+    """Find the pid of a child process running script, e.g. the stdio server started by the MCP client."""
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read().split(b"\0")
+            with open(f"/proc/{entry}/stat") as f:
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == os.getpid() and any(part.decode(errors="ignore").endswith(script) for part in cmdline):
+            return int(entry)
+    return None
+
+
+def _parse_settings(pairs: List[str]) -> Dict[str, Any]:
+    settings = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try:
+            settings[key] = json.loads(value)
+        except ValueError:
+            settings[key] = value
+    return settings
+
+
+def _failed(result: Any) -> bool:
+    if result.is_error:
+        return True
+    text = result.content[0].text if result.content and hasattr(result.content[0], "text") else ""
+    return text.startswith("Error") or text.startswith('{"error"')
+
+
+async def run_level(client: Client, scenario: str, shape: Shape, tokens: List[str], concurrency: int, requests: int, seed: int) -> Dict[str, Any]:
+    """Make requests tool calls of one scenario from concurrency workers and summarize their latencies."""
+    make_call = SCENARIOS[scenario]
+    remaining = iter(range(requests))
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker(number: int):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + number)
+        for _ in remaining:
+            name, arguments = make_call(rng, shape)
+            arguments["token"] = rng.choice(tokens)
+            start = time.perf_counter()
+            try:
+                failed = _failed(await client.call_tool(name, arguments, raise_on_error=False))
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "calls": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1)
+    }
+
+
+def _start_fake_workspace(args: argparse.Namespace) -> Tuple[str, subprocess.Popen]:
+    port = _free_port()
+    command = [
+        sys.executable, os.path.join(HERE, "fake_workspace.py"), "--port", str(port),
+        "--fanout", str(args.fanout), "--depth", str(args.depth), "--files", str(args.files),
+        "--groups", str(args.groups), "--group-size", str(args.group_size), "--file-size", str(args.file_size),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--slow-rate", str(args.slow_rate), "--slow-ms", str(args.slow_ms),
+        "--error-rate", str(args.error_rate), "--seed", str(args.seed)
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    _wait_for_port(port, process)
+    return f"http://127.0.0.1:{port}/rpc", process
+
+
+def _server_env(args: argparse.Namespace, workspace_url: str) -> Dict[str, str]:
+    env = {"WORKSPACE_API_URL": workspace_url, "WORKSPACE_LOG_LEVEL": "WARNING"}
+    env.update({key: str(value) for key, value in _parse_settings(args.env).items()})
+    return env
+
+
+async def benchmark(args: argparse.Namespace, workspace_url: str) -> List[Dict[str, Any]]:
+    shape = Shape(args.fanout, args.depth, args.files, args.groups)
+    tokens = [f"un=bench{number}@bvbrc|tokenid=bench|sig=bench" for number in range(args.users)]
+    server: Optional[subprocess.Popen] = None
+    workdir = tempfile.mkdtemp(prefix="workspace-bench-")
+    pid: Optional[int] = None
+
+    if args.mode == "inprocess":
+        os.environ.update(_server_env(args, workspace_url))
+        sys.path.insert(0, HERE)
+        import stdio_server
+        target: Any = stdio_server.mcp
+        pid = os.getpid()
+    elif args.mode == "stdio":
+        target = PythonStdioTransport(os.path.join(HERE, "stdio_server.py"), env={**os.environ, **_server_env(args, workspace_url)}, cwd=workdir)
+    else:
+        port = _free_port()
+        config = {"workspace-url": workspace_url, "port": port, "log_level": "WARNING", **_parse_settings(args.config)}
+        with open(os.path.join(workdir, "config.json"), "w") as f:
+            json.dump(config, f)
+        # Access logs would interleave with the results table
+        with open(os.path.join(workdir, "server.log"), "w") as log:
+            server = subprocess.Popen([sys.executable, os.path.join(HERE, "http_server.py")], cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+        _wait_for_port(port, server)
+        target = f"http://127.0.0.1:{port}/mcp"
+        pid = server.pid
+
+    stats_url = workspace_url.rsplit("/", 1)[0] + "/stats"
+    results = []
+    try:
+        async with Client(target, timeout=args.timeout) as client, httpx.AsyncClient() as upstream:
+            if args.mode == "stdio":
+                pid = _child_pid("stdio_server.py")
+            for scenario in args.scenarios.split(","):
+                if scenario not in SCENARIOS:
+                    raise SystemExit(f"unknown scenario {scenario}; choose from {', '.join(SCENARIOS)}")
+                if args.warmup:
+                    await run_level(client, scenario, shape, tokens, 1, args.warmup, args.seed + 1)
+                for concurrency in [int(level) for level in args.concurrency.split(",")]:
+                    before = (await upstream.get(stats_url)).json()
+                    result = await run_level(client, scenario, shape, tokens, concurrency, args.requests, args.seed)
+                    after = (await upstream.get(stats_url)).json()
+                    result["upstream_per_call"] = round((after.get("posts", 0) - before.get("posts", 0)) / max(1, result["calls"]), 2)
+                    result["server_mib"] = _rss_mib(pid) if pid else None
+                    results.append(result)
+                    print(_format_row(result), flush=True)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return results
+
+
+HEADER = f"{'scenario':<16}{'conc':>6}{'calls':>7}{'errors':>8}{'calls/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'up/call':>9}{'rss MiB':>9}"
+
+
+def _format_row(result: Dict[str, Any]) -> str:
+    memory = (result.get("server_mib") or {}).get("rss", "-")
+    return (
+        f"{result['scenario']:<16}{result['concurrency']:>6}{result['calls']:>7}{result['errors']:>8}"
+        f"{result['throughput']:>10}{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}"
+        f"{result['upstream_per_call']:>9}{memory:>9}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the workspace MCP tools against a fake Workspace service")
+    parser.add_argument("--mode", choices=["inprocess", "stdio", "http"], default="inprocess")
+    parser.add_argument("--scenarios", default="ls,metadata,group_ids", help=f"Comma separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma separated concurrency levels (default 1,8,32)")
+    parser.add_argument("--requests", type=int, default=200, help="Tool calls per scenario and concurrency level (default 200)")
+    parser.add_argument("--warmup", type=int, default=10, help="Unrecorded tool calls before each scenario (default 10)")
+    parser.add_argument("--users", type=int, default=4, help="Distinct user tokens the calls are spread over (default 4)")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before a tool call is abandoned")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_file", help="Also write the results to this file")
+    parser.add_argument("--config", action="append", default=[], metavar="KEY=VALUE", help="config.json setting for the http server, e.g. batch_window_ms=5")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Environment variable for the stdio and in-process server, e.g. WORKSPACE_CACHE_TTL=0")
+    parser.add_argument("--workspace-url", help="Use this Workspace service instead of starting fake_workspace.py; it must serve the same tree shape")
+
+    fake = parser.add_argument_group("fake Workspace service")
+    fake.add_argument("--fanout", type=int, default=10)
+    fake.add_argument("--depth", type=int, default=2)
+    fake.add_argument("--files", type=int, default=100)
+    fake.add_argument("--file-size", type=int, default=4096)
+    fake.add_argument("--groups", type=int, default=10)
+    fake.add_argument("--group-size", type=int, default=1000)
+    fake.add_argument("--latency-ms", type=float, default=10)
+    fake.add_argument("--jitter-ms", type=float, default=5)
+    fake.add_argument("--slow-rate", type=float, default=0)
+    fake.add_argument("--slow-ms", type=float, default=1000)
+    fake.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args(argv)
+
+    fake_process = None
+    workspace_url = args.workspace_url
+    if not workspace_url:
+        workspace_url, fake_process = _start_fake_workspace(args)
+    print(f"{args.mode} server, Workspace at {workspace_url}")
+    print(HEADER)
+    try:
+        results = asyncio.run(benchmark(args, workspace_url))
+    finally:
+        if fake_process is not None:
+            fake_process.terminate()
+            fake_process.wait()
+
+    if args.json_file:
+        with open(args.json_file, "w") as f:
+            json.dump({"mode": args.mode, "argv": sys.argv[1:], "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
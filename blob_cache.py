@@ -0,0 +1,225 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class BlobCache:
+    """
+    On-disk LRU cache of downloaded workspace objects.
+
+    Entries are keyed by the object's id and timestamp, so an overwritten
+    object never matches a stale entry and nothing has to be invalidated.
+    Callers must look up the key from current metadata fetched with the
+    user's token before using an entry. Files are written to a temporary name
+    and renamed into place, so a crash never leaves a truncated entry, and
+    the cache is bounded by the total size of the files it holds. Recency is
+    kept in the files' modification times, so the LRU order survives restarts.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 10 * 1024 ** 3, link: bool = False):
+        """
+        Initialize the cache, indexing entries left by earlier runs.
+
+        Args:
+            directory: Directory the cached files are kept in
+            max_bytes: Total size of cached files before least recently used ones are evicted
+            link: Hard link cached files to their destination instead of copying them; only safe if downloaded files are never modified in place
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.link = link
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_served = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def key(object_id: str, timestamp: str) -> str:
+        return hashlib.sha256(f"{object_id}\0{timestamp}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load(self):
+        found = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    # Left behind by a write that never finished
+                    self._remove(path)
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._size += size
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            self._remove(self._path(key))
+
+    def get(self, object_id: str, timestamp: str) -> Optional[str]:
+        """
+        Return the path of the cached file for this version of an object, or None.
+        """
+        key = self.key(object_id, timestamp)
+        path = self._path(key)
+        with self._lock:
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                if self._entries.pop(key, None) is not None:
+                    logger.warning("Cached download %s disappeared from %s", key, self.directory)
+                self.misses += 1
+                return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def _temporary(self, target: str) -> str:
+        return f"{target}.{uuid.uuid4().hex}.tmp"
+
+    def _place(self, source: str, target: str, link: bool):
+        # Link or copy to a temporary name next to target, then rename it into place atomically
+        temporary = self._temporary(target)
+        try:
+            if link:
+                try:
+                    os.link(source, temporary)
+                except OSError:
+                    # Different file system or no hard link support
+                    shutil.copyfile(source, temporary)
+            else:
+                # copyfile uses sendfile where available, so no bytes pass through Python
+                shutil.copyfile(source, temporary)
+            os.replace(temporary, target)
+        except BaseException:
+            self._remove(temporary)
+            raise
+
+    def copy_to(self, path: str, output_file: str) -> int:
+        """
+        Copy (or hard link) a cached file returned by get() to output_file and return its size.
+
+        Raises:
+            OSError: If the cached file was evicted meanwhile or output_file cannot be written
+        """
+        self._place(path, output_file, self.link)
+        size = os.path.getsize(output_file)
+        with self._lock:
+            self.bytes_served += size
+        return size
+
+    def read(self, path: str, max_bytes: int) -> Optional[bytes]:
+        """
+        Read a cached file returned by get() into memory, or return None if it is larger than max_bytes.
+
+        Raises:
+            OSError: If the cached file was evicted meanwhile
+        """
+        with open(path, "rb") as f:
+            data = f.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            return None
+        with self._lock:
+            self.bytes_served += len(data)
+        return data
+
+    def _add(self, key: str, size: int):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous
+            self._entries[key] = size
+            self._size += size
+            self._evict()
+
+    def put_file(self, object_id: str, timestamp: str, source: str) -> bool:
+        """
+        Store a downloaded file as this version of an object; files larger than the cache are skipped.
+
+        Returns:
+            True if the file was cached
+        """
+        size = os.path.getsize(source)
+        if not object_id or size > self.max_bytes:
+            return False
+        key = self.key(object_id, timestamp)
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        self._place(source, target, self.link)
+        self._add(key, size)
+        return True
+
+    def put_bytes(self, object_id: str, timestamp: str, data: bytes) -> bool:
+        """
+        Store downloaded content held in memory as this version of an object.
+
+        Returns:
+            True if the content was cached
+        """
+        if not object_id or len(data) > self.max_bytes:
+            return False
+        key = self.key(object_id, timestamp)
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temporary = self._temporary(target)
+        try:
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, target)
+        except BaseException:
+            self._remove(temporary)
+            raise
+        self._add(key, len(data))
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return cache counters.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "directory": self.directory,
+                "files": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+                "evictions": self.evictions,
+                "bytes_served": self.bytes_served
+            }
@@ -0,0 +1,474 @@
+"""
+Local stand-in for the BV-BRC Workspace JSON-RPC service and its Shock data store.
+
+Serves a lazily generated tree of synthetic folders, files and genome/feature
+groups for any user, so listings of millions of objects cost no memory.
+Objects created through Workspace.create are kept in memory on top of the
+synthetic tree. Latency and upstream errors can be injected to exercise
+batching, retries and hedging.
+
+Run it on its own and point WORKSPACE_API_URL (stdio) or workspace-url
+(config.json) at http://127.0.0.1:<port>/rpc:
+
+    python fake_workspace.py --port 8999 --fanout 10 --depth 3 --files 1000
+"""
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# Synthetic creation times are spread over the year after this date
+BASE_TIME = 1704067200  # 2024-01-01T00:00:00Z
+YEAR_SECONDS = 365 * 24 * 3600
+
+GROUP_FOLDERS = {"Genome Groups": ("genome_group", "genome_id"), "Feature Groups": ("feature_group", "feature_id")}
+
+# Meta tuple fields a Workspace.ls query may filter on
+QUERY_FIELDS = {"name": 0, "type": 1, "creation_date": 3, "owner": 5}
+
+# Entries per chunk of a streamed recursive listing
+STREAM_BATCH = 1000
+
+_PATTERN = random.Random(0).randbytes(1 << 20)
+
+
+class SyntheticTree:
+    """
+    Deterministic workspace tree generated on demand from a few shape parameters.
+
+    Every user's home holds fanout folders d0..dN nested depth levels deep,
+    with files_per_folder files in each folder of the last level, plus a
+    "Genome Groups" and a "Feature Groups" folder holding groups of
+    group_size IDs each.
+    """
+
+    def __init__(self, fanout: int = 10, depth: int = 2, files_per_folder: int = 100, file_size: int = 4096, groups: int = 10, group_size: int = 1000):
+        self.fanout = fanout
+        self.depth = depth
+        self.files_per_folder = files_per_folder
+        self.file_size = file_size
+        self.groups = groups
+        self.group_size = group_size
+
+    @property
+    def objects_per_user(self) -> int:
+        return self.fanout ** self.depth * self.files_per_folder
+
+    @staticmethod
+    def meta(folder: str, name: str, object_type: str, size: int, owner: str, link: str = "") -> list:
+        """Build the 12-element Workspace meta tuple of folder/name; id and timestamp are derived from the path."""
+        digest = hashlib.md5(f"{folder}/{name}".encode()).digest()
+        created = BASE_TIME + int.from_bytes(digest[:4], "big") % YEAR_SECONDS
+        return [
+            name, object_type, folder + "/", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(created)),
+            str(uuid.UUID(bytes=digest)), owner, size, {}, {}, "o", "n", link
+        ]
+
+    @staticmethod
+    def _split(path: str) -> Optional[Tuple[str, List[str]]]:
+        parts = path.strip("/").split("/")
+        if len(parts) < 2 or parts[1] != "home" or not parts[0]:
+            return None
+        return parts[0], parts[2:]
+
+    def _is_folder(self, rest: List[str]) -> bool:
+        if len(rest) == 1 and rest[0] in GROUP_FOLDERS:
+            return True
+        if len(rest) > self.depth:
+            return False
+        return all(re.fullmatch(r"d(\d+)", part) and int(part[1:]) < self.fanout for part in rest)
+
+    def group_ids(self, folder_name: str, index: int) -> List[str]:
+        if GROUP_FOLDERS[folder_name][0] == "genome_group":
+            return [f"{1000 + index}.{number}" for number in range(self.group_size)]
+        return [f"fig|{1000 + index}.1.peg.{number}" for number in range(self.group_size)]
+
+    def group_data(self, path: str) -> Optional[str]:
+        split = self._split(path)
+        if not split or len(split[1]) != 2 or split[1][0] not in GROUP_FOLDERS:
+            return None
+        folder_name, name = split[1]
+        match = re.fullmatch(r"g(\d+)", name)
+        if not match or int(match.group(1)) >= self.groups:
+            return None
+        id_key = GROUP_FOLDERS[folder_name][1]
+        return json.dumps({"id_list": {id_key: self.group_ids(folder_name, int(match.group(1)))}, "name": name})
+
+    def children(self, path: str) -> Optional[List[list]]:
+        """Return the meta tuples of a folder's entries, or None if path is not a synthetic folder."""
+        split = self._split(path)
+        if split is None:
+            return None
+        owner, rest = split
+        if not self._is_folder(rest):
+            return None
+        folder = "/" + "/".join([owner, "home"] + rest)
+        if len(rest) == 1 and rest[0] in GROUP_FOLDERS:
+            object_type = GROUP_FOLDERS[rest[0]][0]
+            size = len(self.group_data(f"{folder}/g0") or "") if self.groups else 0
+            return [self.meta(folder, f"g{index}", object_type, size, owner) for index in range(self.groups)]
+        if len(rest) < self.depth:
+            entries = [self.meta(folder, f"d{index}", "folder", 0, owner) for index in range(self.fanout)]
+        else:
+            entries = [self.meta(folder, f"f{index}.txt", "txt", self.file_size, owner, "shock") for index in range(self.files_per_folder)]
+        if not rest:
+            entries += [self.meta(folder, name, "folder", 0, owner) for name in GROUP_FOLDERS]
+        return entries
+
+    def lookup(self, path: str) -> Optional[list]:
+        """Return the meta tuple of a synthetic object or folder, or None if it does not exist."""
+        folder, _, name = path.rstrip("/").rpartition("/")
+        split = self._split(path)
+        if split is None:
+            return None
+        owner, rest = split
+        if not rest:
+            return self.meta("/" + owner, "home", "folder", 0, owner)
+        for entry in self.children(folder) or []:
+            if entry[0] == name:
+                return entry
+        return None
+
+
+def _query_predicate(query: Optional[Dict[str, Any]]) -> Callable[[list], bool]:
+    """Compile the subset of Workspace.ls query syntax used by this server: equality, $regex, $gt and $lt."""
+    tests = []
+    for field, condition in (query or {}).items():
+        index = QUERY_FIELDS.get(field)
+        if index is None:
+            continue
+        if not isinstance(condition, dict):
+            tests.append(lambda meta, index=index, value=condition: meta[index] == value)
+            continue
+        if "$regex" in condition:
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            pattern = re.compile(condition["$regex"], flags)
+            tests.append(lambda meta, index=index, pattern=pattern: pattern.search(str(meta[index])) is not None)
+        if "$gt" in condition:
+            tests.append(lambda meta, index=index, value=condition["$gt"]: meta[index] > value)
+        if "$lt" in condition:
+            tests.append(lambda meta, index=index, value=condition["$lt"]: meta[index] < value)
+    return lambda meta: all(test(meta) for test in tests)
+
+
+class FakeWorkspace:
+    """
+    Workspace JSON-RPC and Shock endpoints backed by a SyntheticTree plus objects created at runtime.
+    """
+
+    def __init__(self, tree: SyntheticTree, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 503, slow_rate: float = 0.0, slow_latency: float = 1.0, seed: Optional[int] = None):
+        """
+        Args:
+            tree: Synthetic tree served for every user
+            latency: Seconds added to every request
+            jitter: Up to this many extra seconds added at random to every request
+            error_rate: Fraction of requests answered with error_status instead of a result
+            error_status: HTTP status of injected errors
+            slow_rate: Fraction of requests delayed by slow_latency on top of latency, to create a latency tail
+            slow_latency: Extra seconds added to slow requests
+            seed: Seed of the random generator used for jitter, errors and slow requests
+        """
+        self.tree = tree
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.random = random.Random(seed)
+        self.created: Dict[str, Tuple[list, Any]] = {}
+        self.created_children: Dict[str, Dict[str, list]] = {}
+        self.nodes: Dict[str, int] = {}
+        self.stats: Counter = Counter()
+
+    async def _delay(self):
+        delay = self.latency
+        if self.jitter:
+            delay += self.random.uniform(0, self.jitter)
+        if self.slow_rate and self.random.random() < self.slow_rate:
+            delay += self.slow_latency
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _injected_error(self) -> Optional[Response]:
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.stats["injected_errors"] += 1
+            return Response("injected error", status_code=self.error_status)
+        return None
+
+    # Workspace object model
+
+    def _children(self, path: str) -> Optional[List[list]]:
+        folder = path.rstrip("/")
+        entries = self.tree.children(folder)
+        created = self.created_children.get(folder)
+        if created:
+            entries = [entry for entry in entries or [] if entry[0] not in created] + list(created.values())
+        return entries
+
+    def _lookup(self, path: str) -> Optional[Tuple[list, Any]]:
+        path = path.rstrip("/")
+        if path in self.created:
+            return self.created[path]
+        meta = self.tree.lookup(path)
+        if meta is None:
+            return None
+        data = self.tree.group_data(path) if meta[1] in ("genome_group", "feature_group") else ""
+        return meta, data
+
+    def _walk(self, path: str, exclude_directories: bool, predicate: Callable[[list], bool]) -> Iterator[list]:
+        stack = [path.rstrip("/")]
+        while stack:
+            folder = stack.pop()
+            for entry in self._children(folder) or []:
+                if entry[1] == "folder":
+                    stack.append(entry[2] + entry[0])
+                    if exclude_directories:
+                        continue
+                if predicate(entry):
+                    yield entry
+
+    def _link(self, base_url: str, meta: list) -> list:
+        # Synthetic files point at a Shock node named after their object id
+        if meta[11] == "shock":
+            meta = meta[:11] + [f"{base_url}/node/{meta[4]}"]
+        return meta
+
+    # Workspace methods
+
+    def ls(self, params: Dict[str, Any], base_url: str) -> Any:
+        predicate = _query_predicate(params.get("query"))
+        listing = {}
+        for path in params.get("paths", []):
+            if params.get("recursive"):
+                entries = self._walk(path, params.get("excludeDirectories", False), predicate)
+            else:
+                entries = (entry for entry in self._children(path) or [] if predicate(entry))
+            listing[path] = [self._link(base_url, entry) for entry in entries]
+        return [listing]
+
+    def get(self, params: Dict[str, Any], base_url: str) -> Any:
+        results = []
+        for path in params.get("objects", []):
+            found = self._lookup(path)
+            if found is None:
+                raise LookupError(f"_ERROR_Object {path} not found_ERROR_")
+            meta, data = found
+            results.append([self._link(base_url, meta), "" if params.get("metadata_only") else data])
+        return [results]
+
+    def get_download_url(self, params: Dict[str, Any], base_url: str) -> Any:
+        urls = []
+        for path in params.get("objects", []):
+            found = self._lookup(path)
+            link = self._link(base_url, found[0])[11] if found else ""
+            urls.append(f"{link}?download" if link else "")
+        return [urls]
+
+    def create(self, params: Dict[str, Any], base_url: str) -> Any:
+        results = []
+        for spec in params.get("objects", []):
+            path, object_type = spec[0].rstrip("/"), spec[1]
+            data = spec[3] if len(spec) > 3 else ""
+            if path in self.created and not params.get("overwrite"):
+                raise LookupError(f"_ERROR_Object {path} already exists_ERROR_")
+            folder, _, name = path.rpartition("/")
+            owner = folder.strip("/").split("/")[0]
+            content = data if isinstance(data, str) else json.dumps(data)
+            link = ""
+            if params.get("createUploadNodes"):
+                node = uuid.uuid4().hex
+                self.nodes[node] = 0
+                link = f"{base_url}/node/{node}"
+            meta = self.tree.meta(folder, name, object_type, len(content), owner, link)
+            # Every write is a new version, with its own id and timestamp, as in the real service
+            meta[3] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            meta[4] = str(uuid.uuid4())
+            self.created[path] = (meta, content)
+            self.created_children.setdefault(folder, {})[name] = meta
+            results.append(meta)
+        return [results]
+
+    def _dispatch(self, request: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+        method = request.get("method", "")
+        self.stats[method] += 1
+        handler = {
+            "Workspace.ls": self.ls,
+            "Workspace.get": self.get,
+            "Workspace.get_download_url": self.get_download_url,
+            "Workspace.create": self.create
+        }.get(method)
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        if handler is None:
+            response["error"] = {"code": -32601, "message": f"Method {method} not found"}
+            return response
+        params = request.get("params") or {}
+        try:
+            response["result"] = handler(params[0] if isinstance(params, list) else params, base_url)
+        except LookupError as e:
+            response["error"] = {"code": -32603, "message": str(e)}
+        return response
+
+    def _stream_listing(self, request: Dict[str, Any], base_url: str) -> Iterator[bytes]:
+        """Write a recursive Workspace.ls result as it is generated, STREAM_BATCH entries at a time."""
+        params = request["params"]
+        predicate = _query_predicate(params.get("query"))
+        yield b'{"jsonrpc":"2.0","id":' + json.dumps(request.get("id")).encode() + b',"result":[{'
+        for number, path in enumerate(params.get("paths", [])):
+            yield (b"," if number else b"") + json.dumps(path).encode() + b":["
+            batch = []
+            first = True
+            for entry in self._walk(path, params.get("excludeDirectories", False), predicate):
+                batch.append(json.dumps(self._link(base_url, entry)))
+                if len(batch) >= STREAM_BATCH:
+                    yield (b"" if first else b",") + ",".join(batch).encode()
+                    first, batch = False, []
+            if batch:
+                yield (b"" if first else b",") + ",".join(batch).encode()
+            yield b"]"
+        yield b"}]}"
+
+    # HTTP endpoints
+
+    async def rpc(self, request: Request) -> Response:
+        self.stats["posts"] += 1
+        await self._delay()
+        error = self._injected_error()
+        if error:
+            return error
+        body = json.loads(await request.body())
+        base_url = str(request.base_url).rstrip("/")
+        if isinstance(body, list):
+            self.stats["batches"] += 1
+            return JSONResponse([self._dispatch(item, base_url) for item in body])
+        if body.get("method") == "Workspace.ls" and isinstance(body.get("params"), dict) and body["params"].get("recursive"):
+            self.stats["Workspace.ls"] += 1
+            return StreamingResponse(self._stream_listing(body, base_url), media_type="application/json")
+        response = self._dispatch(body, base_url)
+        # Like the real service, errors of a single call come back as HTTP 500 with the JSON-RPC error body
+        return JSONResponse(response, status_code=500 if "error" in response else 200)
+
+    def _node_size(self, node: str) -> int:
+        return self.nodes.get(node, self.tree.file_size)
+
+    @functools.lru_cache(maxsize=1024)
+    def _md5(self, size: int) -> str:
+        # Every node serves the same pattern, so its checksum only depends on the size
+        digest = hashlib.md5()
+        for chunk in self._pattern(0, size - 1):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _pattern(first: int, last: int) -> Iterator[bytes]:
+        position = first
+        while position <= last:
+            offset = position % len(_PATTERN)
+            chunk = _PATTERN[offset:offset + min(len(_PATTERN) - offset, last - position + 1)]
+            position += len(chunk)
+            yield chunk
+
+    def _blob(self, first: int, last: int) -> Iterator[bytes]:
+        for chunk in self._pattern(first, last):
+            self.stats["bytes_sent"] += len(chunk)
+            yield chunk
+
+    async def node(self, request: Request) -> Response:
+        node = request.path_params["node"]
+        await self._delay()
+        error = self._injected_error()
+        if error:
+            return error
+
+        if request.method == "PUT":
+            # Single and parted uploads are accepted alike; only the size is kept
+            self.stats["uploads"] += 1
+            received = 0
+            async for chunk in request.stream():
+                received += len(chunk)
+            self.stats["bytes_received"] += received
+            self.nodes[node] = self.nodes.get(node, 0) + received
+            return JSONResponse({"status": 200, "data": {"id": node}, "error": None})
+
+        size = self._node_size(node)
+        if "download" not in request.query_params:
+            checksum = {"md5": self._md5(size)}
+            return JSONResponse({"status": 200, "data": {"id": node, "file": {"size": size, "checksum": checksum}}, "error": None})
+        self.stats["downloads"] += 1
+        headers = {"accept-ranges": "bytes"}
+        if request.method == "HEAD":
+            return Response(headers={**headers, "content-length": str(size)})
+        byte_range = re.fullmatch(r"bytes=(\d+)-(\d*)", request.headers.get("range", ""))
+        if byte_range:
+            first = int(byte_range.group(1))
+            last = min(int(byte_range.group(2)) if byte_range.group(2) else size - 1, size - 1)
+            if first >= size:
+                return Response(status_code=416, headers={"content-range": f"bytes */{size}"})
+            headers.update({"content-range": f"bytes {first}-{last}/{size}", "content-length": str(last - first + 1)})
+            return StreamingResponse(self._blob(first, last), status_code=206, headers=headers, media_type="application/octet-stream")
+        headers["content-length"] = str(size)
+        return StreamingResponse(self._blob(0, size - 1), headers=headers, media_type="application/octet-stream")
+
+    async def stats_endpoint(self, request: Request) -> Response:
+        if request.method == "DELETE":
+            self.stats.clear()
+        return JSONResponse(dict(self.stats))
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/rpc", self.rpc, methods=["POST"]),
+            Route("/node/{node}", self.node, methods=["GET", "HEAD", "PUT"]),
+            Route("/stats", self.stats_endpoint, methods=["GET", "DELETE"])
+        ])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local stand-in for the BV-BRC Workspace and Shock services")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--fanout", type=int, default=10, help="Folders per level of each home (default 10)")
+    parser.add_argument("--depth", type=int, default=2, help="Levels of nested folders (default 2)")
+    parser.add_argument("--files", type=int, default=100, help="Files in each folder of the last level (default 100)")
+    parser.add_argument("--file-size", type=int, default=4096, help="Size in bytes of each synthetic file (default 4096)")
+    parser.add_argument("--groups", type=int, default=10, help="Genome and feature groups per user (default 10)")
+    parser.add_argument("--group-size", type=int, default=1000, help="IDs per group (default 1000)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latency added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency of up to this much")
+    parser.add_argument("--slow-rate", type=float, default=0, help="Fraction of requests that are slow")
+    parser.add_argument("--slow-ms", type=float, default=1000, help="Extra latency of slow requests (default 1000)")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of failed requests (default 503)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    tree = SyntheticTree(args.fanout, args.depth, args.files, args.file_size, args.groups, args.group_size)
+    workspace = FakeWorkspace(
+        tree,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_ms / 1000,
+        seed=args.seed
+    )
+    print(f"Fake Workspace with {tree.objects_per_user} objects per user at http://{args.host}:{args.port}/rpc", flush=True)
+    uvicorn.run(workspace.app(), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
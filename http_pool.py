@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+from urllib.parse import urlsplit
+
+import httpx
+
+
+class HttpPool:
+    """
+    Shared async HTTP connection pool with per-host concurrency limits.
+
+    Authentication is never stored on the pool; callers pass their own headers
+    on every request so warm connections can be shared between users.
+    """
+
+    def __init__(self, max_connections: int = 500, max_keepalive_connections: int = 100, max_per_host: int = 100, timeout: float = 30):
+        """
+        Initialize the connection pool.
+
+        Args:
+            max_connections: Maximum number of concurrent connections across all hosts
+            max_keepalive_connections: Maximum number of idle connections kept alive
+            max_per_host: Maximum number of concurrent requests to a single host
+            timeout: Default timeout in seconds for HTTP requests
+        """
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.max_per_host = max_per_host
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections
+            ),
+            timeout=timeout
+        )
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _host_state(self, host: str):
+        with self._lock:
+            slots = self._host_slots.get(host)
+            if slots is None:
+                slots = self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+                self._host_stats[host] = {"in_flight": 0, "peak_in_flight": 0, "waiting": 0, "requests": 0, "errors": 0}
+            return slots, self._host_stats[host]
+
+    @asynccontextmanager
+    async def _slot(self, url: str) -> AsyncIterator[None]:
+        slots, stats = self._host_state(self._host_key(url))
+        with self._lock:
+            stats["waiting"] += 1
+        try:
+            await slots.acquire()
+        finally:
+            with self._lock:
+                stats["waiting"] -= 1
+        with self._lock:
+            stats["in_flight"] += 1
+            stats["requests"] += 1
+            stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                stats["in_flight"] -= 1
+            slots.release()
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request through the pool and read the full response body.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            **kwargs: Passed through to httpx.AsyncClient.request (headers, content, files, timeout...)
+        Returns:
+            The httpx response
+        """
+        async with self._slot(url):
+            return await self.client.request(method, url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """
+        Send a request through the pool and stream the response body.
+
+        The per-host slot is held until the context exits.
+        """
+        async with self._slot(url):
+            async with self.client.stream(method, url, **kwargs) as response:
+                yield response
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return pool utilization statistics.
+
+        Returns:
+            Dictionary with pool limits, total in-flight requests and per-host counters
+        """
+        with self._lock:
+            hosts = {host: dict(stats) for host, stats in self._host_stats.items()}
+        in_flight = sum(stats["in_flight"] for stats in hosts.values())
+        return {
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "max_per_host": self.max_per_host,
+            "in_flight": in_flight,
+            "utilization": round(in_flight / self.max_connections, 4) if self.max_connections else 0,
+            "hosts": hosts
+        }
+
+    async def close(self):
+        """Close the underlying HTTP client."""
+        await self.client.aclose()
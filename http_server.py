@@ -1,9 +1,20 @@
 from fastmcp import FastMCP
 from json_rpc import JsonRpcCaller
+from http_pool import HttpPool
+from blob_cache import BlobCache
+from metadata_cache import GroupIdCache, MetadataCache
+from metrics import collect_pool
+from prefetch import Prefetcher
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from resilience import CircuitBreaker, RetryPolicy
+from workspace_context import WorkspaceContext
+from workspace_index import WorkspaceIndex
 from workspace_tools import register_workspace_tools
+from structured_logging import configure_logging, get_logger
 from token_provider import TokenProvider
+from starlette.requests import Request
+from starlette.responses import Response
 import json
-import sys
 from typing import Any, List
 
 with open("config.json", "r") as f:
@@ -13,32 +24,126 @@ workspace_api_url = config["workspace-url"]
 port = config.get("port", 5000)
 mcp_url = config.get("mcp_url", "127.0.0.1")
 
+# Logs go to stderr or log_file through a background thread
+configure_logging(config.get("log_level", "INFO"), config.get("log_file"), config.get("log_sample_rate", 1.0))
+logger = get_logger(__name__)
+
 # Initialize token provider for HTTP mode
 token_provider = TokenProvider(mode="http")
 
+# Shared connection pool; auth is passed per request so all users share warm connections
+pool = HttpPool(
+    max_connections=config.get("max_connections", 500),
+    max_keepalive_connections=config.get("max_keepalive_connections", 100),
+    max_per_host=config.get("max_connections_per_host", 100)
+)
+
+# Listing/metadata cache shared by all tool calls (cache_ttl of 0 disables it)
+cache = None
+if config.get("cache_ttl", 30) > 0:
+    cache = MetadataCache(ttl=config.get("cache_ttl", 30), max_entries=config.get("cache_max_entries", 10000))
+
+# Parsed group ID lists, keyed by object id and timestamp (group_cache_max_ids of 0 disables it)
+group_cache = None
+if config.get("group_cache_max_ids", 5000000) > 0:
+    group_cache = GroupIdCache(max_ids=config.get("group_cache_max_ids", 5000000))
+
+# On-disk cache of downloaded objects, keyed by object id and timestamp (disabled unless download_cache_dir is set)
+blob_cache = None
+if config.get("download_cache_dir"):
+    blob_cache = BlobCache(
+        config["download_cache_dir"],
+        max_bytes=config.get("download_cache_max_mb", 10240) * 1024 * 1024,
+        link=config.get("download_cache_link", False)
+    )
+
+# Background metadata/group prefetch after listings, within a per-user budget (off by default)
+prefetcher = None
+if config.get("prefetch", False):
+    prefetcher = Prefetcher(
+        budget=config.get("prefetch_budget", 200),
+        window=config.get("prefetch_window_seconds", 60),
+        max_per_listing=config.get("prefetch_max_per_listing", 100)
+    )
+
+# Local per-user name index for searches (off by default, since one server holds every user's index)
+index = None
+if config.get("search_index", False):
+    index = WorkspaceIndex(
+        refresh_interval=config.get("index_refresh_seconds", 60),
+        rebuild_interval=config.get("index_rebuild_seconds", 3600),
+        max_entries=config.get("index_max_entries", 2000000),
+        max_total_entries=config.get("index_max_total_entries", 5000000),
+        max_search_seconds=config.get("index_max_search_seconds", 2.0)
+    )
+
+# Retries for idempotent reads, and a breaker that fails fast while the Workspace service is down
+breaker = CircuitBreaker(
+    failure_threshold=config.get("circuit_failure_threshold", 5),
+    reset_timeout=config.get("circuit_reset_seconds", 30)
+)
+
 # Initialize the JSON-RPC caller
-api = JsonRpcCaller(workspace_api_url)
+api = JsonRpcCaller(
+    workspace_api_url,
+    pool,
+    batch_window=config.get("batch_window_ms", 0) / 1000,
+    max_batch_size=config.get("max_batch_size", 50),
+    retry=RetryPolicy(retries=config.get("rpc_retries", 2)),
+    breaker=breaker,
+    hedge_quantile=config.get("hedge_percentile", 0.95) if config.get("hedge_requests", False) else None,
+    timeout=config.get("rpc_timeout"),
+    singleflight=config.get("singleflight", True)
+)
+
+# The caller and caches the workspace tools share
+ctx = WorkspaceContext(
+    api,
+    cache=cache,
+    group_cache=group_cache,
+    blob_cache=blob_cache,
+    index=index,
+    prefetcher=prefetcher,
+    shock_url=config.get("shock_url", "https://p3.theseed.org/services/shock_api")
+)
 
 # Create FastMCP server
 mcp = FastMCP("BVBRC Workspace MCP Server")
 
 # Register workspace tools with token provider
-register_workspace_tools(mcp, api, token_provider)
+register_workspace_tools(mcp, ctx, token_provider)
+
+# Prometheus metrics for tool calls, Workspace RPCs, transfers and the connection pool
+collect_pool(pool)
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 # Add health check tool
 @mcp.tool()
 def health_check() -> str:
-    """Health check endpoint"""
-    return '{"status": "healthy", "service": "bvbrc-workspace-mcp"}'
+    """Health check endpoint, including connection pool, cache and circuit breaker statistics"""
+    return json.dumps({
+        "status": "healthy",
+        "service": "bvbrc-workspace-mcp",
+        "pool": pool.stats(),
+        "cache": cache.stats() if cache else None,
+        "index": index.stats() if index else None,
+        "group_cache": group_cache.stats() if group_cache else None,
+        "download_cache": blob_cache.stats() if blob_cache else None,
+        "prefetch": prefetcher.stats() if prefetcher else None,
+        "circuit": breaker.stats()
+    })
 
 def main() -> int:
-    print(f"Starting BVBRC Workspace MCP FastMCP HTTP Server on port {port}...", file=sys.stderr)
+    logger.info("Starting BVBRC Workspace MCP FastMCP HTTP Server on port %s", port)
     try:
         mcp.run(transport="http", host=mcp_url, port=port)
     except KeyboardInterrupt:
-        print("Server stopped.", file=sys.stderr)
+        logger.info("Server stopped.")
     except Exception as e:
-        print(f"Server error: {e}", file=sys.stderr)
+        logger.error("Server error: %s", e)
         return 1
     
     return 0
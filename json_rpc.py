@@ -1,86 +1,402 @@
-import requests
+import asyncio
+import httpx
+import itertools
 import json
-from typing import Any, Dict, Optional
+import time
+from http_pool import HttpPool
+from json_stream import ListingStreamParser
+from metadata_cache import token_identity
+from metrics import CIRCUIT_REJECTIONS, RPC_CALLS, RPC_HEDGES, RPC_IN_FLIGHT, RPC_RETRIES, RPC_SECONDS, RPC_SHARED
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, RetryPolicy, hedged, is_retryable, is_rpc_error, is_upstream_failure
+from structured_logging import get_logger
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+logger = get_logger(__name__)
+
+# Read-only methods that are safe to retry or send twice
+IDEMPOTENT_METHODS = frozenset({"Workspace.get", "Workspace.ls", "Workspace.get_download_url"})
+
+# Read-only methods that may be merged into a single JSON-RPC batch request
+BATCHABLE_METHODS = IDEMPOTENT_METHODS
+
+
+class RpcError(ValueError):
+    """The Workspace service answered a call with a JSON-RPC error (e.g. object not found)."""
 
 
 class JsonRpcCaller:
-    """A minimal, generic JSON-RPC caller class."""
-    
-    def __init__(self, workspace_url: str):
+    """A minimal, generic async JSON-RPC caller class."""
+
+    def __init__(self, workspace_url: str, pool: Optional[HttpPool] = None, batch_window: float = 0.0, max_batch_size: int = 50, retry: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None, hedge_quantile: Optional[float] = None, timeout: Optional[float] = None, singleflight: bool = True):
         """
-        Initialize the JSON-RPC caller with workspace URL and authentication token.
-        
+        Initialize the JSON-RPC caller with workspace URL and a shared connection pool.
+
         Args:
             workspace_url: The base URL for the workspace API
-            token: Authentication token for API calls
+            pool: Shared HttpPool used for all requests (a default pool is created if omitted)
+            batch_window: Seconds to wait for concurrent batchable calls to coalesce (0 disables batching)
+            max_batch_size: Maximum number of calls sent in one batch request
+            retry: Retry policy for idempotent methods (defaults to 2 retries with jittered backoff)
+            breaker: Circuit breaker shared by all calls (a default breaker is created if omitted)
+            hedge_quantile: If set (e.g. 0.95), an idempotent request still running after this latency quantile is sent a second time and the first response wins
+            timeout: Per-request timeout in seconds (defaults to the pool timeout)
+            singleflight: Share one upstream request between concurrent identical idempotent calls made with the same token
         """
         self.workspace_url = workspace_url.rstrip('/')
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/jsonrpc+json'
-        })
-    
-    def call(self, method: str, params: Optional[Dict[str, Any]] = None, request_id: int = 1, token: str = None) -> Dict[str, Any]:
+        self.pool = pool or HttpPool()
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_quantile = hedge_quantile
+        self.timeout = timeout
+        self.latency = LatencyTracker()
+        self.singleflight = singleflight
+        self._shared: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._pending: Dict[Optional[str], List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        self._batch_tasks = set()
+
+    def _payload(self, method: str, params: Optional[Dict[str, Any]], request_id: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "jsonrpc": "2.0",
+            "method": method,
+            "id": next(self._ids) if request_id is None else request_id,
+            "params": params
+        }
+
+    @staticmethod
+    def _headers(token: Optional[str]) -> Dict[str, str]:
+        # Auth travels with the request; the shared pool never holds a token
+        headers = {'Content-Type': 'application/jsonrpc+json'}
+        if token:
+            headers['Authorization'] = f'{token}'
+        return headers
+
+    def _request_options(self) -> Dict[str, Any]:
+        return {"timeout": self.timeout} if self.timeout else {}
+
+    async def _post_once(self, body: Any, token: Optional[str], key: str) -> Any:
+        start = time.perf_counter()
+        response = await self.pool.request(
+            "POST",
+            self.workspace_url,
+            content=json.dumps(body),
+            headers=self._headers(token),
+            **self._request_options()
+        )
+        response.raise_for_status()
+        result = response.json()
+        self.latency.record(key, time.perf_counter() - start)
+        return result
+
+    def _check_breaker(self):
+        try:
+            self.breaker.check()
+        except CircuitOpenError:
+            CIRCUIT_REJECTIONS.inc()
+            raise
+
+    async def _post(self, body: Any, token: Optional[str], idempotent: bool = False) -> Any:
+        """
+        POST a single JSON-RPC payload or a batch array and return the decoded body.
+
+        Every request goes through the circuit breaker. Idempotent requests
+        are also retried with jittered backoff on transport errors and
+        overload responses, and hedged when a hedge quantile is configured.
+        """
+        key = body["method"] if isinstance(body, dict) else "batch"
+        attempts = 1 + (self.retry.retries if idempotent else 0)
+        for attempt in range(attempts):
+            self._check_breaker()
+            delay = self.latency.percentile(key, self.hedge_quantile) if idempotent and self.hedge_quantile else None
+            try:
+                if delay is not None:
+                    result = await hedged(lambda: self._post_once(body, token, key), delay, RPC_HEDGES.labels(key).inc)
+                else:
+                    result = await self._post_once(body, token, key)
+            except Exception as e:
+                if key == "batch" and isinstance(e, httpx.HTTPStatusError):
+                    # Servers without batch support may reject the array with any status;
+                    # the caller falls back to individual calls, which are counted on their own
+                    raise
+                if is_upstream_failure(e):
+                    self.breaker.record_failure()
+                elif is_rpc_error(e):
+                    # The service answered; an application error is not an outage
+                    self.breaker.record_success()
+                if attempt + 1 >= attempts or not is_retryable(e):
+                    raise
+                RPC_RETRIES.labels(key).inc()
+                backoff = self.retry.delay(attempt)
+                logger.warning("Retrying %s after %s", key, e.__class__.__name__, extra={"attempt": attempt + 1, "backoff": round(backoff, 3)})
+                await asyncio.sleep(backoff)
+                continue
+            self.breaker.record_success()
+            return result
+
+    @staticmethod
+    def _unwrap(response: Dict[str, Any]) -> Any:
+        # Check for JSON-RPC errors
+        if "error" in response:
+            raise RpcError(f"JSON-RPC error: {response['error']}")
+        return response.get("result", {})
+
+    async def call(self, method: str, params: Optional[Dict[str, Any]] = None, request_id: Optional[int] = None, token: str = None) -> Dict[str, Any]:
         """
         Make a JSON-RPC call to the workspace API.
-        
+
+        Batchable read methods are coalesced with other concurrent calls for the
+        same token when a batch window is configured. Concurrent identical
+        idempotent calls for the same token share a single upstream request
+        and receive the same result object, which must not be modified.
+
         Args:
             method: The RPC method name to call
             params: Optional parameters for the method
-            request_id: Request ID for the JSON-RPC call
+            request_id: Request ID for the JSON-RPC call (a unique id is assigned if omitted)
             token: Authentication token for API calls
         Returns:
             The response from the API call
-            
+
         Raises:
-            requests.RequestException: If the HTTP request fails
-            ValueError: If the response contains an error
+            httpx.HTTPError: If the HTTP request fails after any retries
+            RpcError: If the service answered with a JSON-RPC error
+            ValueError: If the response is not valid JSON
+            CircuitOpenError: If the Workspace service has been failing and calls are being refused
         """
-        payload = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "id": request_id,
-            "params": params
-        }
-
-        if token:
-            self.session.headers.update({
-                'Authorization': f'{token}'
-            })
+        payload = self._payload(method, params, request_id)
+        in_flight = RPC_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        status = "error"
 
         try:
-            response = self.session.post(
-                self.workspace_url,
-                data=json.dumps(payload),
-                timeout=30
-            )
-
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            # Check for JSON-RPC errors
-            if "error" in result:
-                raise ValueError(f"JSON-RPC error: {result['error']}")
-            
-            return result.get("result", {})
-        
-        except Exception as e:
-            print(f"error: {e.response.text}")
-        except requests.RequestException as e:
-            raise requests.RequestException(f"HTTP request failed: {e}")
+            if self.singleflight and method in IDEMPOTENT_METHODS:
+                result = await self._call_shared(method, payload, token)
+            else:
+                result = await self._call_upstream(method, payload, token)
+            status = "ok"
+            return result
+
+        except httpx.HTTPStatusError as e:
+            logger.warning("Workspace %s returned HTTP %s", method, e.response.status_code, extra={"body": e.response.text[:500]})
+            if is_rpc_error(e):
+                raise RpcError(f"HTTP request failed with status {e.response.status_code}: {e.response.text[:500]}") from e
+            raise httpx.HTTPError(f"HTTP request failed with status {e.response.status_code}: {e.response.text[:500]}")
+        except httpx.HTTPError as e:
+            raise httpx.HTTPError(f"HTTP request failed: {str(e) or e.__class__.__name__}")
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON response: {e}")
+        finally:
+            RPC_SECONDS.labels(method).observe(time.perf_counter() - start)
+            in_flight.dec()
+            RPC_CALLS.labels(method, status).inc()
 
-    
-    def close(self):
-        """Close the HTTP session."""
-        self.session.close()
-    
-    def __enter__(self):
-        """Context manager entry."""
+    async def _call_upstream(self, method: str, payload: Dict[str, Any], token: Optional[str]) -> Any:
+        if self.batch_window > 0 and method in BATCHABLE_METHODS:
+            return await self._enqueue(payload, token)
+        return self._unwrap(await self._post(payload, token, method in IDEMPOTENT_METHODS))
+
+    @staticmethod
+    def _shared_key(method: str, params: Any, token: Optional[str]) -> Tuple[str, str, str]:
+        # Hash the token so the key identifies the caller without keeping the credential around
+        return token_identity(token) or "", method, json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+    async def _call_shared(self, method: str, payload: Dict[str, Any], token: Optional[str]) -> Any:
+        """Join an identical request already in flight, or start one that later identical calls can join."""
+        key = self._shared_key(method, payload["params"], token)
+        task = self._shared.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call_upstream(method, payload, token))
+            self._shared[key] = task
+
+            def done(finished: asyncio.Future):
+                self._shared.pop(key, None)
+                # Retrieve the error so it is not reported as unhandled when every caller was cancelled
+                if not finished.cancelled():
+                    finished.exception()
+
+            task.add_done_callback(done)
+        else:
+            RPC_SHARED.labels(method).inc()
+        # Shielded so that one caller being cancelled does not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def call_batch(self, calls: List[Tuple[str, Optional[Dict[str, Any]]]], token: str = None, return_exceptions: bool = False) -> List[Any]:
+        """
+        Send several JSON-RPC calls as one JSON-RPC 2.0 batch request.
+
+        Args:
+            calls: List of (method, params) tuples
+            token: Authentication token for API calls
+            return_exceptions: If True, failed calls are returned as exception objects instead of raising
+        Returns:
+            List of results in the same order as calls
+        """
+        payloads = [self._payload(method, params) for method, params in calls]
+        start = time.perf_counter()
+        try:
+            results = await self._send(payloads, token, all(method in IDEMPOTENT_METHODS for method, _ in calls))
+        except Exception:
+            RPC_CALLS.labels("batch", "error").inc()
+            raise
+        finally:
+            RPC_SECONDS.labels("batch").observe(time.perf_counter() - start)
+        for (method, _), result in zip(calls, results):
+            RPC_CALLS.labels(method, "error" if isinstance(result, Exception) else "ok").inc()
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
+
+    async def stream_listing(self, method: str, params: Optional[Dict[str, Any]] = None, token: str = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Make a JSON-RPC call whose result maps paths to lists and yield the entries as they arrive.
+
+        The response body is parsed incrementally, so memory use does not
+        grow with the size of the listing. Stopping iteration early closes the
+        response without reading the rest of it; wrap the iterator in
+        contextlib.aclosing() to make that happen promptly.
+
+        Args:
+            method: The RPC method name to call (e.g. "Workspace.ls")
+            params: Optional parameters for the method
+            token: Authentication token for API calls
+        Yields:
+            (path, entry) tuples in response order
+
+        Raises:
+            httpx.HTTPError: If the HTTP request fails
+            ValueError: If the response contains an error or is not valid JSON
+            CircuitOpenError: If the Workspace service has been failing and calls are being refused
+        """
+        payload = self._payload(method, params)
+        in_flight = RPC_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        status = "error"
+        attempts = 1 + (self.retry.retries if method in IDEMPOTENT_METHODS else 0)
+        try:
+            for attempt in range(attempts):
+                self._check_breaker()
+                started = False
+                try:
+                    async with self.pool.stream(
+                        "POST",
+                        self.workspace_url,
+                        content=json.dumps(payload),
+                        headers=self._headers(token),
+                        **self._request_options()
+                    ) as response:
+                        if response.is_error:
+                            # Read the (small) error body so it can be reported and classified
+                            await response.aread()
+                        response.raise_for_status()
+                        parser = ListingStreamParser()
+                        async for chunk in response.aiter_bytes():
+                            for item in parser.feed(chunk):
+                                started = True
+                                yield item
+                        for item in parser.close():
+                            yield item
+                except Exception as e:
+                    if is_upstream_failure(e):
+                        self.breaker.record_failure()
+                    elif is_rpc_error(e):
+                        self.breaker.record_success()
+                    # Entries already yielded cannot be taken back, so only a failure before the first one is retried
+                    if started or attempt + 1 >= attempts or not is_retryable(e):
+                        raise
+                    RPC_RETRIES.labels(method).inc()
+                    await asyncio.sleep(self.retry.delay(attempt))
+                    continue
+                self.breaker.record_success()
+                break
+            status = "ok"
+        except GeneratorExit:
+            # Closed early by the consumer after reading what it needed
+            status = "ok"
+            raise
+        finally:
+            RPC_SECONDS.labels(method).observe(time.perf_counter() - start)
+            in_flight.dec()
+            RPC_CALLS.labels(method, status).inc()
+
+    async def _send(self, payloads: List[Dict[str, Any]], token: Optional[str], idempotent: bool = True) -> List[Any]:
+        """Send payloads as one batch and route each response back by id."""
+        if len(payloads) == 1:
+            try:
+                return [self._unwrap(await self._post(payloads[0], token, idempotent))]
+            except Exception as e:
+                return [e]
+
+        try:
+            body = await self._post(payloads, token, idempotent)
+        except httpx.HTTPStatusError as e:
+            logger.info("Workspace rejected a batch with HTTP %s; sending the calls individually", e.response.status_code)
+            body = None
+        if not isinstance(body, list):
+            # Upstream rejected the batch array; fall back to individual calls
+            results = await asyncio.gather(*(self._send([payload], token, idempotent) for payload in payloads))
+            return [result for single in results for result in single]
+
+        responses = {response.get("id"): response for response in body if isinstance(response, dict)}
+        results = []
+        for payload in payloads:
+            response = responses.get(payload["id"])
+            if response is None:
+                results.append(ValueError(f"JSON-RPC batch response missing id {payload['id']}"))
+                continue
+            try:
+                results.append(self._unwrap(response))
+            except ValueError as e:
+                results.append(e)
+        return results
+
+    async def _enqueue(self, payload: Dict[str, Any], token: Optional[str]) -> Any:
+        """Add a call to the pending batch for this token and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.get(token)
+        if batch is None:
+            batch = self._pending[token] = []
+            loop.call_later(self.batch_window, self._flush, token, batch)
+        batch.append((payload, future))
+        if len(batch) >= self.max_batch_size:
+            self._flush(token, batch)
+        return await future
+
+    def _flush(self, token: Optional[str], batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        if self._pending.get(token) is not batch:
+            return
+        del self._pending[token]
+        task = asyncio.ensure_future(self._send_batch(token, batch))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(self, token: Optional[str], batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        try:
+            results = await self._send([payload for payload, _ in batch], token)
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def close(self):
+        """Close the connection pool."""
+        await self.pool.close()
+
+    async def __aenter__(self):
+        """Async context manager entry."""
         return self
-    
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit."""
-        self.close()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit."""
+        await self.close()
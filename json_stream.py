@@ -0,0 +1,195 @@
+import codecs
+import json
+from typing import Any, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+class ListingStreamParser:
+    """
+    Incremental parser for JSON-RPC listing responses.
+
+    Extracts (key, entry) pairs from responses shaped like
+    {"result": [{"<path>": [entry, entry, ...], ...}], ...} as bytes arrive,
+    so only the entry being decoded and one network chunk are held in memory.
+    Entries are decoded with the C JSON decoder; only the small outer
+    structure is walked in Python.
+    """
+
+    # Parser states
+    _TOP_START, _TOP_KEY, _RESULT_START, _RESULT_ITEM, _MAP_KEY, _ENTRIES, _DONE = range(7)
+
+    def __init__(self):
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._state = self._TOP_START
+        self._key: Optional[str] = None
+        self._entries_open = False
+        self.error: Any = None
+
+    def feed(self, data: bytes) -> List[Tuple[str, Any]]:
+        """
+        Add bytes from the response and return the entries completed by them.
+
+        Raises:
+            ValueError: If the response carries a JSON-RPC error or is not valid JSON
+        """
+        self._buffer += self._utf8.decode(data)
+        return self._parse()
+
+    def close(self) -> List[Tuple[str, Any]]:
+        """
+        Signal the end of the response and return any remaining entries.
+
+        Raises:
+            ValueError: If the response is truncated or carries a JSON-RPC error
+        """
+        self._buffer += self._utf8.decode(b"", final=True)
+        self._eof = True
+        items = self._parse()
+        if self._state != self._DONE:
+            raise ValueError("Invalid JSON response: truncated listing")
+        return items
+
+    def _skip(self, separators: str = _WHITESPACE) -> Optional[str]:
+        """Skip separators and return the next character without consuming it, or None if more data is needed."""
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer) and buffer[pos] in separators:
+            pos += 1
+        self._pos = pos
+        return buffer[pos] if pos < len(buffer) else None
+
+    def _value(self) -> Tuple[bool, Any]:
+        """Decode one JSON value at the current position; returns (False, None) if more data is needed."""
+        try:
+            value, end = _decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError as e:
+            if self._eof:
+                raise ValueError(f"Invalid JSON response: {e}")
+            return False, None
+        # A number ending exactly at the buffer end may continue in the next chunk
+        if end == len(self._buffer) and not self._eof and isinstance(value, (int, float)):
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _key_and_colon(self) -> Tuple[bool, Optional[str]]:
+        """Decode an object key and the following ':'; restores the position if more data is needed."""
+        start = self._pos
+        complete, key = self._value()
+        if complete and self._skip() == ':':
+            self._pos += 1
+            return True, key
+        if complete and self._skip() is not None:
+            raise ValueError("Invalid JSON response: expected ':'")
+        self._pos = start
+        return False, None
+
+    def _expect(self, char: str) -> bool:
+        next_char = self._skip()
+        if next_char is None:
+            return False
+        if next_char != char:
+            raise ValueError(f"Invalid JSON response: expected '{char}'")
+        self._pos += 1
+        return True
+
+    def _parse(self) -> List[Tuple[str, Any]]:
+        items = []
+        while self._state != self._DONE:
+            state = self._state
+            if state == self._TOP_START:
+                if not self._expect('{'):
+                    break
+                self._state = self._TOP_KEY
+            elif state == self._TOP_KEY:
+                next_char = self._skip(_WHITESPACE + ',')
+                if next_char is None:
+                    break
+                if next_char == '}':
+                    self._pos += 1
+                    self._state = self._DONE
+                    continue
+                key_start = self._pos
+                complete, key = self._key_and_colon()
+                if not complete:
+                    break
+                if key == "result":
+                    self._state = self._RESULT_START
+                    continue
+                complete = self._skip() is not None
+                if complete:
+                    complete, value = self._value()
+                if not complete:
+                    # Re-read the key once the whole value has arrived
+                    self._pos = key_start
+                    break
+                if key == "error" and value is not None:
+                    self.error = value
+                    raise ValueError(f"JSON-RPC error: {value}")
+            elif state == self._RESULT_START:
+                next_char = self._skip()
+                if next_char is None:
+                    break
+                if next_char != '[':
+                    complete, _ = self._value()
+                    if not complete:
+                        break
+                    self._state = self._TOP_KEY
+                    continue
+                self._pos += 1
+                self._state = self._RESULT_ITEM
+            elif state == self._RESULT_ITEM:
+                next_char = self._skip(_WHITESPACE + ',')
+                if next_char is None:
+                    break
+                if next_char == ']':
+                    self._pos += 1
+                    self._state = self._TOP_KEY
+                elif next_char == '{':
+                    self._pos += 1
+                    self._state = self._MAP_KEY
+                else:
+                    complete, _ = self._value()
+                    if not complete:
+                        break
+            elif state == self._MAP_KEY:
+                next_char = self._skip(_WHITESPACE + ',')
+                if next_char is None:
+                    break
+                if next_char == '}':
+                    self._pos += 1
+                    self._state = self._RESULT_ITEM
+                    continue
+                complete, key = self._key_and_colon()
+                if not complete:
+                    break
+                self._key = key
+                self._state = self._ENTRIES
+                self._entries_open = False
+            elif state == self._ENTRIES:
+                if not self._entries_open:
+                    if not self._expect('['):
+                        break
+                    self._entries_open = True
+                next_char = self._skip(_WHITESPACE + ',')
+                if next_char is None:
+                    break
+                if next_char == ']':
+                    self._pos += 1
+                    self._state = self._MAP_KEY
+                    continue
+                complete, entry = self._value()
+                if not complete:
+                    break
+                items.append((self._key, entry))
+
+        # Drop consumed text so the buffer stays around one entry in size
+        if self._pos > 65536:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        return items
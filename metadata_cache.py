@@ -0,0 +1,214 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+CacheKey = Tuple[Optional[str], str, str]
+
+
+def token_identity(token: Optional[str]) -> Optional[str]:
+    """
+    Return the key a caller's cached entries are stored under: a hash of the full token.
+
+    The user name in a token ("un=...") is not verified until upstream sees
+    the token, so it cannot key shared entries; anyone could claim another
+    user's name. Only the same token finds the same entries.
+    """
+    return hashlib.sha256(token.encode()).hexdigest() if token else None
+
+
+class MetadataCache:
+    """
+    In-process TTL/LRU cache for workspace listings and object metadata.
+
+    Entries are keyed by (identity, path, kind) where identity is the
+    token_identity() of the token the entry was fetched with and kind names
+    the call that produced it (e.g. "ls" or "metadata"). Writes invalidate every entry on
+    the written path, under it, or on one of its parent folders.
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 10000):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Seconds an entry stays valid
+            max_entries: Maximum number of entries before least recently used ones are evicted
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        return path.rstrip('/') or '/'
+
+    def get(self, user: Optional[str], path: str, kind: str) -> Optional[Any]:
+        """
+        Return a cached value, or None if it is missing or expired.
+        """
+        key = (user, self._normalize(path), kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def contains(self, user: Optional[str], path: str, kind: str) -> bool:
+        """
+        True if an unexpired entry exists; unlike get(), this leaves hit counters and recency alone.
+        """
+        key = (user, self._normalize(path), kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] >= time.monotonic()
+
+    def set(self, user: Optional[str], path: str, kind: str, value: Any):
+        """
+        Store a value, evicting least recently used entries above max_entries.
+        """
+        key = (user, self._normalize(path), kind)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, paths: Iterable[str]):
+        """
+        Drop entries for all users that a write to any of the given paths may have changed.
+
+        Args:
+            paths: Workspace paths that were written
+        """
+        written = [self._normalize(path) for path in paths if path]
+        if not written:
+            return
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if any(_overlaps(key[1], path) for path in written)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return cache counters.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+class GroupIdCache:
+    """
+    LRU cache of parsed genome/feature group ID lists.
+
+    Entries are keyed by the group's object id and timestamp, so a rewritten
+    group never matches a stale entry and no TTL is needed. Callers must
+    validate the key against current metadata fetched with the user's token
+    before using an entry. The cache is bounded by the total number of IDs held.
+    """
+
+    def __init__(self, max_ids: int = 5_000_000):
+        """
+        Initialize the cache.
+
+        Args:
+            max_ids: Maximum number of IDs held across all groups before least recently used groups are evicted
+        """
+        self.max_ids = max_ids
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[str, ...]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, object_id: str, timestamp: str, id_key: str) -> Optional[Tuple[str, ...]]:
+        """
+        Return the cached IDs for this version of a group, or None.
+        """
+        key = (object_id, timestamp, id_key)
+        with self._lock:
+            ids = self._entries.get(key)
+            if ids is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return ids
+
+    def set(self, object_id: str, timestamp: str, id_key: str, ids: Sequence[str]) -> Tuple[str, ...]:
+        """
+        Store the IDs of a group version and return them as an immutable tuple.
+        """
+        ids = tuple(ids)
+        if not object_id or len(ids) > self.max_ids:
+            return ids
+        key = (object_id, timestamp, id_key)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = ids
+            self._size += len(ids)
+            while self._size > self.max_ids:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+        return ids
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return cache counters.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "groups": len(self._entries),
+                "ids": self._size,
+                "max_ids": self.max_ids,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+                "evictions": self.evictions
+            }
+
+
+def _overlaps(cached_path: str, written_path: str) -> bool:
+    """True if cached_path is written_path, one of its ancestors, or below it."""
+    if cached_path == written_path or '/' in (cached_path, written_path):
+        return True
+    return written_path.startswith(cached_path + '/') or cached_path.startswith(written_path + '/')
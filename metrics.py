@@ -0,0 +1,111 @@
+import contextvars
+import functools
+import time
+from typing import Any, Callable
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+# Tool calls and Workspace RPCs range from milliseconds to minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+TOOL_CALLS = Counter("workspace_mcp_tool_calls_total", "MCP tool calls by tool and status.", ["tool", "status"])
+TOOL_SECONDS = Histogram("workspace_mcp_tool_duration_seconds", "MCP tool call latency.", ["tool"], buckets=LATENCY_BUCKETS)
+TOOLS_IN_FLIGHT = Gauge("workspace_mcp_tool_calls_in_flight", "MCP tool calls currently running.", ["tool"])
+
+RPC_CALLS = Counter("workspace_mcp_rpc_calls_total", "Workspace JSON-RPC calls by method and status.", ["method", "status"])
+RPC_SECONDS = Histogram("workspace_mcp_rpc_duration_seconds", "Workspace JSON-RPC call latency, including batching delay.", ["method"], buckets=LATENCY_BUCKETS)
+RPC_IN_FLIGHT = Gauge("workspace_mcp_rpc_calls_in_flight", "Workspace JSON-RPC calls currently waiting for a response.", ["method"])
+RPC_RETRIES = Counter("workspace_mcp_rpc_retries_total", "Workspace JSON-RPC requests sent again after a retryable failure.", ["method"])
+RPC_HEDGES = Counter("workspace_mcp_rpc_hedged_total", "Workspace JSON-RPC requests duplicated because the first was slower than the hedge delay.", ["method"])
+RPC_SHARED = Counter("workspace_mcp_rpc_shared_total", "Workspace JSON-RPC calls answered by joining an identical request already in flight.", ["method"])
+CIRCUIT_REJECTIONS = Counter("workspace_mcp_circuit_rejections_total", "Workspace JSON-RPC calls refused while the circuit breaker was open.")
+
+TRANSFERS = Counter("workspace_mcp_transfers_total", "File transfers by operation and status.", ["operation", "status"])
+TRANSFER_SECONDS = Histogram("workspace_mcp_transfer_duration_seconds", "File transfer duration by operation.", ["operation"], buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600))
+TRANSFER_BYTES = Counter("workspace_mcp_transfer_bytes_total", "Bytes moved to or from the data store.", ["direction"])
+
+DOWNLOADED_BYTES = TRANSFER_BYTES.labels("download")
+UPLOADED_BYTES = TRANSFER_BYTES.labels("upload")
+
+
+# Set by a tool call that returns an error response; read back when the call ends
+tool_failed: contextvars.ContextVar[bool] = contextvars.ContextVar("tool_failed", default=False)
+
+
+def record_tool_error():
+    """Count the MCP tool call running in this context as failed."""
+    tool_failed.set(True)
+
+
+def instrument_tool(function: Callable) -> Callable:
+    """
+    Decorate an async MCP tool to record its calls, latency and in-flight count.
+
+    A call is counted as an error if the tool called record_tool_error().
+    """
+    name = function.__name__
+    in_flight = TOOLS_IN_FLIGHT.labels(name)
+    seconds = TOOL_SECONDS.labels(name)
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        token = tool_failed.set(False)
+        in_flight.inc()
+        start = time.perf_counter()
+        status = "exception"
+        try:
+            result = await function(*args, **kwargs)
+            status = "error" if tool_failed.get() else "ok"
+            return result
+        finally:
+            seconds.observe(time.perf_counter() - start)
+            in_flight.dec()
+            TOOL_CALLS.labels(name, status).inc()
+            tool_failed.reset(token)
+
+    return wrapper
+
+
+def instrument_transfer(function: Callable) -> Callable:
+    """Decorate an async transfer function to record its count, status and duration."""
+    name = function.__name__
+    seconds = TRANSFER_SECONDS.labels(name)
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = await function(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            seconds.observe(time.perf_counter() - start)
+            TRANSFERS.labels(name, status).inc()
+
+    return wrapper
+
+
+class _PoolCollector:
+    """Reports per-host HttpPool counters as gauges, read from the pool on every scrape."""
+
+    def __init__(self, pool: Any):
+        self.pool = pool
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        in_flight = GaugeMetricFamily("workspace_mcp_pool_in_flight", "Upstream HTTP requests in flight per host.", labels=["host"])
+        waiting = GaugeMetricFamily("workspace_mcp_pool_waiting", "Upstream HTTP requests waiting for a per-host slot.", labels=["host"])
+        for host, stats in self.pool.stats()["hosts"].items():
+            in_flight.add_metric([host], stats["in_flight"])
+            waiting.add_metric([host], stats["waiting"])
+        yield in_flight
+        yield waiting
+
+
+def collect_pool(pool: Any):
+    """Publish per-host HttpPool counters as gauges on every scrape."""
+    REGISTRY.register(_PoolCollector(pool))
@@ -0,0 +1,81 @@
+import sys
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+class ObjectMeta(NamedTuple):
+    """
+    Workspace ObjectMeta tuple with named fields.
+
+    A NamedTuple has no per-instance __dict__, so a record is no larger than
+    the list it is built from. userMeta and autoMeta are kept as the decoded
+    dictionaries and only copied when a record is converted with to_dict().
+    """
+    name: str
+    type: str
+    path: str  # parent folder, with a trailing '/'
+    creation_time: str
+    id: str
+    owner_id: str
+    size: int
+    userMeta: Dict[str, Any]
+    autoMeta: Dict[str, Any]
+    user_permission: str
+    global_permission: str
+    link_reference: str
+
+    @property
+    def full_path(self) -> str:
+        return self.path + self.name
+
+    @classmethod
+    def from_rpc(cls, entry: Any) -> Any:
+        """
+        Build a record from an ObjectMeta list returned by the Workspace service.
+
+        Strings repeated across a listing (type, parent path, owner and
+        permissions) are interned so each distinct value is stored once.
+        Values that are not 12-element lists (e.g. the empty placeholder of a
+        missing object) are returned unchanged.
+        """
+        if type(entry) is cls or not isinstance(entry, list) or len(entry) != 12:
+            return entry
+        name, obj_type, path, creation_time, obj_id, owner_id, size, user_meta, auto_meta, user_permission, global_permission, link_reference = entry
+        return tuple.__new__(cls, (
+            name, _intern(obj_type), _intern(path), creation_time, obj_id, _intern(owner_id), size,
+            user_meta, auto_meta, _intern(user_permission), _intern(global_permission), link_reference
+        ))
+
+    def to_dict(self, fields: Optional[Iterable[str]] = None, skip_empty: bool = False) -> Dict[str, Any]:
+        """
+        Convert the record into a dictionary.
+
+        Args:
+            fields: Field names to keep (all fields by default)
+            skip_empty: Drop fields whose value is None, "" or {}
+        Returns:
+            Dictionary keyed by field name
+        """
+        if fields:
+            wanted = set(fields)
+            return {name: value for name, value in zip(self._fields, self) if name in wanted}
+        if skip_empty:
+            return {name: value for name, value in zip(self._fields, self) if value is not None and value != "" and value != {}}
+        return dict(zip(self._fields, self))
+
+
+def parse_listing(listing: Dict[str, list]) -> Dict[str, list]:
+    """Convert the entries of a Workspace.ls result map ({path: [ObjectMeta, ...]}) into records."""
+    from_rpc = ObjectMeta.from_rpc
+    return {path: [from_rpc(entry) for entry in entries] for path, entries in listing.items()}
+
+
+def parse_get_result(result: Any) -> Any:
+    """Convert the metadata of each [meta, data] pair of a Workspace.get result into a record."""
+    if not result or not isinstance(result[0], list):
+        return result
+    from_rpc = ObjectMeta.from_rpc
+    return [[[from_rpc(item[0]), *item[1:]] if item else item for item in result[0]]]
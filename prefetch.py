@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+PrefetchKey = Tuple[Optional[str], str, str]
+
+
+class Prefetcher:
+    """
+    Budget, background tasks and hit-rate accounting for speculative prefetches.
+
+    After a listing, the workspace functions ask for a share of the user's
+    budget and run the prefetch through spawn(). Each user's budget is a
+    token bucket of `budget` objects refilled over `window` seconds, so one
+    busy user cannot crowd out the others. Users are identified by the
+    metadata_cache.token_identity() of their token, like cache entries.
+    Prefetched entries are recorded
+    with mark() and reported by used() when a later call is answered from
+    them, which gives the hit rate per kind of entry.
+    """
+
+    def __init__(self, budget: int = 200, window: float = 60, max_per_listing: int = 100, max_group_bytes: int = 10 * 1024 * 1024, max_concurrency: int = 4, max_tracked: int = 100000):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            budget: Objects that may be prefetched per user within window seconds
+            window: Seconds over which a user's budget is refilled
+            max_per_listing: Maximum objects prefetched after one listing
+            max_group_bytes: Genome/feature groups larger than this are not prefetched
+            max_concurrency: Prefetches running at once across all users
+            max_tracked: Prefetched entries remembered for hit-rate accounting
+        """
+        self.budget = budget
+        self.window = window
+        self.max_per_listing = max_per_listing
+        self.max_group_bytes = max_group_bytes
+        self.max_concurrency = max_concurrency
+        self.max_tracked = max_tracked
+        self._buckets: "OrderedDict[Optional[str], Tuple[float, float]]" = OrderedDict()
+        self._tracked: "OrderedDict[PrefetchKey, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+        self.prefetched: Dict[str, int] = {}
+        self.used_count: Dict[str, int] = {}
+        self.denied = 0
+        self.failed = 0
+
+    def take(self, user: Optional[str], count: int) -> int:
+        """
+        Take up to count objects from the user's budget and return how many were granted.
+        """
+        if count <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(user, (float(self.budget), now))
+            tokens = min(float(self.budget), tokens + (now - updated) * self.budget / self.window)
+            granted = min(count, int(tokens))
+            self._buckets[user] = (tokens - granted, now)
+            # Idle users have full buckets; forgetting the oldest loses nothing
+            while len(self._buckets) > 10000:
+                self._buckets.popitem(last=False)
+            if granted < count:
+                self.denied += count - granted
+        return granted
+
+    def spawn(self, coroutine: Awaitable[Any]):
+        """
+        Run a prefetch in the background; failures are logged and counted, never raised.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        task = asyncio.ensure_future(self._run(coroutine))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, coroutine: Awaitable[Any]):
+        async with self._semaphore:
+            try:
+                await coroutine
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                logger.debug("Prefetch failed: %s", e)
+
+    def mark(self, user: Optional[str], path: str, kind: str):
+        """
+        Record that the entry of kind (e.g. "metadata" or "group") for path was prefetched.
+        """
+        key = (user, path.rstrip('/'), kind)
+        with self._lock:
+            self._tracked[key] = None
+            self._tracked.move_to_end(key)
+            while len(self._tracked) > self.max_tracked:
+                self._tracked.popitem(last=False)
+            self.prefetched[kind] = self.prefetched.get(kind, 0) + 1
+
+    def used(self, user: Optional[str], path: str, kind: str):
+        """
+        Report a cache hit; counted once if the entry was prefetched.
+        """
+        key = (user, path.rstrip('/'), kind)
+        with self._lock:
+            if key in self._tracked:
+                del self._tracked[key]
+                self.used_count[kind] = self.used_count.get(kind, 0) + 1
+
+    async def wait(self):
+        """Wait for the prefetches currently running, e.g. before measuring."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return prefetch counters and the share of prefetched entries that were used, per kind.
+        """
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "window": self.window,
+                "in_flight": len(self._tasks),
+                "prefetched": dict(self.prefetched),
+                "used": dict(self.used_count),
+                "hit_rate": {
+                    kind: round(self.used_count.get(kind, 0) / count, 4)
+                    for kind, count in self.prefetched.items() if count
+                },
+                "denied_by_budget": self.denied,
+                "failed": self.failed
+            }
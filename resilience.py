@@ -0,0 +1,183 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+# HTTP statuses that indicate an overloaded or restarting upstream rather than a bad request
+RETRYABLE_STATUSES = frozenset({429, 502, 503, 504})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream that is failing."""
+
+
+def is_rpc_error(error: BaseException) -> bool:
+    """
+    True for an HTTP error status that carries a well-formed JSON-RPC error body.
+
+    KBase-style services report application errors such as a missing object
+    or a denied permission as HTTP 500 with a JSON-RPC error object. The
+    service answered, so these say nothing about its health.
+    """
+    if not isinstance(error, httpx.HTTPStatusError) or error.response.status_code in RETRYABLE_STATUSES:
+        return False
+    try:
+        body = error.response.json()
+    except (ValueError, httpx.ResponseNotRead):
+        return False
+    return isinstance(body, dict) and isinstance(body.get("error"), (dict, str))
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """True for errors caused by the upstream being unreachable, slow or overloaded."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        if error.response.status_code in RETRYABLE_STATUSES:
+            return True
+        return error.response.status_code >= 500 and not is_rpc_error(error)
+    return False
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for failures that may succeed when the same idempotent request is sent again."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUSES
+    return False
+
+
+class RetryPolicy:
+    """Number of retries and the "full jitter" exponential backoff between them."""
+
+    def __init__(self, retries: int = 2, base_delay: float = 0.1, max_delay: float = 2.0):
+        """
+        Args:
+            retries: Retries after the first attempt (0 disables retrying)
+            base_delay: Backoff ceiling in seconds before the first retry; doubled for each further retry
+            max_delay: Upper bound of the backoff ceiling in seconds
+        """
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number attempt + 1."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream is unhealthy.
+
+    After failure_threshold consecutive upstream failures the circuit opens
+    and calls fail immediately with CircuitOpenError. Once reset_timeout has
+    passed a single probe call is let through; its success closes the circuit
+    and its failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        Args:
+            failure_threshold: Consecutive upstream failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe call is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        Raise CircuitOpenError if calls are not allowed right now.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                # Let one probe through; another is allowed if it never reports back
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - (now - self.opened_at))
+        raise CircuitOpenError(f"Workspace service is unavailable after {self.failures} consecutive failures; retrying in {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+class LatencyTracker:
+    """Rolling window of recent latencies per key, used to pick the hedging delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, seconds: float):
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, key: str, quantile: float) -> Optional[float]:
+        """Return the given quantile of recent latencies, or None until min_samples have been seen."""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+async def hedged(attempt: Callable[[], Awaitable[Any]], delay: float, on_hedge: Optional[Callable[[], None]] = None) -> Any:
+    """
+    Run attempt(), starting a second identical attempt if the first has not finished after delay seconds.
+
+    The first attempt to succeed wins and the other is cancelled. If both
+    fail, the error of the last one to finish is raised.
+    """
+    tasks = {asyncio.ensure_future(attempt())}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            if on_hedge:
+                on_hedge()
+            tasks.add(asyncio.ensure_future(attempt()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
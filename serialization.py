@@ -0,0 +1,40 @@
+import json
+from object_meta import ObjectMeta
+from typing import Any, Iterable, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def _convert(value: Any, fields: Optional[Iterable[str]]) -> Any:
+    if isinstance(value, ObjectMeta):
+        return value.to_dict(fields, skip_empty=True)
+    if isinstance(value, (list, tuple)):
+        return [_convert(item, fields) for item in value]
+    if isinstance(value, dict):
+        return {key: _convert(item, fields) for key, item in value.items()}
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value
+
+
+def to_json(value: Any, fields: Optional[Iterable[str]] = None) -> str:
+    """
+    Serialize a tool result as compact JSON.
+
+    ObjectMeta records anywhere in the value become objects keyed by field
+    name, optionally projected onto `fields`. Empty fields are dropped when no
+    projection is given.
+
+    Args:
+        value: Result to serialize
+        fields: Optional metadata field names to keep (e.g. ["name", "type", "size"])
+    Returns:
+        Compact JSON string
+    """
+    value = _convert(value, fields)
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
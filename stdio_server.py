@@ -1,24 +1,71 @@
 from fastmcp import FastMCP
 from json_rpc import JsonRpcCaller
+from blob_cache import BlobCache
+from metadata_cache import GroupIdCache, MetadataCache
+from prefetch import Prefetcher
+from resilience import CircuitBreaker, RetryPolicy
+from workspace_context import WorkspaceContext
+from workspace_index import WorkspaceIndex
 from workspace_tools import register_workspace_tools
+from structured_logging import configure_logging, get_logger
 from token_provider import TokenProvider
-import sys
 from typing import Any, List
 import os
 
 workspace_api_url = os.getenv("WORKSPACE_API_URL")
 
+# stdout carries the MCP protocol; logs go to stderr or WORKSPACE_LOG_FILE
+configure_logging(
+    os.getenv("WORKSPACE_LOG_LEVEL", "INFO"),
+    os.getenv("WORKSPACE_LOG_FILE"),
+    float(os.getenv("WORKSPACE_LOG_SAMPLE_RATE", "1"))
+)
+logger = get_logger(__name__)
+
 # Initialize token provider for stdio mode
 token_provider = TokenProvider(mode="stdio")
 
 # Initialize the JSON-RPC caller
-api = JsonRpcCaller(workspace_api_url)
+cache_ttl = float(os.getenv("WORKSPACE_CACHE_TTL", "30"))
+group_cache_max_ids = int(os.getenv("WORKSPACE_GROUP_CACHE_MAX_IDS", "5000000"))
+download_cache_dir = os.getenv("WORKSPACE_DOWNLOAD_CACHE_DIR")
+api = JsonRpcCaller(
+    workspace_api_url,
+    batch_window=float(os.getenv("WORKSPACE_BATCH_WINDOW_MS", "0")) / 1000,
+    retry=RetryPolicy(retries=int(os.getenv("WORKSPACE_RPC_RETRIES", "2"))),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("WORKSPACE_CIRCUIT_FAILURE_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("WORKSPACE_CIRCUIT_RESET_SECONDS", "30"))
+    ),
+    hedge_quantile=float(os.getenv("WORKSPACE_HEDGE_PERCENTILE", "0.95")) if os.getenv("WORKSPACE_HEDGE_REQUESTS", "0") == "1" else None,
+    timeout=float(os.getenv("WORKSPACE_RPC_TIMEOUT")) if os.getenv("WORKSPACE_RPC_TIMEOUT") else None,
+    singleflight=os.getenv("WORKSPACE_SINGLEFLIGHT", "1") == "1"
+)
+
+# The caller and caches the workspace tools share
+ctx = WorkspaceContext(
+    api,
+    cache=MetadataCache(ttl=cache_ttl) if cache_ttl > 0 else None,
+    group_cache=GroupIdCache(max_ids=group_cache_max_ids) if group_cache_max_ids > 0 else None,
+    blob_cache=BlobCache(
+        download_cache_dir,
+        max_bytes=int(os.getenv("WORKSPACE_DOWNLOAD_CACHE_MAX_MB", "10240")) * 1024 * 1024,
+        link=os.getenv("WORKSPACE_DOWNLOAD_CACHE_LINK", "0") == "1"
+    ) if download_cache_dir else None,
+    prefetcher=Prefetcher(
+        budget=int(os.getenv("WORKSPACE_PREFETCH_BUDGET", "200")),
+        window=float(os.getenv("WORKSPACE_PREFETCH_WINDOW_SECONDS", "60")),
+        max_per_listing=int(os.getenv("WORKSPACE_PREFETCH_MAX_PER_LISTING", "100"))
+    ) if os.getenv("WORKSPACE_PREFETCH", "0") == "1" else None,
+    index=WorkspaceIndex() if os.getenv("WORKSPACE_SEARCH_INDEX", "1") == "1" else None,
+    shock_url=os.getenv("WORKSPACE_SHOCK_URL", "https://p3.theseed.org/services/shock_api")
+)
 
 # Create FastMCP server
 mcp = FastMCP("BVBRC Workspace MCP Server")
 
 # Register workspace tools with token provider
-register_workspace_tools(mcp, api, token_provider)
+register_workspace_tools(mcp, ctx, token_provider)
 
 # Add health check tool
 @mcp.tool()
@@ -27,13 +74,13 @@ def health_check() -> str:
     return '{"status": "healthy", "service": "bvbrc-workspace-mcp"}'
 
 def main() -> int:
-    print("Starting BVBRC Workspace MCP FastMCP STDIO Server...", file=sys.stderr)
+    logger.info("Starting BVBRC Workspace MCP FastMCP STDIO Server")
     try:
         mcp.run(transport="stdio")
     except KeyboardInterrupt:
-        print("Server stopped.", file=sys.stderr)
+        logger.info("Server stopped.")
     except Exception as e:
-        print(f"Server error: {e}", file=sys.stderr)
+        logger.error("Server error: %s", e)
         return 1
     
     return 0
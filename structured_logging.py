@@ -0,0 +1,122 @@
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+# Parent of all loggers of this server; it does not propagate to the root logger
+LOGGER_NAME = "workspace_mcp"
+
+# Id of the tool call being handled, attached to every record logged while it runs
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sampled"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return the logger for a module of this server."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including the request id and any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != "request_id":
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _ContextFilter(logging.Filter):
+    """Attach the current request id, and drop a share of records logged with extra={"sampled": True}."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and record.levelno < logging.WARNING and random.random() >= self.sample_rate:
+            return False
+        record.request_id = request_id.get()
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep args and extra fields as they are; the listener thread formats the record
+        return record
+
+
+def configure_logging(level: str = "INFO", log_file: Optional[str] = None, sample_rate: float = 1.0):
+    """
+    Route this server's logs through a queue to a background writer thread.
+
+    Records are handed to an in-memory queue on the calling thread and
+    written as JSON lines to stderr (or log_file) by a QueueListener, so a
+    slow destination never blocks a tool call. Nothing is written to stdout,
+    which carries the MCP protocol in stdio mode.
+
+    Args:
+        level: Minimum level logged (e.g. "DEBUG", "INFO", "WARNING")
+        log_file: File to append logs to instead of stderr
+        sample_rate: Fraction of high-volume records (logged with extra={"sampled": True}) that are kept; warnings and errors are always kept
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    target = logging.FileHandler(log_file) if log_file else logging.StreamHandler(sys.stderr)
+    target.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(_ContextFilter(sample_rate))
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers = [handler]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, target)
+    _listener.start()
+
+
+def _stop():
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_stop)
+
+
+def log_request(function: Callable) -> Callable:
+    """Decorate an async MCP tool so records logged while it runs carry a new request id."""
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        token = request_id.set(uuid.uuid4().hex[:16])
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            request_id.reset(token)
+
+    return wrapper
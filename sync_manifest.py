@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Written into the local directory; never synced itself
+MANIFEST_NAME = ".bvbrc-sync.json"
+
+MANIFEST_VERSION = 1
+
+
+def file_md5(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the hex MD5 of a local file, read in chunk_size pieces."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def local_files(local_dir: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Yield (relative path, stat) for every regular file under local_dir.
+
+    The manifest and unfinished downloads ('.part' files and their '.part.json'
+    state) are skipped. Relative
+    paths use '/' as separator, like workspace paths.
+    """
+    root = os.path.abspath(local_dir)
+    for directory, folders, names in os.walk(root):
+        folders.sort()
+        for name in sorted(names):
+            if name == MANIFEST_NAME or name.endswith((".part", ".part.json")):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            yield relative, stat
+
+
+class SyncManifest:
+    """
+    State of a local directory and a workspace folder at the end of the last sync.
+
+    For every file synced the manifest records the local size and mtime and
+    the workspace object's id, timestamp and size, plus the MD5 when one was
+    computed. A file whose local and workspace state both still match its
+    record has not changed on either side and needs no transfer, which
+    makes re-syncing an unchanged tree cost one listing and one stat per
+    file. The manifest is tied to one workspace folder; syncing the
+    directory with another folder starts from an empty manifest.
+    """
+
+    def __init__(self, local_dir: str, workspace_folder: str):
+        self.path = os.path.join(local_dir, MANIFEST_NAME)
+        self.workspace_folder = workspace_folder.rstrip("/")
+        self.files: Dict[str, Dict[str, Any]] = {}
+
+    def load(self) -> "SyncManifest":
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if data.get("version") == MANIFEST_VERSION and data.get("workspace_folder") == self.workspace_folder:
+            self.files = data.get("files", {})
+        return self
+
+    def save(self):
+        """Write the manifest atomically."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "workspace_folder": self.workspace_folder, "files": self.files}, f, separators=(",", ":"))
+        os.replace(temporary, self.path)
+
+    def unchanged(self, relative: str, stat: Optional[os.stat_result], meta: Any) -> bool:
+        """
+        True if neither the local file nor the workspace object changed since they were last synced.
+
+        Args:
+            relative: Path relative to the synced directory and folder
+            stat: os.stat of the local file, or None if it does not exist
+            meta: ObjectMeta of the workspace object, or None if it does not exist
+        """
+        record = self.files.get(relative)
+        if record is None or stat is None or meta is None:
+            return False
+        return (
+            record["size"] == stat.st_size
+            and record["mtime_ns"] == stat.st_mtime_ns
+            and record["object_id"] == meta.id
+            and record["timestamp"] == meta.creation_time
+        )
+
+    def md5(self, relative: str, stat: os.stat_result) -> Optional[str]:
+        """Return the recorded MD5 of a local file if the file is unchanged since it was computed."""
+        record = self.files.get(relative)
+        if record and record.get("md5") and record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+            return record["md5"]
+        return None
+
+    def record(self, relative: str, stat: os.stat_result, meta: Any, md5: Optional[str] = None):
+        self.files[relative] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "object_id": meta.id,
+            "timestamp": meta.creation_time,
+            "md5": md5
+        }
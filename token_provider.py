@@ -1,8 +1,10 @@
 import os
 import json
-import sys
+from structured_logging import get_logger
 from typing import Optional
 
+logger = get_logger(__name__)
+
 class TokenProvider:
     """Handles token retrieval for both stdio and HTTP modes"""
     
@@ -41,5 +43,5 @@ class TokenProvider:
                 config = json.load(f)
                 self._config_token = config.get("token")
         except Exception as e:
-            print(f"Warning: Could not load token from config: {e}", file=sys.stderr)
+            logger.warning("Could not load token from config: %s", e)
             self._config_token = None
@@ -0,0 +1,662 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from http_pool import HttpPool
+from metadata_cache import token_identity
+from metrics import DOWNLOADED_BYTES, UPLOADED_BYTES, instrument_transfer
+from sync_manifest import file_md5
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_RANGE_SIZE = 16 * 1024 * 1024
+DEFAULT_PART_SIZE = 256 * 1024 * 1024
+MAX_INLINE_BYTES = 1024 * 1024
+
+# Long transfers must not fail on a total-time limit; only stalls are fatal
+TRANSFER_TIMEOUT = httpx.Timeout(30, read=300, write=300)
+
+# Shock answers these for a node that expired or was deleted; retrying cannot help
+NODE_GONE_STATUSES = frozenset({404, 410})
+
+# Parted-upload state names the node a token is sent to, so only its owner may read or write it
+UPLOAD_STATE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "bvbrc-workspace-uploads")
+
+
+def _content_range_total(response: httpx.Response) -> Optional[int]:
+    """Parse the total size from a 'Content-Range: bytes a-b/total' header."""
+    content_range = response.headers.get("content-range", "")
+    total = content_range.rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def _content_range_start(response: httpx.Response) -> Optional[int]:
+    """Parse the first byte from a 'Content-Range: bytes a-b/total' header."""
+    content_range = response.headers.get("content-range", "")
+    if not content_range.startswith("bytes "):
+        return None
+    first = content_range[len("bytes "):].partition("-")[0]
+    return int(first) if first.isdigit() else None
+
+
+def _validator(response: httpx.Response) -> Optional[str]:
+    """Return a value usable in If-Range: a strong ETag, else Last-Modified."""
+    etag = response.headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("last-modified")
+
+
+def _load_part_state(part_file: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(part_file + ".json", "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_part_state(part_file: str, state: Dict[str, Any]):
+    tmp_file = part_file + ".json.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, part_file + ".json")
+
+
+def _discard_part(part_file: str):
+    for path in (part_file, part_file + ".json"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+async def _verify_md5(part_file: str, md5: Optional[str]):
+    """Discard part_file and raise ValueError if its MD5 is not the expected one."""
+    if not md5:
+        return
+    actual = await asyncio.to_thread(file_md5, part_file)
+    if actual != md5.lower():
+        await asyncio.to_thread(_discard_part, part_file)
+        raise ValueError(f"downloaded file has MD5 {actual} but Shock recorded {md5}")
+
+
+@instrument_transfer
+async def stream_download(pool: HttpPool, url: str, output_file: str, headers: Optional[Dict[str, str]] = None, chunk_size: int = DEFAULT_CHUNK_SIZE, retries: int = 3, version: Optional[str] = None, md5: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Stream a URL to disk in fixed-size chunks, resuming partial downloads.
+
+    Data is written to '<output_file>.part' and renamed once complete. Next
+    to it, '<output_file>.part.json' records which object version the
+    partial file holds and the server's validator (ETag or Last-Modified).
+    A partial file left by an earlier attempt is resumed with an HTTP Range
+    request (and If-Range when a validator is known) only if it holds the
+    same version; otherwise it is discarded and the download starts over.
+    Disk writes run in a worker thread so they never block the event loop.
+
+    Args:
+        pool: HttpPool used for the request
+        url: URL to download
+        output_file: Destination file path
+        headers: Extra request headers (e.g. Authorization)
+        chunk_size: Read buffer size in bytes; bounds memory use per download
+        retries: Number of times to resume after a connection failure
+        version: Identifies the object version, e.g. its id, timestamp and size; defaults to the URL without its query, which names an immutable Shock node
+        md5: Checksum Shock recorded for the file; a partial file that does not match is discarded instead of renamed
+    Returns:
+        Dictionary with bytes written, the offset resumed from and elapsed seconds
+    """
+    part_file = output_file + ".part"
+    version = version or url.partition("?")[0]
+    start = time.monotonic()
+    state = await asyncio.to_thread(_load_part_state, part_file)
+    if state is None or state.get("version") != version:
+        # Left by a download of another object or an older version of this one
+        await asyncio.to_thread(_discard_part, part_file)
+        state = None
+    resumed_from = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+    attempt = 0
+
+    while True:
+        offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+        request_headers = dict(headers or {})
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+            if state and state.get("validator"):
+                request_headers["If-Range"] = state["validator"]
+        try:
+            async with pool.stream("GET", url, headers=request_headers, timeout=TRANSFER_TIMEOUT) as response:
+                if response.status_code == 416:
+                    # Range starts at or past the end: the partial file is either complete or invalid
+                    if _content_range_total(response) == offset:
+                        break
+                    await asyncio.to_thread(_discard_part, part_file)
+                    continue
+                response.raise_for_status()
+
+                append = offset > 0 and response.status_code == 206
+                if append and _content_range_start(response) != offset:
+                    # Not the continuation of the partial file; start over
+                    await asyncio.to_thread(_discard_part, part_file)
+                    state = None
+                    continue
+                if not append:
+                    state = {"version": version, "validator": _validator(response)}
+                    await asyncio.to_thread(_save_part_state, part_file, state)
+
+                file = await asyncio.to_thread(open, part_file, "ab" if append else "wb")
+                try:
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        await asyncio.to_thread(file.write, chunk)
+                        DOWNLOADED_BYTES.inc(len(chunk))
+                finally:
+                    await asyncio.to_thread(file.close)
+            break
+        except httpx.TransportError:
+            attempt += 1
+            if attempt > retries:
+                raise
+            await asyncio.sleep(min(2 ** attempt, 10))
+
+    await _verify_md5(part_file, md5)
+    os.replace(part_file, output_file)
+    await asyncio.to_thread(_discard_part, part_file)
+    return {
+        "bytes": os.path.getsize(output_file),
+        "resumed_from": resumed_from,
+        "seconds": round(time.monotonic() - start, 3)
+    }
+
+
+async def _gather_or_cancel(coroutines: List[Any]) -> List[Any]:
+    """Run coroutines concurrently; if one fails, cancel the rest before re-raising."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _probe_size(pool: HttpPool, url: str, headers: Optional[Dict[str, str]]) -> Optional[int]:
+    """Return the object size if the server honours Range requests, otherwise None."""
+    request_headers = dict(headers or {})
+    request_headers["Range"] = "bytes=0-0"
+    async with pool.stream("GET", url, headers=request_headers, timeout=TRANSFER_TIMEOUT) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            return None
+        return _content_range_total(response)
+
+
+async def _fetch_range(pool: HttpPool, url: str, fd: int, first: int, last: int, headers: Optional[Dict[str, str]], chunk_size: int, retries: int) -> int:
+    """Download bytes first..last (inclusive) into fd with positional writes."""
+    attempt = 0
+    while True:
+        request_headers = dict(headers or {})
+        request_headers["Range"] = f"bytes={first}-{last}"
+        position = first
+        try:
+            async with pool.stream("GET", url, headers=request_headers, timeout=TRANSFER_TIMEOUT) as response:
+                response.raise_for_status()
+                if response.status_code != 206 or not response.headers.get("content-range", "").startswith(f"bytes {first}-"):
+                    raise ValueError(f"server did not honour range {first}-{last}")
+                async for chunk in response.aiter_bytes(chunk_size):
+                    if position + len(chunk) > last + 1:
+                        raise ValueError(f"range {first}-{last} returned too many bytes")
+                    await asyncio.to_thread(os.pwrite, fd, chunk, position)
+                    DOWNLOADED_BYTES.inc(len(chunk))
+                    position += len(chunk)
+            if position != last + 1:
+                raise ValueError(f"range {first}-{last} ended early at byte {position}")
+            return position - first
+        except (httpx.TransportError, ValueError):
+            attempt += 1
+            if attempt > retries:
+                raise
+            await asyncio.sleep(min(2 ** attempt, 10))
+
+
+def _open_preallocated(path: str, size: int) -> int:
+    """Create path with size bytes allocated and return a descriptor open for writing."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+        else:
+            os.ftruncate(fd, size)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def _finish_part(fd: int) -> int:
+    """Flush a part file to disk and return its size."""
+    os.fsync(fd)
+    return os.fstat(fd).st_size
+
+
+def _close_part(fd: int, part_file: Optional[str] = None):
+    """Close the descriptor, removing part_file if given."""
+    os.close(fd)
+    if part_file is not None:
+        os.remove(part_file)
+
+
+@instrument_transfer
+async def parallel_download(pool: HttpPool, url: str, output_file: str, headers: Optional[Dict[str, str]] = None, connections: int = 4, range_size: int = DEFAULT_RANGE_SIZE, chunk_size: int = DEFAULT_CHUNK_SIZE, retries: int = 3, expected_size: Optional[int] = None, version: Optional[str] = None, md5: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Download a URL over several concurrent byte-range requests.
+
+    The object is split into range_size pieces that are fetched by up to
+    `connections` workers and written with positional writes into a
+    preallocated '<output_file>.part', which is renamed once every range has
+    been received and the size (and the MD5, when known) verified. File
+    system calls run in worker threads so they never block the event loop.
+    Servers that ignore Range requests fall back to a single streamed download.
+
+    Args:
+        pool: HttpPool used for the requests
+        url: URL to download
+        output_file: Destination file path
+        headers: Extra request headers (e.g. Authorization)
+        connections: Number of concurrent range requests
+        range_size: Size in bytes of each range
+        chunk_size: Read buffer size in bytes per connection
+        retries: Number of times a failed range is retried
+        expected_size: Size the object should have, if known from workspace metadata
+        version: Object version passed on to stream_download for small files
+        md5: Checksum Shock recorded for the file, verified before the part file is renamed
+    Returns:
+        Dictionary with bytes written, number of ranges and elapsed seconds
+    """
+    start = time.monotonic()
+    total = await _probe_size(pool, url, headers)
+    if total is None or total <= range_size:
+        stats = await stream_download(pool, url, output_file, headers, chunk_size, retries, version, md5)
+        stats["ranges"] = 1
+        return stats
+    if expected_size is not None and total != expected_size:
+        raise ValueError(f"server reports {total} bytes but workspace metadata says {expected_size}")
+
+    part_file = output_file + ".part"
+    # The preallocated file replaces any partial single-stream download
+    await asyncio.to_thread(_discard_part, part_file)
+    fd = await asyncio.to_thread(_open_preallocated, part_file, total)
+    try:
+        ranges = [(first, min(first + range_size, total) - 1) for first in range(0, total, range_size)]
+        queue = iter(ranges)
+
+        async def worker() -> int:
+            received = 0
+            for first, last in queue:
+                received += await _fetch_range(pool, url, fd, first, last, headers, chunk_size, retries)
+            return received
+
+        # Remaining workers are cancelled on failure, before the descriptor is closed
+        received = sum(await _gather_or_cancel([worker() for _ in range(min(connections, len(ranges)))]))
+        if received != total or await asyncio.to_thread(_finish_part, fd) != total:
+            raise ValueError(f"reassembled {received} of {total} bytes")
+    except BaseException:
+        await asyncio.to_thread(_close_part, fd, part_file)
+        raise
+    await asyncio.to_thread(_close_part, fd)
+
+    await _verify_md5(part_file, md5)
+    os.replace(part_file, output_file)
+    return {
+        "bytes": total,
+        "ranges": len(ranges),
+        "resumed_from": 0,
+        "seconds": round(time.monotonic() - start, 3)
+    }
+
+
+async def read_bytes(pool: HttpPool, url: str, headers: Optional[Dict[str, str]] = None, max_bytes: int = MAX_INLINE_BYTES) -> bytes:
+    """
+    Read a small download into memory.
+
+    Args:
+        pool: HttpPool used for the request
+        url: URL to download
+        headers: Extra request headers (e.g. Authorization)
+        max_bytes: Largest body that may be read
+    Returns:
+        The body
+
+    Raises:
+        ValueError: If the body is larger than max_bytes
+    """
+    buffer = bytearray()
+    async with pool.stream("GET", url, headers=headers, timeout=TRANSFER_TIMEOUT) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            buffer.extend(chunk)
+            DOWNLOADED_BYTES.inc(len(chunk))
+            if len(buffer) > max_bytes:
+                raise ValueError(f"file is larger than {max_bytes} bytes; provide output_file to save it to disk")
+    return bytes(buffer)
+
+
+def inline_text(data: bytes) -> str:
+    """
+    Decode downloaded content for returning inline.
+
+    Raises:
+        ValueError: If the content is not UTF-8 text; binary content would be corrupted by decoding it
+    """
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        raise ValueError("file is not UTF-8 text; provide output_file to save it to disk")
+
+
+async def read_inline(pool: HttpPool, url: str, headers: Optional[Dict[str, str]] = None, max_bytes: int = MAX_INLINE_BYTES) -> str:
+    """
+    Read a small download into memory as text.
+
+    Args:
+        pool: HttpPool used for the request
+        url: URL to download
+        headers: Extra request headers (e.g. Authorization)
+        max_bytes: Largest body that may be returned inline
+    Returns:
+        The body decoded as UTF-8
+
+    Raises:
+        ValueError: If the body is larger than max_bytes or is not UTF-8 text
+    """
+    return inline_text(await read_bytes(pool, url, headers, max_bytes))
+
+
+async def node_md5(pool: HttpPool, node_url: str, headers: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """
+    Return the MD5 checksum Shock recorded for a node's file, or None if it has none.
+
+    Args:
+        pool: HttpPool used for the request
+        node_url: Shock node URL (the link_reference of a workspace object)
+        headers: Extra request headers (e.g. Authorization)
+    """
+    response = await pool.request("GET", node_url, headers=headers)
+    response.raise_for_status()
+    data = response.json().get("data") or {}
+    return ((data.get("file") or {}).get("checksum") or {}).get("md5") or None
+
+
+class UploadProgress:
+    """Tracks bytes sent for an upload and reports progress at fixed steps."""
+
+    def __init__(self, total: int, callback: Optional[Callable[[int, int, float], None]] = None, step: float = 0.1):
+        """
+        Args:
+            total: Total number of bytes to send
+            callback: Called as callback(bytes_sent, total, bytes_per_second) every `step` of the total
+            step: Fraction of the total between callbacks
+        """
+        self.total = total
+        self.sent = 0
+        self.callback = callback
+        self.step = max(1, int(total * step))
+        self._next_report = self.step
+        self._start = time.monotonic()
+
+    def advance(self, count: int):
+        self.sent += count
+        if self.callback and self.sent >= self._next_report:
+            self._next_report = self.sent + self.step
+            self.callback(self.sent, self.total, self.throughput())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._start
+
+    def throughput(self) -> float:
+        """Average bytes per second since the upload started."""
+        elapsed = self.elapsed()
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "bytes": self.sent,
+            "seconds": round(self.elapsed(), 3),
+            "throughput_mbps": round(self.throughput() * 8 / 1_000_000, 2)
+        }
+
+
+class MultipartFileStream(httpx.AsyncByteStream):
+    """
+    multipart/form-data body holding one file field, read from disk while it is sent.
+
+    Only one chunk of the file is in memory at a time and the Content-Length
+    is known up front, so large files are neither buffered nor sent chunked.
+    """
+
+    def __init__(self, field: str, path: str, offset: int = 0, length: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[UploadProgress] = None):
+        """
+        Args:
+            field: Form field name
+            path: File to send
+            offset: Byte offset of the first byte to send
+            length: Number of bytes to send (defaults to the rest of the file)
+            chunk_size: Read buffer size in bytes
+            progress: Optional UploadProgress updated as chunks are sent
+        """
+        self.path = path
+        self.offset = offset
+        self.length = os.path.getsize(path) - offset if length is None else length
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.sent = 0
+        self.boundary = os.urandom(16).hex()
+        self._head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{os.path.basename(path)}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode()
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(len(self._head) + self.length + len(self._tail))
+        }
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self._head
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            remaining = self.length
+            while remaining:
+                chunk = await asyncio.to_thread(file.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    raise ValueError(f"{self.path} shrank while uploading")
+                remaining -= len(chunk)
+                self.sent += len(chunk)
+                UPLOADED_BYTES.inc(len(chunk))
+                if self.progress:
+                    self.progress.advance(len(chunk))
+                yield chunk
+        yield self._tail
+
+
+def _upload_state_dir() -> str:
+    """Create the upload state directory if needed, private to the current user."""
+    os.makedirs(UPLOAD_STATE_DIR, mode=0o700, exist_ok=True)
+    info = os.stat(UPLOAD_STATE_DIR)
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise PermissionError(f"{UPLOAD_STATE_DIR} belongs to another user")
+    if info.st_mode & 0o077:
+        os.chmod(UPLOAD_STATE_DIR, 0o700)
+    return UPLOAD_STATE_DIR
+
+
+def _upload_state_file(filename: str, token: Optional[str]) -> str:
+    # Keyed by token too, so one user's state is never resumed with another's token
+    key = hashlib.sha256(f"{token_identity(token)}\0{os.path.abspath(filename)}".encode()).hexdigest()
+    return os.path.join(_upload_state_dir(), key + ".json")
+
+
+def _load_upload_state(filename: str, token: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Return saved parted-upload state if it still matches the file on disk."""
+    try:
+        with open(_upload_state_file(filename, token), "r") as f:
+            state = json.load(f)
+        stat = os.stat(filename)
+    except (OSError, ValueError):
+        return None
+    if state.get("size") != stat.st_size or state.get("mtime") != stat.st_mtime:
+        return None
+    return state
+
+
+def _save_upload_state(filename: str, token: Optional[str], state: Dict[str, Any]):
+    state_file = _upload_state_file(filename, token)
+    tmp_file = state_file + ".tmp"
+    with open(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+
+def _clear_upload_state(filename: str, token: Optional[str]):
+    try:
+        os.remove(_upload_state_file(filename, token))
+    except OSError:
+        pass
+
+
+def _same_origin(url: str, other: str) -> bool:
+    first, second = urlsplit(url), urlsplit(other)
+    return (first.scheme, first.netloc.lower()) == (second.scheme, second.netloc.lower())
+
+
+def discard_pending_upload(filename: str, token: str):
+    """Forget an unfinished parted upload of filename, so the next upload starts with a new node."""
+    _clear_upload_state(filename, token)
+
+
+def pending_upload_url(filename: str, workspace_path: str, token: str, shock_url: Optional[str]) -> Optional[str]:
+    """
+    Return the upload URL of an unfinished parted upload of filename to workspace_path.
+
+    Used to resume an interrupted upload into the same Shock node instead of
+    creating a new workspace object. Only state saved with the same token is
+    found, and a URL that is not on the shock_url host is never returned, so
+    the token is not sent anywhere else. Without shock_url nothing is resumed.
+    """
+    state = _load_upload_state(filename, token) if shock_url else None
+    if not state or state.get("workspace_path") != workspace_path:
+        return None
+    url = state.get("url")
+    if not isinstance(url, str) or not _same_origin(url, shock_url):
+        _clear_upload_state(filename, token)
+        return None
+    return url
+
+
+async def _put_form(pool: HttpPool, url: str, headers: Dict[str, str], fields: Dict[str, str]) -> httpx.Response:
+    files = {name: (None, value) for name, value in fields.items()}
+    response = await pool.request("PUT", url, files=files, headers=headers, timeout=TRANSFER_TIMEOUT)
+    response.raise_for_status()
+    return response
+
+
+async def _put_file(pool: HttpPool, url: str, headers: Dict[str, str], field: str, path: str, offset: int, length: int, chunk_size: int, progress: UploadProgress) -> httpx.Response:
+    stream = MultipartFileStream(field, path, offset, length, chunk_size, progress)
+    try:
+        response = await pool.request("PUT", url, content=stream, headers={**headers, **stream.headers}, timeout=TRANSFER_TIMEOUT)
+        response.raise_for_status()
+    except BaseException:
+        # Bytes of a failed attempt will be sent again
+        progress.sent -= stream.sent
+        raise
+    return response
+
+
+@instrument_transfer
+async def stream_upload(pool: HttpPool, filename: str, upload_url: str, headers: Optional[Dict[str, str]] = None, chunk_size: int = DEFAULT_CHUNK_SIZE, part_size: int = DEFAULT_PART_SIZE, part_concurrency: int = 2, retries: int = 3, workspace_path: Optional[str] = None, progress_callback: Optional[Callable[[int, int, float], None]] = None, token: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Upload a file to a Shock node without holding it in memory.
+
+    Files up to part_size are sent as a single streamed multipart PUT. Larger
+    files use Shock's parted upload: the node is set to the number of parts and
+    each part is sent as its own PUT. Finished parts are recorded in a state
+    file under UPLOAD_STATE_DIR, keyed by token and file, so calling this
+    again after a failure only sends the missing parts.
+
+    Args:
+        pool: HttpPool used for the requests
+        filename: Local file to upload
+        upload_url: Shock node URL returned by Workspace.create
+        headers: Extra request headers (e.g. Authorization)
+        chunk_size: Read buffer size in bytes
+        part_size: Size of each part in bytes for parted uploads
+        part_concurrency: Number of parts sent at once
+        retries: Number of times a failed part is retried
+        workspace_path: Workspace destination, recorded so the upload can be resumed
+        progress_callback: Called as callback(bytes_sent, total, bytes_per_second) every 10%
+        token: Authentication token the upload state is kept under
+    Returns:
+        Dictionary with bytes sent, parts, elapsed seconds and throughput
+    """
+    headers = dict(headers or {})
+    size = os.path.getsize(filename)
+
+    if size <= part_size:
+        progress = UploadProgress(size, progress_callback)
+        await _put_file(pool, upload_url, headers, "upload", filename, 0, size, chunk_size, progress)
+        return {**progress.summary(), "parts": 1}
+
+    parts = (size + part_size - 1) // part_size
+    state = _load_upload_state(filename, token)
+    if not state or state.get("url") != upload_url or state.get("part_size") != part_size:
+        await _put_form(pool, upload_url, headers, {"parts": str(parts)})
+        stat = os.stat(filename)
+        state = {
+            "url": upload_url,
+            "workspace_path": workspace_path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "part_size": part_size,
+            "done": []
+        }
+        _save_upload_state(filename, token, state)
+
+    done = set(state["done"])
+    todo = iter([number for number in range(1, parts + 1) if number not in done])
+    remaining = size - sum(min(part_size, size - (number - 1) * part_size) for number in done)
+    progress = UploadProgress(remaining, progress_callback)
+
+    async def worker():
+        for number in todo:
+            offset = (number - 1) * part_size
+            length = min(part_size, size - offset)
+            attempt = 0
+            while True:
+                try:
+                    await _put_file(pool, upload_url, headers, str(number), filename, offset, length, chunk_size, progress)
+                    break
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    attempt += 1
+                    if attempt > retries or isinstance(e, httpx.HTTPStatusError) and e.response.status_code in NODE_GONE_STATUSES:
+                        raise
+                    await asyncio.sleep(min(2 ** attempt, 10))
+            state["done"].append(number)
+            _save_upload_state(filename, token, state)
+
+    try:
+        await _gather_or_cancel([worker() for _ in range(min(part_concurrency, parts))])
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code in NODE_GONE_STATUSES:
+            # The recorded parts went with the node
+            _clear_upload_state(filename, token)
+        raise
+    _clear_upload_state(filename, token)
+    return {**progress.summary(), "parts": parts, "resumed_parts": len(done)}
@@ -0,0 +1,35 @@
+from typing import Optional
+
+from blob_cache import BlobCache
+from json_rpc import JsonRpcCaller
+from metadata_cache import GroupIdCache, MetadataCache
+from prefetch import Prefetcher
+from workspace_index import WorkspaceIndex
+
+
+class WorkspaceContext:
+    """The JSON-RPC caller and the optional local caches shared by the workspace functions."""
+
+    def __init__(self, rpc: JsonRpcCaller, cache: Optional[MetadataCache] = None, group_cache: Optional[GroupIdCache] = None, blob_cache: Optional[BlobCache] = None, index: Optional[WorkspaceIndex] = None, prefetcher: Optional[Prefetcher] = None, shock_url: Optional[str] = None):
+        """
+        Args:
+            rpc: JsonRpcCaller used for every call to the Workspace service
+            cache: Optional MetadataCache for listings and metadata
+            group_cache: Optional GroupIdCache of parsed genome/feature group ID lists
+            blob_cache: Optional on-disk BlobCache of downloaded objects
+            index: Optional WorkspaceIndex used to answer searches locally
+            prefetcher: Optional Prefetcher that warms the metadata and group caches after listings
+            shock_url: Shock service URL; interrupted uploads are only resumed into nodes on its host
+        """
+        self.rpc = rpc
+        self.cache = cache
+        self.group_cache = group_cache
+        self.blob_cache = blob_cache
+        self.index = index
+        self.prefetcher = prefetcher
+        self.shock_url = shock_url
+
+    @property
+    def pool(self):
+        """The HttpPool used for Workspace calls and Shock transfers."""
+        return self.rpc.pool
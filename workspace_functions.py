@@ -1,131 +1,579 @@
-from json_rpc import JsonRpcCaller
-from typing import List, Any
-import requests
+from json_rpc import RpcError
+from metadata_cache import token_identity
+from object_meta import ObjectMeta, parse_listing, parse_get_result
+from structured_logging import get_logger
+from workspace_context import WorkspaceContext
+from workspace_index import search_mode
+from transfers import (
+    DEFAULT_CHUNK_SIZE, DEFAULT_RANGE_SIZE, MAX_INLINE_BYTES, stream_download, parallel_download, read_bytes, inline_text,
+    stream_upload, pending_upload_url, discard_pending_upload, node_md5
+)
+from sync_manifest import SyncManifest, file_md5, local_files
+from typing import Dict, List, Any, Sequence, Set, Tuple
+from collections import Counter
+from contextlib import aclosing
+from urllib.parse import unquote
+import asyncio
+import base64
+import glob
+import httpx
 import os
+import re
+import time
 import json
 
-def workspace_ls(api: JsonRpcCaller, paths: List[str], token: str) -> List[str]:
+logger = get_logger(__name__)
+
+
+class ErrorList(list):
+    """
+    Result of a failed call: a one-element list holding the error message.
+
+    It serializes like the plain list it replaces, but marks the result as a
+    failure so callers need not inspect the message.
+    """
+
+    def __init__(self, message: str):
+        super().__init__([message])
+
+
+async def workspace_ls(ctx: WorkspaceContext, paths: List[str], token: str) -> List[str]:
     """
     List workspace contents using the JSON-RPC API.
     
     Args:
-        api: JsonRpcCaller instance configured with workspace URL and token
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
         paths: List of paths to list
         token: Authentication token for API calls
     Returns:
         List of workspace items
     """
+    cache = ctx.cache
+    identity = token_identity(token)
+    listing = {}
+    uncached_paths = paths
+    if cache is not None:
+        uncached_paths = []
+        for path in paths:
+            entries = cache.get(identity, path, "ls")
+            if entries is None:
+                uncached_paths.append(path)
+            else:
+                listing[path] = entries
+        if not uncached_paths:
+            return [listing]
+
     try:
-        result = api.call("Workspace.ls", {
+        result = await ctx.rpc.call("Workspace.ls", {
             "Recursive": False,
             "includeSubDirs": False,
-            "paths": paths
-        },1, token)
+            "paths": uncached_paths
+        }, token=token)
+        if result and isinstance(result[0], dict):
+            parsed = parse_listing(result[0])
+            if cache is not None:
+                for path, entries in parsed.items():
+                    cache.set(identity, path, "ls", entries)
+            listing.update(parsed)
+            _prefetch_listing(ctx, identity, token, parsed)
+            return [listing]
         return result
     except Exception as e:
-        return [f"Error listing workspace: {str(e)}"]
+        return ErrorList(f"Error listing workspace: {str(e)}")
 
-def workspace_search(api: JsonRpcCaller, paths: List[str] = None, search_term: str = None, token: str = None) -> str:
+# Group object types and the key their IDs are stored under
+GROUP_ID_KEYS = {"genome_group": "genome_id", "feature_group": "feature_id"}
+
+def _prefetch_listing(ctx: WorkspaceContext, identity: str, token: str, listing: dict):
+    """
+    Start warming the metadata cache, and the group cache for groups, for objects just listed.
+
+    Agents usually follow a listing with metadata or group ID calls on a few
+    of its entries. Only objects not already cached are prefetched, within
+    the user's prefetch budget.
+    """
+    prefetcher = ctx.prefetcher
+    if prefetcher is None or ctx.cache is None:
+        return
+    objects = [
+        meta for entries in listing.values() for meta in entries
+        if isinstance(meta, ObjectMeta) and meta.type != "folder" and not ctx.cache.contains(identity, meta.full_path, "metadata")
+    ][:prefetcher.max_per_listing]
+    granted = prefetcher.take(identity, len(objects))
+    if granted:
+        prefetcher.spawn(_prefetch_objects(ctx, identity, token, objects[:granted]))
+
+async def _prefetch_objects(ctx: WorkspaceContext, identity: str, token: str, objects: List[ObjectMeta]):
+    prefetcher = ctx.prefetcher
+    paths = [meta.full_path for meta in objects]
+    result = await ctx.rpc.call("Workspace.get", {
+        "objects": paths,
+        "metadata_only": True
+    }, token=token)
+    if not result or not isinstance(result[0], list) or len(result[0]) != len(paths):
+        raise ValueError(f"unexpected Workspace.get response: {result}")
+
+    groups = []
+    for path, item in zip(paths, result[0]):
+        if not item or not item[0]:
+            continue
+        meta = ObjectMeta.from_rpc(item[0])
+        ctx.cache.set(identity, path, "metadata", [[[meta, *item[1:]]]])
+        if meta.type in GROUP_ID_KEYS and ctx.group_cache is not None and meta.size <= prefetcher.max_group_bytes:
+            groups.append((path, GROUP_ID_KEYS[meta.type]))
+        else:
+            prefetcher.mark(identity, path, "metadata")
+
+    for path, id_key in groups:
+        # Groups cost a full download each, so they are charged to the budget again
+        if prefetcher.take(identity, 1):
+            await _load_group_ids(ctx, path, id_key, token)
+            prefetcher.mark(identity, path, "group")
+        # Marked only after loading, so the loader's own metadata lookup is not counted as a use
+        prefetcher.mark(identity, path, "metadata")
+
+def _encode_cursor(state: dict) -> str:
+    """Encode paging state as an opaque cursor string."""
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode()
+
+def _decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by _encode_cursor."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a shell-style glob into an anchored regular expression for Workspace.ls queries."""
+    parts = ['.*' if char == '*' else '.' if char == '?' else re.escape(char) for char in pattern]
+    return '^' + ''.join(parts) + '$'
+
+async def workspace_search(ctx: WorkspaceContext, paths: List[str] = None, search_term: str = None, token: str = None, limit: int = None, offset: int = 0, cursor: str = None, match_mode: str = None) -> Any:
     """
     Search the workspace for a given term.
+
+    Without a limit the full upstream result is returned. With a limit,
+    searches under the user's home are answered from the local name index
+    when it is warm. Otherwise the upstream response is consumed as a stream
+    and closed as soon as the requested page (plus one look-ahead match) has
+    arrived, so memory and response size scale with the page rather than
+    with the workspace tree.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        paths: Paths to search under (defaults to /<user_id>/home)
+        search_term: Case-insensitive term matched against object names
+        token: Authentication token for API calls
+        limit: Maximum number of matches to return
+        offset: Number of matches to skip
+        cursor: Cursor returned by a previous page; replaces paths, search_term and offset
+        match_mode: "substring", "prefix", "glob" or "regex"; by default plain terms match as substrings and others as regular expressions
+    Returns:
+        The raw listing without a limit, otherwise a page dictionary with results and next_cursor
     """
+    cursor_source = None
+    if cursor:
+        try:
+            state = _decode_cursor(cursor)
+            paths, search_term, offset = state["paths"], state["term"], state["offset"]
+            limit = limit if limit is not None else state["limit"]
+            match_mode = state.get("mode")
+            cursor_source = state.get("source")
+        except (ValueError, KeyError) as e:
+            return ErrorList(f"Error searching workspace: {str(e)}")
     if not paths:
         user_id = _get_user_id_from_token(token)
         if not user_id:
-            return [f"Error searching workspace: unable to derive user id from token"]
+            return ErrorList(f"Error searching workspace: unable to derive user id from token")
         paths = [f"/{user_id}/home"]
     if not search_term:
-        return [f"Error searching workspace: search_term parameter is required"]
-    
-    try:
-        result = api.call("Workspace.ls", {
-            "recursive": True,
-            "excludeDirectories": False,
-            "excludeObjects": False,
-            "includeSubDirs": True,
-            "paths": paths,
-            "query": {
-                "name": {
-                    "$regex": search_term,
-                    "$options": "i"
-                }
+        return ErrorList(f"Error searching workspace: search_term parameter is required")
+    if limit is not None and limit < 1:
+        return ErrorList(f"Error searching workspace: limit must be at least 1")
+
+    mode = search_mode(search_term, match_mode)
+    if mode == "substring":
+        pattern = re.escape(search_term)
+    elif mode == "prefix":
+        pattern = '^' + re.escape(search_term)
+    elif mode == "glob":
+        pattern = _glob_to_regex(search_term)
+    else:
+        pattern = search_term
+
+    params = {
+        "recursive": True,
+        "excludeDirectories": False,
+        "excludeObjects": False,
+        "includeSubDirs": True,
+        "paths": paths,
+        "query": {
+            "name": {
+                "$regex": pattern,
+                "$options": "i"
             }
-        },1, token)
-        return result
-    except Exception as e:
-        return [f"Error searching workspace: {str(e)}"]
+        }
+    }
+
+    if limit is None:
+        try:
+            result = await ctx.rpc.call("Workspace.ls", params, token=token)
+            if result and isinstance(result[0], dict):
+                return [parse_listing(result[0])]
+            return result
+        except Exception as e:
+            return ErrorList(f"Error searching workspace: {str(e)}")
+
+    offset = max(0, offset or 0)
+    results = []
+    has_more = False
+    source = "workspace"
+
+    # Later pages come from the same source as the first, since the index and upstream order results differently
+    indexed = None
+    if ctx.index is not None and cursor_source != "workspace":
+        try:
+            indexed = await ctx.index.search(ctx.rpc, _get_user_id_from_token(token), token, search_term, mode, paths)
+        except re.error as e:
+            return ErrorList(f"Error searching workspace: invalid regular expression: {str(e)}")
+    if indexed is None and cursor_source == "index":
+        return ErrorList(f"Error searching workspace: cursor expired, start the search again without a cursor")
 
-def workspace_get_file_metadata(api: JsonRpcCaller, path: str, token: str) -> str:
+    if indexed is not None:
+        source = "index"
+        results = indexed[offset:offset + limit]
+        has_more = len(indexed) > offset + limit
+    else:
+        seen = 0
+        try:
+            async with aclosing(ctx.rpc.stream_listing("Workspace.ls", params, token)) as entries:
+                async for _, entry in entries:
+                    seen += 1
+                    if seen <= offset:
+                        continue
+                    if len(results) == limit:
+                        # One match past the page: there is a next page, stop reading upstream
+                        has_more = True
+                        break
+                    results.append(ObjectMeta.from_rpc(entry))
+        except Exception as e:
+            return ErrorList(f"Error searching workspace: {str(e)}")
+
+    next_offset = offset + len(results)
+    return {
+        "results": results,
+        "offset": offset,
+        "limit": limit,
+        "count": len(results),
+        "has_more": has_more,
+        "source": source,
+        "next_cursor": _encode_cursor({"paths": paths, "term": search_term, "mode": match_mode, "offset": next_offset, "limit": limit, "source": source}) if has_more else None
+    }
+
+async def workspace_get_file_metadata(ctx: WorkspaceContext, path: str, token: str) -> str:
     """
     Get the metadata of a file from the workspace using the JSON-RPC API.
     
     Args:
-        api: JsonRpcCaller instance configured with workspace URL and token
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
         path: Path to the file to get the metadata of
         token: Authentication token for API calls
     Returns:
         String representation of the file metadata
     """
+    cache = ctx.cache
+    identity = token_identity(token)
+    if cache is not None:
+        cached = cache.get(identity, path, "metadata")
+        if cached is not None:
+            if ctx.prefetcher is not None:
+                ctx.prefetcher.used(identity, path, "metadata")
+            return cached
+
     try:
-        result = api.call("Workspace.get", {
+        result = await ctx.rpc.call("Workspace.get", {
             "objects": [path],
             "metadata_only": True
-        },1, token)
+        }, token=token)
+        result = parse_get_result(result)
+        if cache is not None and result:
+            cache.set(identity, path, "metadata", result)
         return result
     except Exception as e:
-        return [f"Error getting file metadata: {str(e)}"]
+        return ErrorList(f"Error getting file metadata: {str(e)}")
+
+
+async def _current_metadata(ctx: WorkspaceContext, path: str, token: str) -> Any:
+    """
+    Return the ObjectMeta of path, or None if it cannot be read with this token.
+    """
+    result = await workspace_get_file_metadata(ctx, path, token)
+    meta = result[0][0][0] if isinstance(result, list) and result and isinstance(result[0], list) and result[0] and result[0][0] else None
+    return meta if isinstance(meta, ObjectMeta) else None
+
+
+async def _fresh_metadata(ctx: WorkspaceContext, path: str, token: str) -> Any:
+    """
+    Return the ObjectMeta of path fetched from upstream with this token, bypassing the metadata cache, or None.
+
+    The metadata cache is refreshed with the result, since it is current.
+    """
+    try:
+        result = parse_get_result(await ctx.rpc.call("Workspace.get", {
+            "objects": [path],
+            "metadata_only": True
+        }, token=token))
+    except Exception as e:
+        logger.debug("Metadata lookup for %s failed: %s", path, e)
+        return None
+    meta = result[0][0][0] if isinstance(result, list) and result and isinstance(result[0], list) and result[0] and result[0][0] else None
+    if not isinstance(meta, ObjectMeta):
+        return None
+    if ctx.cache is not None:
+        ctx.cache.set(token_identity(token), path, "metadata", result)
+    return meta
+
 
+def _object_version(meta: ObjectMeta) -> str:
+    """Identify one version of an object, so a partial download is only resumed into the same version."""
+    return f"{meta.id}:{meta.creation_time}:{meta.size}"
 
-def workspace_download_file(api: JsonRpcCaller, path: str, token: str, output_file: str = None) -> str:
+
+def _store_download(store: Any, meta: ObjectMeta, content: Any):
+    # A download that cannot be cached has still succeeded
+    try:
+        store(meta.id, meta.creation_time, content)
+    except OSError as e:
+        logger.warning("Could not add %s to the download cache: %s", meta.full_path, e)
+
+
+async def workspace_download_file(ctx: WorkspaceContext, path: str, token: str, output_file: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE, parallel_connections: int = 1, range_size: int = DEFAULT_RANGE_SIZE) -> str:
     """
     Download a file from the workspace using the JSON-RPC API.
-    
+
+    With output_file the content is streamed to disk in chunk_size pieces, so
+    memory use does not depend on the file size, and an interrupted download
+    is resumed from its partial file. With parallel_connections > 1 large files
+    are fetched as concurrent byte ranges and verified against the size and
+    Shock MD5 in the workspace metadata. Without output_file, small UTF-8
+    text files are returned inline; other content must be saved to output_file.
+
+    With a download cache, the object's current id and timestamp are looked
+    up first with an uncached metadata-only call made with the caller's
+    token; a version that was downloaded before is copied (or hard linked)
+    from the local cache instead of being transferred again.
+
     Args:
-        api: JsonRpcCaller instance configured with workspace URL and token
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
         path: Path to the file to download
         token: Authentication token for API calls
         output_file: Name and path of the file to save the downloaded content to.
+        chunk_size: Buffer size in bytes used while streaming to disk
+        parallel_connections: Number of concurrent range requests used for large files
+        range_size: Size in bytes of each range when downloading in parallel
     Returns:
-        String representation of the downloaded file
+        Status message, or the file content when no output_file is given
     """
     try:
-        download_url_obj = _get_download_url(api, path, token)
+        blob_cache = ctx.blob_cache
+        meta = None
+        if blob_cache is not None:
+            # Uncached, so an overwrite made elsewhere (web UI, another server) is seen at once,
+            # and only a token upstream accepts for this object finds it
+            meta = await _fresh_metadata(ctx, path, token)
+            cached = blob_cache.get(meta.id, meta.creation_time) if meta is not None else None
+            if cached:
+                try:
+                    if output_file:
+                        size = await asyncio.to_thread(blob_cache.copy_to, cached, output_file)
+                        return f"File copied from the download cache to {output_file} ({size} bytes)"
+                    data = await asyncio.to_thread(blob_cache.read, cached, MAX_INLINE_BYTES)
+                    if data is None:
+                        raise ValueError(f"file is larger than {MAX_INLINE_BYTES} bytes; provide output_file to save it to disk")
+                    return inline_text(data)
+                except OSError as e:
+                    # Evicted since the lookup, or unreadable: download it instead
+                    logger.warning("Download cache entry for %s could not be used: %s", path, e)
+
+        download_url_obj = await _get_download_url(ctx, path, token)
         download_url = download_url_obj[0][0]
         
         headers = {
             "Authorization": token
         }
-        
-        response = requests.get(download_url, headers=headers)
-        response.raise_for_status()
 
         if output_file:
-            with open(output_file, 'wb') as file:
-                file.write(response.content)
-            return f"File downloaded and saved to {output_file}"
+            md5 = None
+            if parallel_connections > 1:
+                # The reassembled file is checked against the size and checksum the workspace records
+                if meta is None:
+                    meta = await _fresh_metadata(ctx, path, token)
+                if meta is not None and meta.link_reference:
+                    try:
+                        md5 = await node_md5(ctx.pool, meta.link_reference, {"Authorization": "OAuth " + token})
+                    except Exception as e:
+                        logger.warning("Checksum lookup failed", extra={"path": path, "error": str(e)})
+            version = _object_version(meta) if meta is not None else None
+            if parallel_connections > 1:
+                expected_size = meta.size if meta is not None else None
+                stats = await parallel_download(ctx.pool, download_url, output_file, headers, parallel_connections, range_size, chunk_size, expected_size=expected_size, version=version, md5=md5)
+            else:
+                stats = await stream_download(ctx.pool, download_url, output_file, headers, chunk_size, version=version)
+            if blob_cache is not None and meta is not None:
+                await asyncio.to_thread(_store_download, blob_cache.put_file, meta, output_file)
+            message = f"File downloaded and saved to {output_file} ({stats['bytes']} bytes)"
+            if stats["resumed_from"]:
+                message += f", resumed from byte {stats['resumed_from']}"
+            return message
         else:
-            return response.content
+            data = await read_bytes(ctx.pool, download_url, headers)
+            if blob_cache is not None and meta is not None:
+                await asyncio.to_thread(_store_download, blob_cache.put_bytes, meta, data)
+            return inline_text(data)
     except Exception as e:
-        return [f"Error downloading file: {str(e)}"]
+        return ErrorList(f"Error downloading file: {str(e)}")
 
-def _get_download_url(api: JsonRpcCaller, path: str, token: str) -> str:
+async def _get_download_url(ctx: WorkspaceContext, path: str, token: str) -> str:
     """
     Get the download URL of a file from the workspace using the JSON-RPC API.
     
     Args:
-        api: JsonRpcCaller instance configured with workspace URL and token
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
         path: Path to the file to get the download URL of
         token: Authentication token for API calls
     Returns:
         String representation of the download URL
     """
     try:
-        result = api.call("Workspace.get_download_url", {
+        result = await ctx.rpc.call("Workspace.get_download_url", {
             "objects": [path],
-        },1, token)
+        }, token=token)
         return result
     except Exception as e:
-        return [f"Error getting download URL: {str(e)}"]
+        return ErrorList(f"Error getting download URL: {str(e)}")
+
+async def _get_download_urls(ctx: WorkspaceContext, paths: List[str], token: str, chunk_size: int = 1000) -> List[str]:
+    """
+    Resolve download URLs for many objects, one Workspace.get_download_url call per chunk of paths.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        paths: Paths of the objects to resolve
+        token: Authentication token for API calls
+        chunk_size: Maximum number of paths sent in one call
+    Returns:
+        Download URLs in the same order as paths
+
+    Raises:
+        ValueError: If the workspace does not return one URL per path
+    """
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    results = await asyncio.gather(*(
+        ctx.rpc.call("Workspace.get_download_url", {"objects": chunk}, token=token)
+        for chunk in chunks
+    ))
+    urls = []
+    for chunk, result in zip(chunks, results):
+        if not result or not isinstance(result[0], list) or len(result[0]) != len(chunk):
+            raise ValueError(f"unexpected get_download_url response: {result}")
+        urls.extend(result[0])
+    return urls
+
+async def _list_folder_objects(ctx: WorkspaceContext, folder: str, token: str, recursive: bool = False) -> List[list]:
+    """
+    List the non-folder objects in a workspace folder.
+    """
+    if recursive:
+        result = await ctx.rpc.call("Workspace.ls", {
+            "paths": [folder],
+            "recursive": True,
+            "excludeDirectories": True
+        }, token=token)
+        if result and isinstance(result[0], dict):
+            result = [parse_listing(result[0])]
+    else:
+        result = await workspace_ls(ctx, [folder], token)
+    if not result or not isinstance(result[0], dict):
+        raise ValueError(f"unable to list {folder}: {result}")
+    entries = next(iter(result[0].values()), [])
+    return [entry for entry in entries if entry[1] != 'folder']
+
+async def workspace_bulk_download(ctx: WorkspaceContext, output_dir: str, token: str, paths: List[str] = None, folder: str = None, recursive: bool = False, max_concurrency: int = 4, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Download many workspace objects, or a whole folder, to a local directory.
+
+    Download URLs for all objects are resolved with one Workspace.get_download_url
+    call, then the files are streamed to disk concurrently.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        output_dir: Local directory to save the files to
+        token: Authentication token for API calls
+        paths: Workspace paths of the objects to download
+        folder: Workspace folder whose objects are downloaded (in addition to paths)
+        recursive: If True, also download objects in subfolders of folder, keeping their relative layout
+        max_concurrency: Maximum number of files downloaded at the same time
+        chunk_size: Buffer size in bytes used while streaming to disk
+    Returns:
+        Dictionary with per-file status and aggregate transfer statistics
+    """
+    if max_concurrency < 1:
+        return {"error": "max_concurrency must be at least 1"}
+    try:
+        start = time.monotonic()
+        targets = {path: os.path.basename(path.rstrip('/')) for path in paths or []}
+        if folder:
+            prefix = folder.rstrip('/') + '/'
+            for entry in await _list_folder_objects(ctx, folder, token, recursive):
+                path = entry[2] + entry[0]
+                targets[path] = path[len(prefix):] if path.startswith(prefix) else entry[0]
+        if not targets:
+            return {"error": "No objects to download"}
+        duplicates = sorted(name for name, count in Counter(targets.values()).items() if count > 1)
+        if duplicates:
+            return {"error": f"Several objects would be downloaded to the same file: {duplicates}"}
+
+        root = os.path.abspath(output_dir)
+        for relative in targets.values():
+            if not os.path.abspath(os.path.join(root, relative)).startswith(root + os.sep):
+                return {"error": f"Refusing to write outside {output_dir}: {relative}"}
+
+        object_paths = list(targets)
+        urls = await _get_download_urls(ctx, object_paths, token)
+        resolve_seconds = time.monotonic() - start
+
+        headers = {
+            "Authorization": token
+        }
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def download_one(path: str, url: str) -> dict:
+            output_file = os.path.join(root, targets[path])
+            async with semaphore:
+                try:
+                    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                    stats = await stream_download(ctx.pool, url, output_file, headers, chunk_size)
+                    return {"path": path, "output_file": output_file, "status": "success", "bytes": stats["bytes"]}
+                except Exception as e:
+                    return {"path": path, "output_file": output_file, "status": "failed", "error": str(e)}
+
+        statuses = await asyncio.gather(*(download_one(path, url) for path, url in zip(object_paths, urls)))
+        elapsed = time.monotonic() - start
+        total_bytes = sum(status.get("bytes", 0) for status in statuses)
+        downloaded = sum(1 for status in statuses if status["status"] == "success")
+        return {
+            "outputDirectory": output_dir,
+            "downloaded": downloaded,
+            "failed": len(statuses) - downloaded,
+            "bytes": total_bytes,
+            "url_resolution_seconds": round(resolve_seconds, 3),
+            "seconds": round(elapsed, 3),
+            "throughput_mbps": round(total_bytes * 8 / 1_000_000 / elapsed, 2) if elapsed > 0 else 0,
+            "files": statuses
+        }
+
+    except Exception as e:
+        return {"error": f"Error downloading files: {str(e)}"}
 
 def _get_user_id_from_token(token: str) -> str:
     """
@@ -138,15 +586,15 @@ def _get_user_id_from_token(token: str) -> str:
         # Token format example: "un=username|..."; take first segment and strip prefix
         return token.split('|')[0].replace('un=','')
     except Exception as e:
-        print(f"Error extracting user ID from token: {e}")
+        logger.warning("Error extracting user ID from token: %s", e)
         return None
 
-def workspace_upload(api: JsonRpcCaller, filename: str, upload_dir: str = None, token: str = None) -> str:
+async def workspace_upload(ctx: WorkspaceContext, filename: str, upload_dir: str = None, token: str = None) -> str:
     """
     Create an upload URL for a file in the workspace using the JSON-RPC API.
     
     Args:
-        api: JsonRpcCaller instance configured with workspace URL and token
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
         filename: Name of the file to create upload URL for
         upload_dir: Directory to upload the file to (defaults to /<user_id>/home)
         token: Authentication token for API calls (required)
@@ -164,175 +612,399 @@ def workspace_upload(api: JsonRpcCaller, filename: str, upload_dir: str = None,
                 return {"error": "Unable to derive user id from token"}
             upload_dir = '/' + user_id + '/home'
         download_url_path = os.path.join(upload_dir,os.path.basename(filename))
+
+        # An interrupted parted upload of this file resumes into its existing node
+        overwrite = None
+        pending_url = pending_upload_url(filename, download_url_path, token, ctx.shock_url)
+        if pending_url:
+            logger.info("Resuming upload", extra={"url": pending_url, "file": filename})
+            upload_result = await _upload_file_to_url(ctx, filename, pending_url, token, download_url_path)
+            if upload_result.get("success"):
+                return _upload_message(filename, upload_dir, pending_url, upload_result)
+            # The node may have expired or been deleted: start over with a new one,
+            # replacing the object the interrupted upload created
+            logger.warning("Resumed upload failed, starting a new upload", extra={"url": pending_url, "file": filename, "error": upload_result.get("error")})
+            discard_pending_upload(filename, token)
+            overwrite = True
+
         # call format: workspace file location, file type, object metadata, object content
-        result = _workspace_create(
-            api,
+        result = await _workspace_create(
+            ctx,
             [[download_url_path, 'unspecified', {}, '']],
             token,
             create_upload_nodes=True,
-            overwrite=None
+            overwrite=overwrite
         )
         
         # Parse the result if successful
         if result and len(result) > 0 and len(result[0]) > 0:
-            # Extract the metadata array from result[0][0]
-            meta_list = result[0][0]
-            
-            # Convert the array to a structured object
-            meta_obj = {
-                "id": meta_list[4],
-                "path": meta_list[2] + meta_list[0],
-                "name": meta_list[0],
-                "type": meta_list[1],
-                "creation_time": meta_list[3],
-                "link_reference": meta_list[11],
-                "owner_id": meta_list[5],
-                "size": meta_list[6],
-                "userMeta": meta_list[7],
-                "autoMeta": meta_list[8],
-                "user_permission": meta_list[9],
-                "global_permission": meta_list[10],
-                "timestamp": meta_list[3]  # Keep as string for now, could parse to timestamp if needed
-            }
-
-            upload_url = meta_obj["link_reference"]
+            # Extract the metadata of the new upload node from result[0][0]
+            meta = ObjectMeta.from_rpc(result[0][0])
+            upload_url = meta.link_reference
 
-            msg = {
-                "file": os.path.basename(filename),
-                "uploadDirectory": upload_dir,
-                "url": upload_url
-            }
-            
             # Upload the file to the upload URL
-            print(f"Uploading file to {upload_url}")
-            upload_result = _upload_file_to_url(filename, upload_url, token)
-            print(f"Upload result: {upload_result}")
-            if upload_result.get("success"):
-                msg["upload_status"] = "success"
-                msg["upload_message"] = upload_result.get("message", "File uploaded successfully")
-            else:
-                msg["upload_status"] = "failed"
-                msg["upload_error"] = upload_result.get("error", "Upload failed")
-            
-            return msg
+            logger.info("Uploading file", extra={"url": upload_url, "file": filename})
+            upload_result = await _upload_file_to_url(ctx, filename, upload_url, token, download_url_path)
+            logger.info("Upload finished", extra={"url": upload_url, "file": filename, "success": upload_result.get("success"), "bytes": upload_result.get("bytes")})
+            return _upload_message(filename, upload_dir, upload_url, upload_result)
         else:
             return {"error": "No valid result returned from workspace API"}
             
     except Exception as e:
         return {"error": f"Error creating upload URL: {str(e)}"}
 
-def _workspace_create(api: JsonRpcCaller, objects: list, token: str, create_upload_nodes: bool = True, overwrite: Any = None):
+def _expand_upload_files(filenames: List[str]) -> List[str]:
+    """
+    Expand file names, glob patterns and directories into a list of regular files.
+    Directories contribute the files directly inside them.
+    """
+    files = []
+    for name in filenames:
+        if glob.has_magic(name):
+            matches = sorted(glob.glob(name))
+        elif os.path.isdir(name):
+            matches = sorted(os.path.join(name, entry) for entry in os.listdir(name))
+        else:
+            matches = [name]
+        files.extend(match for match in matches if not os.path.isdir(match))
+    # Keep the first occurrence of each file
+    return list(dict.fromkeys(files))
+
+async def workspace_bulk_upload(ctx: WorkspaceContext, filenames: List[str], upload_dir: str = None, token: str = None, max_concurrency: int = 4) -> dict:
+    """
+    Upload many files to one workspace folder.
+
+    All upload nodes are created with a single Workspace.create call, then the
+    file contents are pushed concurrently by at most max_concurrency workers.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        filenames: Local files, directories or glob patterns to upload
+        upload_dir: Directory to upload the files to (defaults to /<user_id>/home)
+        token: Authentication token for API calls (required)
+        max_concurrency: Maximum number of files uploaded at the same time
+    Returns:
+        Dictionary with per-file status and aggregate transfer statistics
+    """
+    if max_concurrency < 1:
+        return {"error": "max_concurrency must be at least 1"}
+    try:
+        if not token:
+            return {"error": "Authentication token not provided"}
+
+        if not upload_dir:
+            user_id = _get_user_id_from_token(token)
+            if not user_id:
+                return {"error": "Unable to derive user id from token"}
+            upload_dir = '/' + user_id + '/home'
+
+        files = _expand_upload_files(filenames)
+        if not files:
+            return {"error": "No files matched the given file names or patterns"}
+
+        missing = [f for f in files if not os.path.isfile(f)]
+        if missing:
+            return {"error": f"Files do not exist: {missing}"}
+
+        names = [os.path.basename(f) for f in files]
+        duplicates = sorted(name for name, count in Counter(names).items() if count > 1)
+        if duplicates:
+            return {"error": f"Several files would be uploaded under the same name: {duplicates}"}
+
+        workspace_paths = [os.path.join(upload_dir, name) for name in names]
+        result = await _workspace_create(
+            ctx,
+            [[path, 'unspecified', {}, ''] for path in workspace_paths],
+            token,
+            create_upload_nodes=True,
+            overwrite=None
+        )
+        if not result or not isinstance(result[0], list) or len(result[0]) != len(files):
+            return {"error": f"No valid result returned from workspace API: {result}"}
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+        start = time.monotonic()
+
+        async def upload_one(filename: str, workspace_path: str, meta: ObjectMeta) -> dict:
+            upload_url = meta.link_reference
+            async with semaphore:
+                upload_result = await _upload_file_to_url(ctx, filename, upload_url, token, workspace_path)
+            msg = _upload_message(filename, upload_dir, upload_url, upload_result)
+            del msg["uploadDirectory"]
+            return msg
+
+        statuses = await asyncio.gather(*(
+            upload_one(filename, path, ObjectMeta.from_rpc(meta))
+            for filename, path, meta in zip(files, workspace_paths, result[0])
+        ))
+        elapsed = time.monotonic() - start
+        total_bytes = sum(status.get("bytes", 0) for status in statuses)
+        uploaded = sum(1 for status in statuses if status["upload_status"] == "success")
+        return {
+            "uploadDirectory": upload_dir,
+            "uploaded": uploaded,
+            "failed": len(statuses) - uploaded,
+            "bytes": total_bytes,
+            "seconds": round(elapsed, 3),
+            "throughput_mbps": round(total_bytes * 8 / 1_000_000 / elapsed, 2) if elapsed > 0 else 0,
+            "files": statuses
+        }
+
+    except Exception as e:
+        return {"error": f"Error uploading files: {str(e)}"}
+
+def _upload_message(filename: str, upload_dir: str, upload_url: str, upload_result: dict) -> dict:
+    """
+    Build the workspace_upload response from an _upload_file_to_url result.
+    """
+    msg = {
+        "file": os.path.basename(filename),
+        "uploadDirectory": upload_dir,
+        "url": upload_url
+    }
+    if upload_result.get("success"):
+        msg["upload_status"] = "success"
+        msg["upload_message"] = upload_result.get("message", "File uploaded successfully")
+        for key in ("bytes", "seconds", "throughput_mbps", "parts"):
+            if key in upload_result:
+                msg[key] = upload_result[key]
+    else:
+        msg["upload_status"] = "failed"
+        msg["upload_error"] = upload_result.get("error", "Upload failed")
+    return msg
+
+async def _workspace_create(ctx: WorkspaceContext, objects: list, token: str, create_upload_nodes: bool = True, overwrite: Any = None):
     """
     Helper to invoke Workspace.create via JSON-RPC.
     """
     try:
-        return api.call(
+        result = await ctx.rpc.call(
             "Workspace.create",
             {
                 "objects": objects,
                 "createUploadNodes": create_upload_nodes,
                 "overwrite": overwrite
             },
-            1,
-            token
+            token=token
         )
+        _index_created(ctx, token, result)
+        return result
     except Exception as e:
-        return [f"Error creating workspace object: {str(e)}"]
+        return ErrorList(f"Error creating workspace object: {str(e)}")
+    finally:
+        _invalidate_cache(ctx, [obj[0] for obj in objects])
 
-def _upload_file_to_url(filename: str, upload_url: str, token: str) -> dict:
+def _index_created(ctx: WorkspaceContext, token: str, result: Any):
     """
-    Upload a file to the specified Shock API URL using binary data.
-    
+    Add objects returned by Workspace.create to the user's local name index.
+    """
+    if ctx.index is not None and result and isinstance(result[0], list):
+        ctx.index.record(_get_user_id_from_token(token), [meta for meta in result[0] if isinstance(meta, list)])
+
+def _invalidate_cache(ctx: WorkspaceContext, paths: List[str]):
+    """
+    Drop cached listings and metadata affected by a write to the given paths.
+    """
+    if ctx.cache is not None:
+        ctx.cache.invalidate(paths)
+
+async def _upload_file_to_url(ctx: WorkspaceContext, filename: str, upload_url: str, token: str, workspace_path: str = None) -> dict:
+    """
+    Upload a file to the specified Shock API URL, streaming it from disk.
+
+    Large files are sent as a resumable parted upload (see transfers.stream_upload).
+
     Args:
+        ctx: WorkspaceContext whose connection pool is used for the upload
         filename: Path to the file to upload
         upload_url: The upload URL from workspace API
         token: Authentication token for API calls
+        workspace_path: Workspace destination path, recorded so an interrupted upload can be resumed
     Returns:
-        Dictionary with upload result status and message
+        Dictionary with upload result status, message and transfer statistics
     """
     try:
         # Check if file exists
         if not os.path.exists(filename):
             return {"success": False, "error": f"File {filename} does not exist"}
-        
-        # Read the file content
-        with open(filename, 'rb') as file:
-            file_content = file.read()
-        
+
         # Set up headers for the Shock API request
         headers = {
             'Authorization': 'OAuth ' + token
         }
-        
-        # Prepare the file for multipart form data upload
-        with open(filename, 'rb') as file:
-            files = {
-                'upload': (os.path.basename(filename), file, 'application/octet-stream')
-            }
-            
-            # Make the POST request with multipart form data
-            response = requests.put(upload_url, files=files, headers=headers, timeout=30)
-        
-        if response.status_code == 200:
-            return {
-                "success": True, 
-                "message": f"File {filename} uploaded successfully",
-                "status_code": response.status_code
-            }
-        else:
-            return {
-                "success": False, 
-                "error": f"Upload failed with status code {response.status_code}: {response.text}",
-                "status_code": response.status_code
-            }
-            
+
+        def report_progress(sent: int, total: int, rate: float):
+            logger.info("Upload progress", extra={"file": filename, "sent": sent, "total": total, "mbps": round(rate * 8 / 1_000_000, 1), "sampled": True})
+
+        stats = await stream_upload(
+            ctx.pool,
+            filename,
+            upload_url,
+            headers,
+            workspace_path=workspace_path,
+            progress_callback=report_progress,
+            token=token
+        )
+        return {
+            "success": True,
+            "message": f"File {filename} uploaded successfully",
+            "status_code": 200,
+            **stats
+        }
+
+    except httpx.HTTPStatusError as e:
+        return {
+            "success": False,
+            "error": f"Upload failed with status code {e.response.status_code}: {e.response.text}",
+            "status_code": e.response.status_code
+        }
     except Exception as e:
         return {"success": False, "error": f"Upload failed: {str(e)}"}
 
-def workspace_create_genome_group(api: JsonRpcCaller, genome_group_path: str, genome_id_list: List[str], token: str) -> str:
+# Group IDs are separated by commas and/or whitespace
+_ID_TOKEN = re.compile(r"[^\s,]+")
+# Character in the fourth-to-last position of an ID when it is not the '.' before a feature's 3-digit suffix
+_MISSING_FEATURE_DOT = re.compile(r"([^\s,.])(?=[^\s,]{3}(?![^\s,]))")
+
+def parse_id_list(id_list: Any = None, id_file: str = None, fix_feature_ids: bool = False) -> List[str]:
     """
-    Create a genome group in the workspace using the JSON-RPC API.
+    Parse genome or feature IDs from a separated string, a list and/or a local file.
+
+    The whole input is tokenized and normalized with single regular expression
+    passes, then deduplicated keeping the first occurrence of each ID.
+
+    Args:
+        id_list: IDs as a comma and/or whitespace separated string, or a list of IDs
+        id_file: Local file with more IDs, in the same format
+        fix_feature_ids: Insert the '.' that is often missing before the last 3 characters of feature IDs
+    Returns:
+        Unique IDs in input order
+    """
+    parts = []
+    if isinstance(id_list, str):
+        parts.append(id_list)
+    elif id_list:
+        parts.append(','.join(str(item) for item in id_list))
+    if id_file:
+        with open(id_file, 'r') as f:
+            parts.append(f.read())
+    text = ','.join(parts)
+    if fix_feature_ids:
+        # The LLM is consistently forgetting the final '.' in the feature IDs
+        text = _MISSING_FEATURE_DOT.sub(r"\1.", text)
+    return list(dict.fromkeys(_ID_TOKEN.findall(text)))
+
+def _stored_group_ids(value: Any) -> List[str]:
+    """
+    Normalize the ID list stored in a group object; older groups may hold one separated string.
     """
-    genome_group_name = genome_group_path.split('/')[-1]
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    if isinstance(value, str):
+        return _ID_TOKEN.findall(value)
+    return []
+
+async def _write_group(ctx: WorkspaceContext, group_path: str, group_type: str, id_key: str, ids: List[str], token: str, extend: bool = False) -> dict:
+    """
+    Create a genome or feature group, or add IDs to an existing one.
+
+    The Workspace service has no partial update, so extending a group
+    rewrites the object with its current IDs followed by the new ones, and
+    skips the write entirely when every ID is already present.
+
+    Returns:
+        Summary with the group path, total and added ID counts, and the new object's metadata
+    """
+    group_name = group_path.split('/')[-1]
+    added = ids
+    overwrite = None
+    if extend:
+        # A group that cannot be read is created; without overwrite that fails if it does exist
+        existing = await workspace_get_object(ctx, group_path, metadata_only=False, token=token)
+        if "error" not in existing:
+            data = json.loads(existing.get("data") or "{}")
+            current = _stored_group_ids(data.get("id_list", {}).get(id_key))
+            current_set = set(current)
+            added = [item for item in ids if item not in current_set]
+            if not added:
+                return {"path": group_path, "count": len(current), "added": 0, "metadata": existing["metadata"]}
+            ids = current + added
+            group_name = data.get("name", group_name)
+            overwrite = True
+
     try:
         content = {
             'id_list': {
-                'genome_id': genome_id_list
-            }, 
-            'name': genome_group_name
+                id_key: ids
+            },
+            'name': group_name
+        }
+        params = {"objects": [[group_path, group_type, {}, content]]}
+        if overwrite:
+            params["overwrite"] = overwrite
+        result = await ctx.rpc.call("Workspace.create", params, token=token)
+        _index_created(ctx, token, result)
+        return {
+            "path": group_path,
+            "count": len(ids),
+            "added": len(added),
+            "metadata": ObjectMeta.from_rpc(result[0][0])
         }
-        result = api.call("Workspace.create", {
-            "objects": [[genome_group_path, 'genome_group', {}, content]]
-        },1, token)
-        return result
     except Exception as e:
-        return [f"Error creating genome group: {str(e)}"]
+        return {"error": f"Error creating {group_type.replace('_', ' ')}: {str(e)}"}
+    finally:
+        _invalidate_cache(ctx, [group_path])
+
+async def workspace_create_genome_group(ctx: WorkspaceContext, genome_group_path: str, genome_id_list: Any, token: str, genome_id_file: str = None, extend: bool = False) -> dict:
+    """
+    Create a genome group in the workspace using the JSON-RPC API.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        genome_group_path: Workspace path of the group
+        genome_id_list: Genome IDs as a separated string or a list
+        token: Authentication token for API calls
+        genome_id_file: Local file with more genome IDs
+        extend: Add the IDs to the group if it already exists, writing only when some are new
+    Returns:
+        Summary with the group path, ID counts and metadata, or {"error": ...}
+    """
+    try:
+        genome_ids = parse_id_list(genome_id_list, genome_id_file)
+    except OSError as e:
+        return {"error": f"Error reading genome IDs: {str(e)}"}
+    if not genome_ids:
+        return {"error": "No genome IDs given"}
+    return await _write_group(ctx, genome_group_path, 'genome_group', 'genome_id', genome_ids, token, extend)
 
-def workspace_create_feature_group(api: JsonRpcCaller, feature_group_path: str, feature_id_list: List[str], token: str) -> str:
+async def workspace_create_feature_group(ctx: WorkspaceContext, feature_group_path: str, feature_id_list: Any, token: str, feature_id_file: str = None, extend: bool = False) -> dict:
     """
     Create a feature group in the workspace using the JSON-RPC API.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        feature_group_path: Workspace path of the group
+        feature_id_list: Feature IDs as a separated string or a list
+        token: Authentication token for API calls
+        feature_id_file: Local file with more feature IDs
+        extend: Add the IDs to the group if it already exists, writing only when some are new
+    Returns:
+        Summary with the group path, ID counts and metadata, or {"error": ...}
     """
-    feature_group_name = feature_group_path.split('/')[-1]
     try:
-        content = {
-            'id_list': {
-                'feature_id': feature_id_list
-            },
-            'name': feature_group_name
-        }
-        result = api.call("Workspace.create", {
-            "objects": [[feature_group_path, 'feature_group', {}, content]]
-        },1, token)
-        return result[0][0]
-    except Exception as e:
-        return [f"Error creating feature group: {str(e)}"]
+        feature_ids = parse_id_list(feature_id_list, feature_id_file, fix_feature_ids=True)
+    except OSError as e:
+        return {"error": f"Error reading feature IDs: {str(e)}"}
+    if not feature_ids:
+        return {"error": "No feature IDs given"}
+    return await _write_group(ctx, feature_group_path, 'feature_group', 'feature_id', feature_ids, token, extend)
 
-def workspace_get_object(api: JsonRpcCaller, path: str, metadata_only: bool = False, token: str = None) -> dict:
+async def workspace_get_object(ctx: WorkspaceContext, path: str, metadata_only: bool = False, token: str = None) -> dict:
     """
     Get an object from the workspace using the JSON-RPC API.
 
     Args:
-        api: JsonRpcCaller instance configured with workspace URL and token
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
         path: Path to the object to retrieve
         metadata_only: If True, only return metadata without the actual data
         token: Authentication token for API calls
@@ -344,34 +1016,20 @@ def workspace_get_object(api: JsonRpcCaller, path: str, metadata_only: bool = Fa
 
     try:
         # Decode URL-encoded path
-        path = requests.utils.unquote(path)
+        path = unquote(path)
 
         # Call Workspace.get API
-        result = api.call("Workspace.get", {
+        result = await ctx.rpc.call("Workspace.get", {
             "objects": [path],
             "metadata_only": metadata_only
-        }, 1, token)
+        }, token=token)
 
         # Validate response structure
         if not result or not result[0] or not result[0][0] or not result[0][0][0] or not result[0][0][0][4]:
             return {"error": "Object not found"}
 
         # Extract metadata from nested array structure
-        meta_array = result[0][0][0]
-        metadata = {
-            "name": meta_array[0],
-            "type": meta_array[1],
-            "path": meta_array[2],
-            "creation_time": meta_array[3],
-            "id": meta_array[4],
-            "owner_id": meta_array[5],
-            "size": meta_array[6],
-            "userMeta": meta_array[7],
-            "autoMeta": meta_array[8],
-            "user_permissions": meta_array[9],
-            "global_permission": meta_array[10],
-            "link_reference": meta_array[11]
-        }
+        metadata = ObjectMeta.from_rpc(result[0][0][0]).to_dict()
 
         # If metadata only, return just the metadata
         if metadata_only:
@@ -388,54 +1046,480 @@ def workspace_get_object(api: JsonRpcCaller, path: str, metadata_only: bool = Fa
     except Exception as e:
         return {"error": f"Error getting workspace object: {str(e)}"}
 
-def workspace_get_genome_group_ids(api: JsonRpcCaller, genome_group_path: str, token: str) -> List[str]:
+async def workspace_get_metadata_batch(ctx: WorkspaceContext, paths: List[str], token: str, chunk_size: int = 500) -> dict:
+    """
+    Get metadata for many objects with one metadata_only Workspace.get per chunk of paths.
+
+    Workspace.get fails as a whole when any object is missing, so a chunk the
+    service rejects with a JSON-RPC error is split in halves until the missing
+    objects are isolated, while the others are still returned. Transport and
+    upstream failures are reported once for every path in the chunk.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        paths: Paths of the objects to look up
+        token: Authentication token for API calls
+        chunk_size: Maximum number of paths sent in one Workspace.get call
+    Returns:
+        Dictionary mapping each path to its ObjectMeta record, or to {"error": ...}
+    """
+    if chunk_size < 1:
+        return {"error": "chunk_size must be at least 1"}
+    cache = ctx.cache
+    identity = token_identity(token)
+    records = {}
+    uncached = []
+    for path in dict.fromkeys(unquote(path) for path in paths):
+        cached = cache.get(identity, path, "metadata") if cache is not None else None
+        if cached:
+            records[path] = ObjectMeta.from_rpc(cached[0][0][0])
+            if ctx.prefetcher is not None:
+                ctx.prefetcher.used(identity, path, "metadata")
+        else:
+            uncached.append(path)
+
+    async def fetch(chunk: List[str]) -> List[Any]:
+        result = await ctx.rpc.call("Workspace.get", {
+            "objects": chunk,
+            "metadata_only": True
+        }, token=token)
+        if not result or not isinstance(result[0], list) or len(result[0]) != len(chunk):
+            raise ValueError(f"unexpected Workspace.get response: {result}")
+        return result[0]
+
+    async def fetch_chunk(chunk: List[str]):
+        try:
+            items = await fetch(chunk)
+        except RpcError as e:
+            if len(chunk) == 1:
+                records[chunk[0]] = {"error": f"Error getting file metadata: {str(e)}"}
+                return
+            # Find the missing objects; the rest still succeed
+            half = len(chunk) // 2
+            await asyncio.gather(fetch_chunk(chunk[:half]), fetch_chunk(chunk[half:]))
+            return
+        except Exception as e:
+            # Splitting would only multiply the calls to a failing service
+            error = {"error": f"Error getting file metadata: {str(e)}"}
+            for path in chunk:
+                records[path] = error
+            return
+        for path, item in zip(chunk, items):
+            if not item or not item[0] or not item[0][4]:
+                records[path] = {"error": "Object not found"}
+                continue
+            meta = ObjectMeta.from_rpc(item[0])
+            records[path] = meta
+            if cache is not None:
+                cache.set(identity, path, "metadata", [[[meta, *item[1:]]]])
+
+    await asyncio.gather(*(
+        fetch_chunk(uncached[i:i + chunk_size])
+        for i in range(0, len(uncached), chunk_size)
+    ))
+    return {path: records[path] for path in dict.fromkeys(unquote(path) for path in paths)}
+
+async def _load_group_ids(ctx: WorkspaceContext, group_path: str, id_key: str, token: str) -> Sequence[str]:
+    """
+    Load the IDs stored in a genome or feature group.
+
+    With a group cache, the group's current object id and timestamp are
+    looked up with a metadata-only call made with the caller's token, or
+    taken from metadata cached for that same token, and the parsed IDs of that version are reused when
+    cached instead of downloading and parsing the object again.
+
+    Returns:
+        The group's IDs; a cached sequence is shared and must not be modified
+
+    Raises:
+        ValueError: If the group cannot be read or has no ID list
+    """
+    group_cache = ctx.group_cache
+    if group_cache is not None:
+        meta = await _current_metadata(ctx, group_path, token)
+        if meta is not None:
+            ids = group_cache.get(meta.id, meta.creation_time, id_key)
+            if ids is not None:
+                if ctx.prefetcher is not None:
+                    ctx.prefetcher.used(token_identity(token), group_path, "group")
+                return ids
+
+    result = await workspace_get_object(ctx, group_path, metadata_only=False, token=token)
+    if "error" in result:
+        raise ValueError(result["error"])
+    data = json.loads(result.get("data") or "{}")
+    if not data or "id_list" not in data:
+        raise ValueError("group data not found or invalid structure")
+    ids = _stored_group_ids(data["id_list"].get(id_key))
+    if group_cache is not None:
+        metadata = result["metadata"]
+        ids = group_cache.set(metadata["id"], metadata["creation_time"], id_key, ids)
+    return ids
+
+async def _get_group_ids(ctx: WorkspaceContext, group_path: str, id_key: str, token: str, offset: int = 0, limit: int = None, count_only: bool = False) -> Any:
+    """
+    Return a group's IDs, one page of them, or only their count.
+    """
+    ids = await _load_group_ids(ctx, group_path, id_key, token)
+    if count_only:
+        return {"count": len(ids)}
+    if limit is None and not offset:
+        return list(ids)
+    offset = max(0, offset or 0)
+    end = len(ids) if limit is None else offset + max(0, limit)
+    return {
+        "count": len(ids),
+        "offset": offset,
+        "limit": limit,
+        "ids": list(ids[offset:end]),
+        "has_more": end < len(ids)
+    }
+
+async def workspace_get_genome_group_ids(ctx: WorkspaceContext, genome_group_path: str, token: str, offset: int = 0, limit: int = None, count_only: bool = False) -> Any:
     """
     Get the IDs of the genomes in a genome group using the JSON-RPC API.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        genome_group_path: Workspace path of the group
+        token: Authentication token for API calls
+        offset: Number of IDs to skip
+        limit: Maximum number of IDs to return
+        count_only: Return only the number of IDs
+    Returns:
+        All IDs as a list without offset or limit, otherwise a page dictionary with count, ids and has_more
     """
     try:
-        # Get the genome group object using workspace_get_object
-        result = workspace_get_object(api, genome_group_path, metadata_only=False, token=token)
-        # Check if there was an error
-        if "error" in result:
-            return [f"Error getting genome group: {result['error']}"]
-        # Extract genome IDs from the data
-        data = json.loads(result.get("data", {}))
-        if not data or "id_list" not in data:
-            return [f"Error: Genome group data not found or invalid structure"]
-
-        genome_ids = data['id_list']['genome_id']
-        # Ensure we return a list of strings
-        if isinstance(genome_ids, list):
-            return genome_ids
-        else:
-            return [str(genome_ids)]
+        return await _get_group_ids(ctx, genome_group_path, 'genome_id', token, offset, limit, count_only)
     except Exception as e:
-        return [f"Error getting genome group IDs: {str(e)}"]
+        return ErrorList(f"Error getting genome group IDs: {str(e)}")
 
-def workspace_get_feature_group_ids(api: JsonRpcCaller, feature_group_path: str, token: str) -> List[str]:
+async def workspace_get_feature_group_ids(ctx: WorkspaceContext, feature_group_path: str, token: str, offset: int = 0, limit: int = None, count_only: bool = False) -> Any:
     """
     Get the IDs of the features in a feature group using the JSON-RPC API.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        feature_group_path: Workspace path of the group
+        token: Authentication token for API calls
+        offset: Number of IDs to skip
+        limit: Maximum number of IDs to return
+        count_only: Return only the number of IDs
+    Returns:
+        All IDs as a list without offset or limit, otherwise a page dictionary with count, ids and has_more
+    """
+    try:
+        return await _get_group_ids(ctx, feature_group_path, 'feature_id', token, offset, limit, count_only)
+    except Exception as e:
+        return ErrorList(f"Error getting feature group IDs: {str(e)}")
+
+GROUP_SET_OPERATIONS = ("union", "intersection", "difference")
+
+async def workspace_group_set_operation(ctx: WorkspaceContext, operation: str, group_paths: List[str], token: str, group_type: str = "genome", output_path: str = None, sample_size: int = 10) -> dict:
+    """
+    Combine genome or feature groups with a set operation.
+
+    All groups are loaded concurrently and combined with hash sets, so only
+    counts, a small sample and optionally the path of a new group are
+    returned, never the full ID lists.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        operation: "union", "intersection" or "difference" (IDs of the first group not in any other)
+        group_paths: Workspace paths of the groups, in order
+        token: Authentication token for API calls
+        group_type: "genome" or "feature"
+        output_path: If given, the result is saved as a new group at this path
+        sample_size: Number of result IDs to include in the response
+    Returns:
+        Dictionary with per-group counts, the result count and sample, and the created group, or {"error": ...}
+    """
+    if operation not in GROUP_SET_OPERATIONS:
+        return {"error": f"Unknown operation {operation}; expected one of {', '.join(GROUP_SET_OPERATIONS)}"}
+    if group_type not in ("genome", "feature"):
+        return {"error": f"Unknown group type {group_type}; expected genome or feature"}
+    if len(group_paths) < 2:
+        return {"error": "At least two groups are required"}
+
+    id_key = f"{group_type}_id"
+    results = await asyncio.gather(
+        *(_load_group_ids(ctx, path, id_key, token) for path in group_paths),
+        return_exceptions=True
+    )
+    errors = {path: str(result) for path, result in zip(group_paths, results) if isinstance(result, Exception)}
+    if errors:
+        return {"error": f"Error loading {group_type} groups", "groups": errors}
+
+    first, others = results[0], results[1:]
+    if operation == "union":
+        ids = list(dict.fromkeys(item for group in results for item in group))
+    elif operation == "intersection":
+        common = set(first).intersection(*others)
+        ids = [item for item in dict.fromkeys(first) if item in common]
+    else:
+        removed = set().union(*others)
+        ids = [item for item in dict.fromkeys(first) if item not in removed]
+
+    response = {
+        "operation": operation,
+        "groups": {path: len(group) for path, group in zip(group_paths, results)},
+        "count": len(ids),
+        "sample": ids[:sample_size]
+    }
+    if output_path:
+        if not ids:
+            response["error"] = "Result is empty; no group was created"
+            return response
+        created = await _write_group(ctx, output_path, f"{group_type}_group", id_key, ids, token)
+        if "error" in created:
+            response["error"] = created["error"]
+        else:
+            response["created"] = created["path"]
+            response["metadata"] = created["metadata"]
+    return response
+
+SYNC_DIRECTIONS = ("download", "upload")
+
+async def _list_sync_folder(ctx: WorkspaceContext, folder: str, token: str) -> Tuple[Dict[str, ObjectMeta], Set[str], bool]:
+    """
+    List a workspace folder recursively for a sync.
+
+    Returns:
+        Objects and subfolders keyed by their path relative to folder, and whether folder exists
+    """
+    prefix = folder + '/'
+    objects: Dict[str, ObjectMeta] = {}
+    folders: Set[str] = set()
+    params = {
+        "paths": [folder],
+        "recursive": True,
+        "excludeDirectories": False
+    }
+    try:
+        async with aclosing(ctx.rpc.stream_listing("Workspace.ls", params, token)) as entries:
+            async for _, entry in entries:
+                meta = ObjectMeta.from_rpc(entry)
+                full_path = meta.full_path
+                if not full_path.startswith(prefix):
+                    continue
+                if meta.type == "folder":
+                    folders.add(full_path[len(prefix):])
+                else:
+                    objects[full_path[len(prefix):]] = meta
+    except Exception:
+        # A folder that does not exist yet cannot be listed; anything else is a real failure
+        if await _current_metadata(ctx, folder, token) is None:
+            return objects, folders, False
+        raise
+    if not objects and not folders:
+        return objects, folders, await _current_metadata(ctx, folder, token) is not None
+    return objects, folders, True
+
+async def _create_sync_folders(ctx: WorkspaceContext, folder: str, token: str, relatives: List[str], existing: Set[str], folder_exists: bool):
+    """
+    Create the workspace folders that uploading relatives needs, parents before children.
+    """
+    missing = set()
+    for relative in relatives:
+        parts = relative.split('/')[:-1]
+        for depth in range(1, len(parts) + 1):
+            parent = '/'.join(parts[:depth])
+            if parent not in existing:
+                missing.add(parent)
+    levels: Dict[int, List[str]] = {}
+    for relative in missing:
+        levels.setdefault(relative.count('/'), []).append(relative)
+    batches = ([[folder]] if not folder_exists else []) + [
+        [f"{folder}/{relative}" for relative in sorted(levels[depth])] for depth in sorted(levels)
+    ]
+    for paths in batches:
+        result = await _workspace_create(ctx, [[path, 'folder', {}, ''] for path in paths], token, create_upload_nodes=False)
+        if not result or not isinstance(result[0], list):
+            raise ValueError(f"unable to create folders {paths}: {result}")
+
+async def workspace_sync(ctx: WorkspaceContext, workspace_folder: str, local_dir: str, token: str, direction: str = "download", max_concurrency: int = 4, checksum: bool = True, dry_run: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE, max_reported: int = 100) -> dict:
+    """
+    Incrementally sync a workspace folder and a local directory, in either direction.
+
+    The folder is listed recursively in one streamed Workspace.ls and the
+    directory is walked locally. Each file is compared with the manifest
+    kept in the local directory (see sync_manifest.SyncManifest): files
+    whose local and workspace state are both unchanged since the last sync
+    are skipped without any further request. When the manifest does not
+    vouch for a file but both sides have the same size, the local MD5 is
+    compared with the checksum Shock recorded for the object, so existing
+    copies are adopted instead of transferred again. Everything else is
+    transferred concurrently, and the destination is made to match the
+    source; nothing is ever deleted.
+
+    Args:
+        ctx: WorkspaceContext with the JSON-RPC caller and caches
+        workspace_folder: Workspace folder to sync
+        local_dir: Local directory to sync
+        token: Authentication token for API calls
+        direction: "download" (workspace to local) or "upload" (local to workspace)
+        max_concurrency: Maximum number of checksums or transfers running at the same time
+        checksum: Compare MD5 checksums of same-sized files the manifest does not vouch for
+        dry_run: Only report what would be transferred
+        chunk_size: Buffer size in bytes used while streaming downloads to disk
+        max_reported: Maximum number of transferred files listed individually in the result
+    Returns:
+        Dictionary with file counts, bytes transferred and skipped, and per-file status of transfers
     """
+    if direction not in SYNC_DIRECTIONS:
+        return {"error": f"Unknown direction {direction}; expected one of {', '.join(SYNC_DIRECTIONS)}"}
+    if max_concurrency < 1:
+        return {"error": "max_concurrency must be at least 1"}
     try:
-        # Get the feature group object using workspace_get_object
-        result = workspace_get_object(api, feature_group_path, metadata_only=False, token=token)
+        start = time.monotonic()
+        folder = workspace_folder.rstrip('/')
+        root = os.path.abspath(local_dir)
+        if direction == "upload" and not os.path.isdir(root):
+            return {"error": f"Local directory does not exist: {local_dir}"}
+
+        remote, remote_folders, folder_exists = await _list_sync_folder(ctx, folder, token)
+        if direction == "download" and not folder_exists:
+            return {"error": f"Workspace folder does not exist: {folder}"}
+        local = dict(await asyncio.to_thread(lambda: list(local_files(root)))) if os.path.isdir(root) else {}
+        manifest = await asyncio.to_thread(SyncManifest(root, folder).load)
+        sources = remote if direction == "download" else local
+
+        for relative in sources:
+            if not os.path.abspath(os.path.join(root, relative)).startswith(root + os.sep):
+                return {"error": f"Refusing to write outside {local_dir}: {relative}"}
+
+        def source_size(relative: str) -> int:
+            return remote[relative].size if direction == "download" else local[relative].st_size
+
+        pending = []
+        to_compare = []
+        skipped = []
+        for relative in sources:
+            stat, meta = local.get(relative), remote.get(relative)
+            if manifest.unchanged(relative, stat, meta):
+                skipped.append(relative)
+            elif checksum and stat is not None and meta is not None and stat.st_size == meta.size and meta.link_reference:
+                to_compare.append(relative)
+            else:
+                pending.append(relative)
 
-        # Check if there was an error
-        if "error" in result:
-            return [f"Error getting feature group: {result['error']}"]
+        semaphore = asyncio.Semaphore(max_concurrency)
+        shock_headers = {'Authorization': 'OAuth ' + token}
 
-        # Extract feature IDs from the data
-        data = json.loads(result.get("data", {}))
-        if not data or "id_list" not in data:
-            return [f"Error: Feature group data not found or invalid structure"]
+        async def compare(relative: str) -> Tuple[str, str, Any]:
+            async with semaphore:
+                stat = local[relative]
+                local_md5 = manifest.md5(relative, stat) or await asyncio.to_thread(file_md5, os.path.join(root, relative))
+                try:
+                    remote_md5 = await node_md5(ctx.pool, remote[relative].link_reference, shock_headers)
+                except Exception as e:
+                    logger.warning("Checksum lookup failed", extra={"path": remote[relative].full_path, "error": str(e)})
+                    remote_md5 = None
+                return relative, local_md5, remote_md5
 
-        feature_ids = data['id_list']['feature_id']
+        checksum_matches = 0
+        for relative, local_md5, remote_md5 in await asyncio.gather(*(compare(relative) for relative in to_compare)):
+            if remote_md5 and local_md5 == remote_md5:
+                manifest.record(relative, local[relative], remote[relative], local_md5)
+                skipped.append(relative)
+                checksum_matches += 1
+            else:
+                pending.append(relative)
 
-        # Ensure we return a list of strings
-        if isinstance(feature_ids, list):
-            return feature_ids
+        pending.sort()
+        summary = {
+            "direction": direction,
+            "workspace_folder": folder,
+            "local_dir": local_dir,
+            "files": len(sources),
+            "skipped": len(skipped),
+            "checksum_matches": checksum_matches,
+            "bytes_skipped": sum(source_size(relative) for relative in skipped)
+        }
+        if dry_run:
+            summary.update({
+                "would_transfer": len(pending),
+                "bytes_to_transfer": sum(source_size(relative) for relative in pending),
+                "changes": pending[:max_reported],
+                "seconds": round(time.monotonic() - start, 3)
+            })
+            if len(pending) > max_reported:
+                summary["changes_truncated"] = True
+            return summary
+
+        if direction == "download":
+            statuses = await _sync_download(ctx, root, remote, pending, manifest, token, semaphore, chunk_size)
         else:
-            return [str(feature_ids)]
+            statuses = await _sync_upload(ctx, folder, root, local, remote, remote_folders, folder_exists, pending, manifest, token, max_concurrency)
+
+        # Forget files that no longer exist on the source side
+        manifest.files = {relative: record for relative, record in manifest.files.items() if relative in sources}
+        await asyncio.to_thread(manifest.save)
+
+        elapsed = time.monotonic() - start
+        transferred_bytes = sum(status.get("bytes", 0) for status in statuses)
+        transferred = sum(1 for status in statuses if status["status"] == "success")
+        summary.update({
+            "transferred": transferred,
+            "failed": len(statuses) - transferred,
+            "bytes_transferred": transferred_bytes,
+            "seconds": round(elapsed, 3),
+            "throughput_mbps": round(transferred_bytes * 8 / 1_000_000 / elapsed, 2) if elapsed > 0 else 0,
+            # Failures first, so they are never cut off
+            "changes": sorted(statuses, key=lambda status: status["status"] == "success")[:max_reported]
+        })
+        if len(statuses) > max_reported:
+            summary["changes_truncated"] = True
+        return summary
 
     except Exception as e:
-        return [f"Error getting feature group IDs: {str(e)}"]
\ No newline at end of file
+        return {"error": f"Error syncing {workspace_folder}: {str(e)}"}
+
+async def _sync_download(ctx: WorkspaceContext, root: str, remote: Dict[str, ObjectMeta], pending: List[str], manifest: SyncManifest, token: str, semaphore: asyncio.Semaphore, chunk_size: int) -> List[dict]:
+    urls = await _get_download_urls(ctx, [remote[relative].full_path for relative in pending], token) if pending else []
+    headers = {
+        "Authorization": token
+    }
+
+    async def download_one(relative: str, url: str) -> dict:
+        output_file = os.path.join(root, *relative.split('/'))
+        async with semaphore:
+            try:
+                os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                stats = await stream_download(ctx.pool, url, output_file, headers, chunk_size, version=_object_version(remote[relative]))
+                manifest.record(relative, os.stat(output_file), remote[relative])
+                return {"path": relative, "status": "success", "bytes": stats["bytes"]}
+            except Exception as e:
+                return {"path": relative, "status": "failed", "error": str(e)}
+
+    return await asyncio.gather(*(download_one(relative, url) for relative, url in zip(pending, urls)))
+
+async def _sync_upload(ctx: WorkspaceContext, folder: str, root: str, local: Dict[str, os.stat_result], remote: Dict[str, ObjectMeta], remote_folders: Set[str], folder_exists: bool, pending: List[str], manifest: SyncManifest, token: str, max_concurrency: int) -> List[dict]:
+    if not pending:
+        return []
+    await _create_sync_folders(ctx, folder, token, pending, remote_folders, folder_exists)
+
+    # New objects and replacements need separate calls, since overwrite applies to the whole call
+    created: Dict[str, ObjectMeta] = {}
+    for overwrite, relatives in ((None, [r for r in pending if r not in remote]), (True, [r for r in pending if r in remote])):
+        for i in range(0, len(relatives), 1000):
+            chunk = relatives[i:i + 1000]
+            objects = [[f"{folder}/{relative}", remote[relative].type if relative in remote else 'unspecified', {}, ''] for relative in chunk]
+            result = await _workspace_create(ctx, objects, token, create_upload_nodes=True, overwrite=overwrite)
+            if not result or not isinstance(result[0], list) or len(result[0]) != len(chunk):
+                raise ValueError(f"No valid result returned from workspace API: {result}")
+            created.update(zip(chunk, (ObjectMeta.from_rpc(meta) for meta in result[0])))
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def upload_one(relative: str) -> dict:
+        meta = created[relative]
+        filename = os.path.join(root, *relative.split('/'))
+        async with semaphore:
+            upload_result = await _upload_file_to_url(ctx, filename, meta.link_reference, token, meta.full_path)
+        if not upload_result.get("success"):
+            return {"path": relative, "status": "failed", "error": upload_result.get("error", "Upload failed")}
+        manifest.record(relative, local[relative], meta)
+        return {"path": relative, "status": "success", "bytes": upload_result.get("bytes", local[relative].st_size)}
+
+    return await asyncio.gather(*(upload_one(relative) for relative in pending))
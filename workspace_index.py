@@ -0,0 +1,349 @@
+import asyncio
+import fnmatch
+import functools
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from metadata_cache import token_identity
+from object_meta import ObjectMeta
+from structured_logging import get_logger
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = get_logger(__name__)
+
+# Workspace object field compared against the newest timestamp seen during incremental refreshes
+TIMESTAMP_FIELD = "creation_date"
+
+# Characters that make a search term a regular expression rather than a plain substring
+_REGEX_CHARS = set(".^$*+?{}[]\\|()")
+_GLOB_SPLIT = re.compile(r"[*?\[\]]+")
+
+# Records checked between deadline checks during a scan
+_SCAN_STEP = 4096
+
+# Tokens remembered per index as accepted upstream for its user
+_MAX_TOKENS = 64
+
+# Record layout: (name, type, parent, timestamp, id, size, lowercase name)
+Record = Tuple[str, str, str, str, str, int, str]
+
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _is_plain(term: str) -> bool:
+    return not any(char in _REGEX_CHARS for char in term)
+
+
+class UserIndex:
+    """
+    Name index of one user's workspace tree.
+
+    Names are indexed by lowercase trigrams, so substring, prefix and glob
+    queries only verify the few records that share all of the query's
+    trigrams instead of scanning the whole tree.
+    """
+
+    def __init__(self, root: str):
+        self.root = root.rstrip('/')
+        self._records: List[Optional[Record]] = []
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._grams: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+        self._tokens: "OrderedDict[str, None]" = OrderedDict()
+        self.newest_timestamp = ""
+        self.built_at = 0.0
+        self.refreshed_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def accept(self, token: str):
+        """Record that upstream accepted token for this user's tree (a build or refresh succeeded with it)."""
+        identity = token_identity(token)
+        with self._lock:
+            self._tokens[identity] = None
+            self._tokens.move_to_end(identity)
+            while len(self._tokens) > _MAX_TOKENS:
+                self._tokens.popitem(last=False)
+
+    def accepts(self, token: str) -> bool:
+        """True if token was accepted upstream for this user's tree."""
+        with self._lock:
+            return token_identity(token) in self._tokens
+
+    def add(self, entry: list):
+        """
+        Add or replace an object from its Workspace ObjectMeta tuple.
+        """
+        name, obj_type, parent, timestamp, obj_id, size = entry[0], entry[1], entry[2], entry[3], entry[4], entry[6]
+        path = parent + name
+        lower = name.lower()
+        record = (name, obj_type, parent, timestamp, obj_id, size, lower)
+        with self._lock:
+            slot = self._slots.get(path)
+            if slot is not None:
+                self._unlink(slot)
+            elif self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._records)
+                self._records.append(None)
+            self._records[slot] = record
+            self._slots[path] = slot
+            for gram in _grams(lower):
+                self._grams.setdefault(gram, set()).add(slot)
+        if timestamp and timestamp > self.newest_timestamp:
+            self.newest_timestamp = timestamp
+
+    def _unlink(self, slot: int):
+        for gram in _grams(self._records[slot][6]):
+            slots = self._grams.get(gram)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._grams[gram]
+
+    def _candidates(self, fragments: Iterable[str]) -> Optional[Set[int]]:
+        """Slots whose names contain every trigram of every fragment, or None if no fragment is long enough to narrow the search."""
+        grams = set()
+        for fragment in fragments:
+            grams |= _grams(fragment)
+        if not grams:
+            return None
+        sets = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+            if not result:
+                break
+        return result
+
+    def search(self, term: str, mode: str = "substring", under: Optional[List[str]] = None, deadline: Optional[float] = None) -> List[ObjectMeta]:
+        """
+        Find objects by name.
+
+        Args:
+            term: Search term
+            mode: "substring", "prefix", "glob" or "regex" (all case-insensitive)
+            under: Only return objects below these folders
+            deadline: time.monotonic() value after which the scan is abandoned
+        Returns:
+            Matching objects as ObjectMeta records sorted by path. Only
+            name, type, parent path, timestamp, id and size are filled in.
+
+        Raises:
+            TimeoutError: If the scan passes deadline
+        """
+        needle = term.lower()
+        if mode == "glob":
+            fragments = [fragment for fragment in _GLOB_SPLIT.split(needle) if fragment]
+            match = lambda name: fnmatch.fnmatchcase(name, needle)
+        elif mode == "prefix":
+            fragments = [needle]
+            match = lambda name: name.startswith(needle)
+        elif mode == "regex":
+            fragments = []
+            pattern = re.compile(term, re.IGNORECASE)
+            match = lambda name: pattern.search(name) is not None
+        else:
+            fragments = [needle]
+            match = lambda name: needle in name
+
+        prefixes = tuple(path.rstrip('/') + '/' for path in under or [])
+        with self._lock:
+            candidates = self._candidates(fragments)
+            slots = candidates if candidates is not None else range(len(self._records))
+            records = [self._records[slot] for slot in slots]
+        matches = []
+        for position, record in enumerate(records):
+            if deadline is not None and position % _SCAN_STEP == 0 and time.monotonic() > deadline:
+                raise TimeoutError(f"index search for {term!r} took longer than allowed")
+            if record is None or not match(record[6]):
+                continue
+            if prefixes and not record[2].startswith(prefixes):
+                continue
+            name, obj_type, parent, timestamp, obj_id, size, _ = record
+            matches.append(ObjectMeta(name, obj_type, parent, timestamp, obj_id, None, size, {}, {}, None, None, None))
+        matches.sort(key=lambda entry: (entry.path, entry.name))
+        return matches
+
+
+class WorkspaceIndex:
+    """
+    Per-user local name indexes used to answer workspace searches without a recursive Workspace.ls.
+
+    An index is built in the background the first time a user searches and
+    is then refreshed incrementally with objects newer than the newest
+    timestamp seen, plus a periodic full rebuild to drop deleted objects.
+    Searches fall back to the Workspace service while a user's index is cold.
+
+    The user name in a token is not verified locally, so an index only
+    answers tokens that upstream accepted for that user: the token it was
+    built with, and others once a refresh made with them has succeeded.
+    Scans run on a small thread pool with a time limit, so a slow regular
+    expression or a short term that cannot use the trigram index never
+    blocks the event loop; when no scan slot is free, or a scan runs out of
+    time, the search goes upstream instead.
+    """
+
+    def __init__(self, refresh_interval: float = 60, rebuild_interval: float = 3600, max_entries: int = 2_000_000, max_users: int = 1000, max_total_entries: int = 5_000_000, max_search_seconds: float = 2.0, max_concurrent_scans: int = 2):
+        """
+        Args:
+            refresh_interval: Seconds between incremental refreshes of a user's index
+            rebuild_interval: Seconds between full rebuilds of a user's index
+            max_entries: Users with more objects than this are not indexed
+            max_users: Maximum number of user indexes kept in memory
+            max_total_entries: Maximum entries across all user indexes; the oldest indexes are dropped to make room
+            max_search_seconds: Time after which an index scan is abandoned for an upstream search
+            max_concurrent_scans: Index scans running at once
+        """
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.max_entries = max_entries
+        self.max_users = max_users
+        self.max_total_entries = max_total_entries
+        self.max_search_seconds = max_search_seconds
+        self.max_concurrent_scans = max_concurrent_scans
+        self._indexes: Dict[str, UserIndex] = {}
+        self._too_large: Set[str] = set()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_scans, thread_name_prefix="workspace-index")
+        self._scans = 0
+        self.timeouts = 0
+
+    def get(self, user_id: str) -> Optional[UserIndex]:
+        """Return the user's index if it has been built."""
+        return self._indexes.get(user_id)
+
+    async def search(self, api: Any, user_id: str, token: str, term: str, mode: str = "substring", under: Optional[List[str]] = None) -> Optional[List[ObjectMeta]]:
+        """
+        Answer a search from the user's index, scheduling a build or refresh as needed.
+
+        Returns:
+            Matching entries, or None if the index cannot answer (cold, too large, token not yet accepted, outside the user's home, busy or too slow)
+
+        Raises:
+            re.error: If mode is "regex" and term is not a valid regular expression
+        """
+        if not user_id or user_id in self._too_large:
+            return None
+        index = self._indexes.get(user_id)
+        now = time.monotonic()
+        if index is None:
+            self._schedule(user_id, self._build(api, user_id, token))
+            return None
+        if not index.accepts(token):
+            # A refresh with this token proves upstream accepts it for this user
+            self._schedule(user_id, self._refresh(api, index, token))
+            return None
+        if now - index.built_at > self.rebuild_interval:
+            self._schedule(user_id, self._build(api, user_id, token))
+        elif now - index.refreshed_at > self.refresh_interval:
+            self._schedule(user_id, self._refresh(api, index, token))
+        if under and not all(path.rstrip('/') == index.root or path.startswith(index.root + '/') for path in under):
+            return None
+        if mode == "regex":
+            re.compile(term)
+        if self._scans >= self.max_concurrent_scans:
+            return None
+        self._scans += 1
+        try:
+            scan = functools.partial(index.search, term, mode, under, time.monotonic() + self.max_search_seconds)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, scan)
+        except TimeoutError as e:
+            self.timeouts += 1
+            logger.warning("Workspace index search abandoned: %s", e)
+            return None
+        finally:
+            self._scans -= 1
+
+    def record(self, user_id: str, entries: Iterable[list]):
+        """Add objects written through this server to the user's index."""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            for entry in entries:
+                index.add(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._indexes),
+            "entries": self._total_entries(),
+            "max_total_entries": self.max_total_entries,
+            "building": len(self._tasks),
+            "scans": self._scans,
+            "timeouts": self.timeouts
+        }
+
+    def _total_entries(self) -> int:
+        return sum(len(index) for index in self._indexes.values())
+
+    def _schedule(self, user_id: str, coroutine):
+        if user_id in self._tasks:
+            coroutine.close()
+            return
+        task = asyncio.ensure_future(coroutine)
+        self._tasks[user_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(user_id, None))
+
+    async def _build(self, api: Any, user_id: str, token: str):
+        root = f"/{user_id}/home"
+        index = UserIndex(root)
+        started = time.monotonic()
+        try:
+            await self._load(api, index, token, None)
+        except Exception as e:
+            logger.warning("Workspace index build failed for %s: %s", user_id, e)
+            return
+        if len(index) > self.max_entries:
+            self._too_large.add(user_id)
+            self._indexes.pop(user_id, None)
+            return
+        index.built_at = index.refreshed_at = started
+        index.accept(token)
+        self._indexes.pop(user_id, None)
+        while self._indexes and (len(self._indexes) >= self.max_users or self._total_entries() + len(index) > self.max_total_entries):
+            # Drop the index that was built longest ago
+            oldest = min(self._indexes, key=lambda user: self._indexes[user].built_at)
+            del self._indexes[oldest]
+        if len(index) > self.max_total_entries:
+            return
+        self._indexes[user_id] = index
+
+    async def _refresh(self, api: Any, index: UserIndex, token: str):
+        started = time.monotonic()
+        try:
+            await self._load(api, index, token, {TIMESTAMP_FIELD: {"$gt": index.newest_timestamp}})
+        except Exception as e:
+            logger.warning("Workspace index refresh failed for %s: %s", index.root, e)
+            return
+        index.refreshed_at = started
+        index.accept(token)
+
+    async def _load(self, api: Any, index: UserIndex, token: str, query: Optional[dict]):
+        params = {
+            "recursive": True,
+            "excludeDirectories": False,
+            "excludeObjects": False,
+            "includeSubDirs": True,
+            "paths": [index.root]
+        }
+        if query:
+            params["query"] = query
+        async with aclosing(api.stream_listing("Workspace.ls", params, token)) as entries:
+            async for _, entry in entries:
+                index.add(entry)
+                if len(index) > self.max_entries:
+                    break
+
+
+def search_mode(term: str, mode: Optional[str]) -> str:
+    """Pick the index match mode for a term: an explicit mode, else substring for plain terms and regex otherwise."""
+    if mode:
+        return mode
+    return "substring" if _is_plain(term) else "regex"
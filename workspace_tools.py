@@ -1,14 +1,20 @@
 
 from fastmcp import FastMCP
 from workspace_functions import (
-    workspace_ls, workspace_get_file_metadata, workspace_download_file,
-    workspace_upload, workspace_search, workspace_create_genome_group,
-    workspace_create_feature_group, workspace_get_genome_group_ids, workspace_get_feature_group_ids
+    workspace_ls, workspace_get_file_metadata, workspace_download_file, workspace_bulk_download,
+    workspace_upload as workspace_upload_file, workspace_bulk_upload, workspace_search, workspace_create_genome_group,
+    workspace_create_feature_group, workspace_get_genome_group_ids, workspace_get_feature_group_ids,
+    workspace_get_metadata_batch, workspace_group_set_operation, workspace_sync, ErrorList
 )
-from json_rpc import JsonRpcCaller
+from workspace_context import WorkspaceContext
+from metrics import instrument_tool, record_tool_error
+from structured_logging import get_logger, log_request
+from transfers import DEFAULT_CHUNK_SIZE, DEFAULT_RANGE_SIZE
+from serialization import to_json
 from token_provider import TokenProvider
-import json
-from typing import List, Optional
+from typing import Any, List, Optional
+
+logger = get_logger(__name__)
 
 def extract_userid_from_token(token: str = None) -> str:
     """
@@ -23,7 +29,7 @@ def extract_userid_from_token(token: str = None) -> str:
         return user_id
 
     except Exception as e:
-        print(f"Error extracting user ID from token: {e}")
+        logger.warning("Error extracting user ID from token: %s", e)
         return None
 
 def get_user_home_path(user_id: str) -> str:
@@ -90,105 +96,239 @@ def resolve_relative_path(path: str, user_id: str) -> str:
         # Treat as relative to home directory
         return f"{home_path}/{path}"
 
-def register_workspace_tools(mcp: FastMCP, api: JsonRpcCaller, token_provider: TokenProvider):
+def _tool_error(message: str) -> str:
+    """Return a tool's error response and count the call as failed."""
+    record_tool_error()
+    return f"Error: {message}"
+
+def _respond(result: Any, fields: Optional[List[str]] = None) -> str:
+    """Serialize a workspace function's result, counting the call as failed if the result is an error."""
+    # Workspace functions report failures as an ErrorList or a dict with an "error" key
+    if isinstance(result, ErrorList) or isinstance(result, dict) and "error" in result:
+        record_tool_error()
+    return to_json(result, fields)
+
+def register_workspace_tools(mcp: FastMCP, ctx: WorkspaceContext, token_provider: TokenProvider):
     """Register workspace tools with the FastMCP server"""
+
+    def tool(function):
+        # Every tool gets a request id for its log records and is counted in the metrics
+        return mcp.tool()(instrument_tool(log_request(function)))
     
-    @mcp.tool()
-    def workspace_ls_tool(token: Optional[str] = None, paths: List[str] = None) -> str:
+    @tool
+    async def workspace_ls_tool(token: Optional[str] = None, paths: List[str] = None, fields: List[str] = None) -> str:
         """List the contents of the workspace.
 
         Args:
             token: Authentication token (optional - will use default if not provided)
             paths: Optional list of paths to list (relative to user's home directory). If empty or None, lists user home directory.
+            fields: Optional metadata fields to return for each object, e.g. ["name", "type", "size"]. Defaults to all non-empty fields.
 
         Returns:
-            String representation of workspace contents.
+            JSON object mapping each path to its contents.
         """
         # Get the appropriate token
         auth_token = token_provider.get_token(token)
         if not auth_token:
-            return "Error: No authentication token available"
+            return _tool_error("No authentication token available")
 
         # Extract user_id from token for path resolution
         user_id = extract_userid_from_token(auth_token)
         paths = resolve_relative_paths(paths or [], user_id)
 
-        print(f"Listing paths: {paths}, user_id: {user_id}")
-        result = workspace_ls(api, paths, auth_token)
-        return str(result)
+        logger.info("Listing paths", extra={"paths": paths, "user_id": user_id, "sampled": True})
+        result = await workspace_ls(ctx, paths, auth_token)
+        return _respond(result, fields)
 
-    @mcp.tool()
-    def workspace_search_tool(token: Optional[str] = None, search_term: str = None, paths: List[str] = None) -> str:
+    @tool
+    async def workspace_search_tool(token: Optional[str] = None, search_term: str = None, paths: List[str] = None, limit: int = 100, offset: int = 0, cursor: str = None, match_mode: str = None, fields: List[str] = None) -> str:
         """Search the workspace for a given term.
 
         Args:
             token: Authentication token (optional - will use default if not provided)
             search_term: Term to search the workspace for.
             paths: Optional list of paths to search (relative to user's home directory). If empty or None, searches user home directory.
+            limit: Maximum number of matches to return (default 100).
+            offset: Number of matches to skip.
+            cursor: next_cursor from a previous result to fetch the following page; search_term, paths and offset are taken from it.
+            match_mode: How search_term matches names: "substring", "prefix", "glob" (e.g. *.fastq) or "regex". Defaults to substring for plain terms and regex otherwise. Matching is case-insensitive.
+            fields: Optional metadata fields to return for each object, e.g. ["name", "type", "size"]. Defaults to all non-empty fields.
+
+        Returns:
+            One page of matches with has_more and next_cursor.
         """
-        if not search_term:
-            return "Error: search_term parameter is required"
+        if not search_term and not cursor:
+            return _tool_error("search_term parameter is required")
 
         # Get the appropriate token
         auth_token = token_provider.get_token(token)
         if not auth_token:
-            return "Error: No authentication token available"
+            return _tool_error("No authentication token available")
 
         # Extract user_id from token for path resolution
         user_id = extract_userid_from_token(auth_token)
         paths = resolve_relative_paths(paths or [], user_id)
 
-        print(f"Searching in paths: {paths}, user_id: {user_id}, term: {search_term}")
-        result = workspace_search(api, paths, search_term, auth_token)
-        return str(result)
+        logger.info("Searching workspace", extra={"paths": paths, "user_id": user_id, "term": search_term, "offset": offset, "limit": limit, "sampled": True})
+        result = await workspace_search(ctx, paths, search_term, auth_token, limit, offset, cursor, match_mode)
+        return _respond(result, fields)
 
-    @mcp.tool()
-    def workspace_get_file_metadata_tool(token: Optional[str] = None, path: str = None) -> str:
+    @tool
+    async def workspace_get_file_metadata_tool(token: Optional[str] = None, path: str = None, fields: List[str] = None) -> str:
         """Get the metadata of a file from the workspace.
 
         Args:
             token: Authentication token (optional - will use default if not provided)
             path: Path to the file to get (relative to user's home directory).
+            fields: Optional metadata fields to return for each object, e.g. ["name", "type", "size"]. Defaults to all non-empty fields.
         """
         # Get the appropriate token
         auth_token = token_provider.get_token(token)
         if not auth_token:
-            return "Error: No authentication token available"
+            return _tool_error("No authentication token available")
 
         # Extract user_id from token for path resolution and logging
         user_id = extract_userid_from_token(auth_token)
         resolved_path = resolve_relative_path(path, user_id)
 
-        print(f"Getting metadata for path: {resolved_path}, user_id: {user_id}")
+        logger.info("Getting metadata", extra={"path": resolved_path, "user_id": user_id, "sampled": True})
+
+        result = await workspace_get_file_metadata(ctx, resolved_path, auth_token)
+        return _respond(result, fields)
+
+    @tool
+    async def workspace_get_metadata_batch_tool(token: Optional[str] = None, paths: List[str] = None, chunk_size: int = 500, fields: List[str] = None) -> str:
+        """Get the metadata of many files from the workspace in one call.
+
+        Args:
+            token: Authentication token (optional - will use default if not provided)
+            paths: Paths of the files to look up (relative to user's home directory).
+            chunk_size: Maximum number of paths sent in one workspace request (default 500).
+            fields: Optional metadata fields to return for each object, e.g. ["name", "type", "size"]. Defaults to all non-empty fields.
+
+        Returns:
+            Metadata for each path, keyed by path. Missing objects get their own error entry.
+        """
+        if not paths:
+            return _tool_error("paths parameter is required")
+
+        # Get the appropriate token
+        auth_token = token_provider.get_token(token)
+        if not auth_token:
+            return _tool_error("No authentication token available")
 
-        result = workspace_get_file_metadata(api, resolved_path, auth_token)
-        return str(result)
+        # Extract user_id from token for path resolution and logging
+        user_id = extract_userid_from_token(auth_token)
+        resolved_paths = resolve_relative_paths(paths, user_id)
 
-    @mcp.tool()
-    def workspace_download_file_tool(token: Optional[str] = None, path: str = None, output_file: str = None) -> str:
+        logger.info("Getting metadata batch", extra={"count": len(resolved_paths), "user_id": user_id, "sampled": True})
+
+        result = await workspace_get_metadata_batch(ctx, resolved_paths, auth_token, chunk_size)
+        return _respond(result, fields)
+
+    @tool
+    async def workspace_download_file_tool(token: Optional[str] = None, path: str = None, output_file: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE, parallel_connections: int = 1, range_size: int = DEFAULT_RANGE_SIZE) -> str:
         """Download a file from the workspace.
 
         Args:
             token: Authentication token (optional - will use default if not provided)
             path: Path to the file to download (relative to user's home directory).
-            output_file: Name and path of the file to save the downloaded content to.
+            output_file: Name and path of the file to save the downloaded content to. Large files should always be saved to disk; an interrupted download is resumed on the next call.
+            chunk_size: Buffer size in bytes used while streaming to disk (default 1 MiB).
+            parallel_connections: Number of concurrent connections for large files (default 1). Values of 4-8 speed up multi-GB downloads.
+            range_size: Size in bytes of each byte range fetched when parallel_connections > 1 (default 16 MiB).
         """
         # Get the appropriate token
         auth_token = token_provider.get_token(token)
         if not auth_token:
-            return "Error: No authentication token available"
+            return _tool_error("No authentication token available")
 
         # Extract user_id from token for path resolution and logging
         user_id = extract_userid_from_token(auth_token)
         resolved_path = resolve_relative_path(path, user_id)
 
-        print(f"Downloading file from path: {resolved_path}, user_id: {user_id}")
+        logger.info("Downloading file", extra={"path": resolved_path, "user_id": user_id, "sampled": True})
+
+        result = await workspace_download_file(ctx, resolved_path, auth_token, output_file, chunk_size, parallel_connections, range_size)
+        return _respond(result)
+
+    @tool
+    async def workspace_bulk_download_tool(token: Optional[str] = None, paths: List[str] = None, folder: str = None, output_dir: str = None, recursive: bool = False, max_concurrency: int = 4) -> str:
+        """Download many files, or a whole workspace folder, to a local directory in one call.
+
+        Args:
+            token: Authentication token (optional - will use default if not provided)
+            paths: Paths of the files to download (relative to user's home directory).
+            folder: Workspace folder whose files should all be downloaded (relative to user's home directory).
+            output_dir: Local directory to save the files to.
+            recursive: If True, also download files in subfolders of folder, keeping the folder layout.
+            max_concurrency: Maximum number of files downloaded at the same time (default 4).
+
+        Returns:
+            Download status for every file plus total bytes and throughput.
+        """
+        if not paths and not folder:
+            return _tool_error("paths or folder parameter is required")
+
+        if not output_dir:
+            return _tool_error("output_dir parameter is required")
+
+        # Get the appropriate token
+        auth_token = token_provider.get_token(token)
+        if not auth_token:
+            return _tool_error("No authentication token available")
+
+        # Extract user_id from token for path resolution and logging
+        user_id = extract_userid_from_token(auth_token)
+        resolved_paths = resolve_relative_paths(paths, user_id) if paths else []
+        resolved_folder = resolve_relative_path(folder, user_id) if folder else None
+
+        logger.info("Bulk downloading", extra={"paths": resolved_paths, "folder": resolved_folder, "user_id": user_id, "output_dir": output_dir, "sampled": True})
+
+        result = await workspace_bulk_download(ctx, output_dir, auth_token, resolved_paths, resolved_folder, recursive, max_concurrency)
+        return _respond(result)
+
+    @tool
+    async def workspace_sync_tool(token: Optional[str] = None, workspace_folder: str = None, local_dir: str = None, direction: str = "download", max_concurrency: int = 4, checksum: bool = True, dry_run: bool = False) -> str:
+        """Sync a workspace folder and a local directory, transferring only new or changed files.
+
+        Files unchanged since the last sync (tracked in a manifest in local_dir) are skipped, and
+        same-sized files are compared by MD5 checksum before being transferred. Nothing is deleted.
+
+        Args:
+            token: Authentication token (optional - will use default if not provided)
+            workspace_folder: Workspace folder to sync (relative to user's home directory).
+            local_dir: Local directory to sync.
+            direction: "download" to update local_dir from the workspace, "upload" to update the workspace from local_dir (default "download").
+            max_concurrency: Maximum number of files transferred at the same time (default 4).
+            checksum: If True, compare checksums of same-sized files before transferring them (default True).
+            dry_run: If True, only report which files would be transferred.
+
+        Returns:
+            Numbers of files and bytes transferred and skipped, plus the status of each transferred file.
+        """
+        if not workspace_folder:
+            return _tool_error("workspace_folder parameter is required")
+
+        if not local_dir:
+            return _tool_error("local_dir parameter is required")
+
+        # Get the appropriate token
+        auth_token = token_provider.get_token(token)
+        if not auth_token:
+            return _tool_error("No authentication token available")
+
+        # Extract user_id from token for path resolution and logging
+        user_id = extract_userid_from_token(auth_token)
+        resolved_folder = resolve_relative_path(workspace_folder, user_id)
 
-        result = workspace_download_file(api, resolved_path, auth_token, output_file)
-        return str(result)
+        logger.info("Syncing folder", extra={"folder": resolved_folder, "local_dir": local_dir, "direction": direction, "user_id": user_id, "dry_run": dry_run, "sampled": True})
 
-    @mcp.tool()
-    def workspace_upload(token: Optional[str] = None, filename: str = None, upload_dir: str = None) -> str:
+        result = await workspace_sync(ctx, resolved_folder, local_dir, auth_token, direction, max_concurrency, checksum, dry_run)
+        return _respond(result)
+
+    @tool
+    async def workspace_upload(token: Optional[str] = None, filename: str = None, upload_dir: str = None) -> str:
         """Create an upload URL for a file in the workspace.
 
         Args:
@@ -197,12 +337,51 @@ def register_workspace_tools(mcp: FastMCP, api: JsonRpcCaller, token_provider: T
             upload_dir: Directory to upload the file to (relative to user's home directory, defaults to user's home directory).
         """
         if not filename:
-            return "Error: filename parameter is required"
+            return _tool_error("filename parameter is required")
+
+        # Get the appropriate token
+        auth_token = token_provider.get_token(token)
+        if not auth_token:
+            return _tool_error("No authentication token available")
+
+        # Extract user_id from token for path resolution and logging
+        user_id = extract_userid_from_token(auth_token)
+        if not upload_dir:
+            upload_dir = get_user_home_path(user_id)
+        else:
+            # If upload_dir is provided and doesn't start with /, treat as relative to home
+            if not upload_dir.startswith('/') and user_id:
+                upload_dir = f"{get_user_home_path(user_id)}/{upload_dir}"
+
+        logger.info("Uploading file", extra={"file": filename, "user_id": user_id, "upload_dir": upload_dir, "sampled": True})
+
+        result = await workspace_upload_file(ctx, filename, upload_dir, auth_token)
+        return _respond(result)
+
+    @tool
+    async def workspace_bulk_upload_tool(token: Optional[str] = None, filenames: List[str] = None, file_glob: str = None, upload_dir: str = None, max_concurrency: int = 4) -> str:
+        """Upload many local files to one workspace folder in a single call.
+
+        Args:
+            token: Authentication token (optional - will use default if not provided)
+            filenames: List of local files or directories to upload. Directories upload the files directly inside them.
+            file_glob: Glob pattern selecting local files to upload, e.g. /data/run1/*.fastq.gz
+            upload_dir: Directory to upload the files to (relative to user's home directory, defaults to user's home directory).
+            max_concurrency: Maximum number of files uploaded at the same time (default 4).
+
+        Returns:
+            Upload status for every file plus total bytes and throughput.
+        """
+        sources = list(filenames or [])
+        if file_glob:
+            sources.append(file_glob)
+        if not sources:
+            return _tool_error("filenames or file_glob parameter is required")
 
         # Get the appropriate token
         auth_token = token_provider.get_token(token)
         if not auth_token:
-            return "Error: No authentication token available"
+            return _tool_error("No authentication token available")
 
         # Extract user_id from token for path resolution and logging
         user_id = extract_userid_from_token(auth_token)
@@ -213,31 +392,36 @@ def register_workspace_tools(mcp: FastMCP, api: JsonRpcCaller, token_provider: T
             if not upload_dir.startswith('/') and user_id:
                 upload_dir = f"{get_user_home_path(user_id)}/{upload_dir}"
 
-        print(f"Uploading file: {filename}, user_id: {user_id}, upload_dir: {upload_dir}")
+        logger.info("Bulk uploading", extra={"sources": sources, "user_id": user_id, "upload_dir": upload_dir, "sampled": True})
 
-        result = workspace_upload(api, filename, upload_dir, auth_token)
-        return str(result)
+        result = await workspace_bulk_upload(ctx, sources, upload_dir, auth_token, max_concurrency)
+        return _respond(result)
 
-    @mcp.tool()
-    def create_genome_group(token: Optional[str] = None, genome_group_name: str = None, genome_id_list: str = None, genome_group_path: str = None) -> str:
-        """Create a genome group in the workspace.
+    @tool
+    async def create_genome_group(token: Optional[str] = None, genome_group_name: str = None, genome_id_list: str = None, genome_group_path: str = None, genome_id_file: str = None, extend: bool = False) -> str:
+        """Create a genome group in the workspace, or add genomes to an existing one.
 
         Args:
             token: Authentication token (optional - will use default if not provided)
             genome_group_name: Name of the genome group to create (used if genome_group_path not provided).
             genome_id_list: List of genome IDs to add to the genome group. Accepts multiple genome ids as a string with comma separation. Example: genome_id1,genome_id2,genome_id3,...
             genome_group_path: Full path for the genome group. If not provided, defaults to /<user_id>/home/<genome_group_name>.
+            genome_id_file: Path of a local file with genome IDs (comma or newline separated). Use this for very large lists.
+            extend: If True and the group already exists, add only the genome IDs it does not contain yet.
+
+        Returns:
+            Group path, number of IDs in the group, number of IDs added and the group metadata.
         """
         if not genome_group_name:
-            return "Error: genome_group_name parameter is required"
+            return _tool_error("genome_group_name parameter is required")
 
-        if not genome_id_list:
-            return "Error: genome_id_list parameter is required"
+        if not genome_id_list and not genome_id_file:
+            return _tool_error("genome_id_list or genome_id_file parameter is required")
 
         # Get the appropriate token
         auth_token = token_provider.get_token(token)
         if not auth_token:
-            return "Error: No authentication token available"
+            return _tool_error("No authentication token available")
 
         # Extract user_id from token for path resolution
         user_id = extract_userid_from_token(auth_token)
@@ -249,47 +433,41 @@ def register_workspace_tools(mcp: FastMCP, api: JsonRpcCaller, token_provider: T
             if not genome_group_path.startswith('/') and user_id:
                 genome_group_path = f"{get_user_home_path(user_id)}/{genome_group_path}"
 
-        print(f"Creating genome group: {genome_group_name}, user_id: {user_id}, path: {genome_group_path}")
+        logger.info("Creating genome group", extra={"group": genome_group_name, "user_id": user_id, "path": genome_group_path, "extend": extend, "sampled": True})
 
-        result = workspace_create_genome_group(api, genome_group_path, genome_id_list, auth_token)
-        return str(result)
+        result = await workspace_create_genome_group(ctx, genome_group_path, genome_id_list, auth_token, genome_id_file, extend)
+        return _respond(result)
 
-    @mcp.tool()
-    def create_feature_group(token: Optional[str] = None, feature_group_name: str = None, feature_id_list: str = None, feature_group_path: str = None) -> str:
-        """Create a feature group in the workspace.
+    @tool
+    async def create_feature_group(token: Optional[str] = None, feature_group_name: str = None, feature_id_list: str = None, feature_group_path: str = None, feature_id_file: str = None, extend: bool = False) -> str:
+        """Create a feature group in the workspace, or add features to an existing one.
 
         Args:
             token: Authentication token (optional - will use default if not provided)
             feature_group_name: Name of the feature group to create (used if feature_group_path not provided).
             feature_id_list: List of feature IDs as a string with comma separation to add to the feature group. Example: feature_id1,feature_id2,feature_id3,...
             feature_group_path: Full path for the feature group. If not provided, defaults to /<user_id>/home/<feature_group_name>.
+            feature_id_file: Path of a local file with feature IDs (comma or newline separated). Use this for very large lists.
+            extend: If True and the group already exists, add only the feature IDs it does not contain yet.
+
+        Returns:
+            Group path, number of IDs in the group, number of IDs added and the group metadata.
         """
         if not feature_group_name and not feature_group_path:
-            return "Error: feature_group_name or feature_group_path parameter is required"
+            return _tool_error("feature_group_name or feature_group_path parameter is required")
 
         if feature_group_name and feature_group_path:
-            return "Error: only one of feature_group_name or feature_group_path parameter can be provided"
-
-        if not feature_id_list:
-            return "Error: feature_id_list parameter is required"
-
-        # The LLM is consistently forgetting the final '.' in the feature IDs
-        feature_id_list = feature_id_list.split(',')
-        processed_feature_id_list = []
-        for feature_id in feature_id_list:
-            feature_id = feature_id.strip()
-            if len(feature_id) >= 4 and feature_id[-4] != '.':
-                # Insert '.' at fourth-to-last position
-                feature_id = feature_id[:-3] + '.' + feature_id[-3:]
-            processed_feature_id_list.append(feature_id)
-        feature_id_list = processed_feature_id_list
+            return _tool_error("only one of feature_group_name or feature_group_path parameter can be provided")
+
+        if not feature_id_list and not feature_id_file:
+            return _tool_error("feature_id_list or feature_id_file parameter is required")
 
         # TODO: include a feature id verification step to ensure the feature IDs are valid
 
         # Get the appropriate token
         auth_token = token_provider.get_token(token)
         if not auth_token:
-            return "Error: No authentication token available"
+            return _tool_error("No authentication token available")
 
         # Extract user_id from token for path resolution
         user_id = extract_userid_from_token(auth_token)
@@ -301,13 +479,13 @@ def register_workspace_tools(mcp: FastMCP, api: JsonRpcCaller, token_provider: T
             if not feature_group_path.startswith('/') and user_id:
                 feature_group_path = f"{get_user_home_path(user_id)}/{feature_group_path}"
 
-        print(f"Creating feature group: {feature_group_name}, user_id: {user_id}, path: {feature_group_path}")
+        logger.info("Creating feature group", extra={"group": feature_group_name, "user_id": user_id, "path": feature_group_path, "extend": extend, "sampled": True})
 
-        result = workspace_create_feature_group(api, feature_group_path, feature_id_list, auth_token)
-        return json.dumps(result)
+        result = await workspace_create_feature_group(ctx, feature_group_path, feature_id_list, auth_token, feature_id_file, extend)
+        return _respond(result)
 
-    @mcp.tool()
-    def get_genome_group_ids(token: Optional[str] = None, genome_group_name: str = None, genome_group_path: str = None) -> List[str]:
+    @tool
+    async def get_genome_group_ids(token: Optional[str] = None, genome_group_name: str = None, genome_group_path: str = None, offset: int = 0, limit: int = None, count_only: bool = False) -> str:
         """Get the IDs of the genomes in a genome group.
 
         Args:
@@ -315,21 +493,25 @@ def register_workspace_tools(mcp: FastMCP, api: JsonRpcCaller, token_provider: T
             genome_group_name: Name of the genome group to get the IDs of.
             genome_group_path: Full path for the genome group. If not provided, defaults to /<user_id>/home/Genome Groups/<genome_group_name>.
 
+            offset: Number of IDs to skip.
+            limit: Maximum number of IDs to return. Use with offset to page through large groups.
+            count_only: If True, return only the number of genomes in the group.
+
             Only one of genome_group_name or genome_group_path parameter can be provided.
 
         Returns:
-            List of genome IDs in the genome group.
+            List of genome IDs in the genome group, or with offset/limit a page with count, ids and has_more.
         """
         if not genome_group_name and not genome_group_path:
-            return "Error: genome_group_name or genome_group_path parameter is required"
+            return _tool_error("genome_group_name or genome_group_path parameter is required")
         
         if genome_group_name and genome_group_path:
-            return "Error: only one of genome_group_name or genome_group_path parameter can be provided"
+            return _tool_error("only one of genome_group_name or genome_group_path parameter can be provided")
 
         # Get the appropriate token
         auth_token = token_provider.get_token(token)
         if not auth_token:
-            return "Error: No authentication token available"
+            return _tool_error("No authentication token available")
 
         # Extract user_id from token for path resolution
         user_id = extract_userid_from_token(auth_token)
@@ -340,30 +522,36 @@ def register_workspace_tools(mcp: FastMCP, api: JsonRpcCaller, token_provider: T
             if not genome_group_path.startswith('/') and user_id:
                 genome_group_path = f"{get_user_home_path(user_id)}/{genome_group_path}"
 
-        print(f"Getting genome group IDs: {genome_group_name}, user_id: {user_id}, path: {genome_group_path}")
+        logger.info("Getting genome group IDs", extra={"group": genome_group_name, "user_id": user_id, "path": genome_group_path, "sampled": True})
 
-        result = workspace_get_genome_group_ids(api, genome_group_path, auth_token)
-        return result
+        result = await workspace_get_genome_group_ids(ctx, genome_group_path, auth_token, offset, limit, count_only)
+        return _respond(result)
 
-    @mcp.tool()
-    def get_feature_group_ids(token: Optional[str] = None, feature_group_name: str = None, feature_group_path: str = None) -> List[str]:
+    @tool
+    async def get_feature_group_ids(token: Optional[str] = None, feature_group_name: str = None, feature_group_path: str = None, offset: int = 0, limit: int = None, count_only: bool = False) -> str:
         """Get the IDs of the features in a feature group.
 
         Args:
             token: Authentication token (optional - will use default if not provided)
             feature_group_name: Name of the feature group to get the IDs of.
             feature_group_path: Full path for the feature group. If not provided, defaults to /<user_id>/home/Feature Groups/<feature_group_name>.
+            offset: Number of IDs to skip.
+            limit: Maximum number of IDs to return. Use with offset to page through large groups.
+            count_only: If True, return only the number of features in the group.
+
+        Returns:
+            List of feature IDs in the feature group, or with offset/limit a page with count, ids and has_more.
         """
         if not feature_group_name and not feature_group_path:
-            return "Error: feature_group_name or feature_group_path parameter is required"
+            return _tool_error("feature_group_name or feature_group_path parameter is required")
 
         if feature_group_name and feature_group_path:
-            return "Error: only one of feature_group_name or feature_group_path parameter can be provided"
+            return _tool_error("only one of feature_group_name or feature_group_path parameter can be provided")
 
         # Get the appropriate token
         auth_token = token_provider.get_token(token)
         if not auth_token:
-            return "Error: No authentication token available"
+            return _tool_error("No authentication token available")
 
         # Extract user_id from token for path resolution
         user_id = extract_userid_from_token(auth_token)
@@ -374,7 +562,56 @@ def register_workspace_tools(mcp: FastMCP, api: JsonRpcCaller, token_provider: T
             if not feature_group_path.startswith('/') and user_id:
                 feature_group_path = f"{get_user_home_path(user_id)}/{feature_group_path}"
 
-        print(f"Getting feature group IDs: {feature_group_name}, user_id: {user_id}, path: {feature_group_path}")
+        logger.info("Getting feature group IDs", extra={"group": feature_group_name, "user_id": user_id, "path": feature_group_path, "sampled": True})
+
+        result = await workspace_get_feature_group_ids(ctx, feature_group_path, auth_token, offset, limit, count_only)
+        return _respond(result)
+
+    @tool
+    async def group_set_operation(token: Optional[str] = None, operation: str = None, group_type: str = "genome", group_names: List[str] = None, group_paths: List[str] = None, output_group_name: str = None, output_group_path: str = None, sample_size: int = 10) -> str:
+        """Combine two or more genome or feature groups with union, intersection or difference.
+
+        The groups are combined on the server; only counts and a sample of the result are returned.
+        Save the result as a new group with output_group_name or output_group_path.
+
+        Args:
+            token: Authentication token (optional - will use default if not provided)
+            operation: "union", "intersection" or "difference" (IDs in the first group that are in none of the others).
+            group_type: "genome" or "feature" (default genome).
+            group_names: Names of the groups in /<user_id>/home/Genome Groups or /<user_id>/home/Feature Groups, in order.
+            group_paths: Full paths of the groups, in order (used instead of group_names).
+            output_group_name: Name of a new group to save the result to, in the default group folder.
+            output_group_path: Full path of a new group to save the result to.
+            sample_size: Number of result IDs to include in the response (default 10).
+
+        Returns:
+            Per-group ID counts, the result count, a sample of the result and the new group path if one was created.
+        """
+        if not operation:
+            return _tool_error("operation parameter is required")
+
+        if not group_names and not group_paths:
+            return _tool_error("group_names or group_paths parameter is required")
+
+        if group_type not in ("genome", "feature"):
+            return _tool_error("group_type must be genome or feature")
 
-        result = workspace_get_feature_group_ids(api, feature_group_path, auth_token)
-        return result
\ No newline at end of file
+        # Get the appropriate token
+        auth_token = token_provider.get_token(token)
+        if not auth_token:
+            return _tool_error("No authentication token available")
+
+        # Extract user_id from token for path resolution
+        user_id = extract_userid_from_token(auth_token)
+        group_folder = f"{get_user_home_path(user_id)}/{group_type.capitalize()} Groups"
+        paths = resolve_relative_paths(group_paths, user_id) if group_paths else [f"{group_folder}/{name}" for name in group_names]
+        output_path = None
+        if output_group_path:
+            output_path = resolve_relative_path(output_group_path, user_id)
+        elif output_group_name:
+            output_path = f"{group_folder}/{output_group_name}"
+
+        logger.info("Combining groups", extra={"operation": operation, "paths": paths, "user_id": user_id, "output": output_path, "sampled": True})
+
+        result = await workspace_group_set_operation(ctx, operation, paths, auth_token, group_type, output_path, sample_size)
+        return _respond(result)